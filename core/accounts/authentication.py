@@ -1,14 +1,60 @@
+from django.conf import settings
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.models import TokenUser
 from rest_framework.exceptions import AuthenticationFailed
 
+from accounts.services import get_cached_user
+from permissions_app.services import get_permissions_stamp
+
 
 class ActiveUserJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication backed by the cached user snapshot, rejecting
+    inactive, deleted and blocked accounts.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+
+        if not user.is_active or user.is_deleted or user.is_blocked:
+            raise AuthenticationFailed(
+                "User account is inactive or blocked",
+                code="user_inactive",
+            )
+
+        return user
+
+
+class ClaimsJWTAuthentication(ActiveUserJWTAuthentication):
+    """
+    For hot read endpoints: trusts the role/clinic_ids claims of a token
+    whose perm_ver still matches the cached version, and returns a
+    TokenUser without touching the database. Views using it must filter
+    by request.user.id, not the user instance.
+    Tokens without claims fall back to the normal database lookup.
+    """
+
     def get_user(self, validated_token):
-        user = super().get_user(validated_token)
+        if (
+            not getattr(settings, "JWT_PERMISSION_CLAIMS", False)
+            or "perm_ver" not in validated_token
+        ):
+            return super().get_user(validated_token)
 
-        if not user.is_active or user.is_deleted or user.is_block :
+        user = TokenUser(validated_token)
+        if validated_token["perm_ver"] != get_permissions_stamp(user.id):
             raise AuthenticationFailed(
-                "User account is inactive or blocked"
+                "Token permissions are outdated, refresh the token",
+                code="token_stale",
             )
 
         return user
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.9 on 2026-10-18 07:44
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+def backfill_search_name(apps, schema_editor):
+    User = apps.get_model("accounts", "User")
+
+    batch = []
+    for user in User.objects.only("id", "first_name", "last_name", "email").iterator(chunk_size=1000):
+        user.search_name = " ".join(
+            part.strip().lower()
+            for part in (user.first_name, user.last_name, user.email)
+            if part and part.strip()
+        )
+        batch.append(user)
+        if len(batch) == 1000:
+            User.objects.bulk_update(batch, ["search_name"])
+            batch = []
+
+    if batch:
+        User.objects.bulk_update(batch, ["search_name"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_alter_user_role'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('subject_matters', '0001_initial'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='user',
+            name='search_name',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(backfill_search_name, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='user',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_name'], name='accounts_user_search_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -3,6 +3,7 @@ from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from .managers import UserManager
 from subject_matters.models import SubjectMatters
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.contrib.postgres.indexes import GinIndex
 class User(AbstractBaseUser, PermissionsMixin):
     ROLE_CHOICES = (
         ("owner", "Owner"),
@@ -61,11 +62,39 @@ class User(AbstractBaseUser, PermissionsMixin):
         blank=True,
         help_text="Date when user joined (user can provide custom date)"
     )
+
+    # lowercased "first last email" for the people pickers (trigram indexed)
+    search_name = models.CharField(max_length=255, blank=True, editable=False)
     
 
     objects = UserManager()
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
 
+    class Meta:
+        indexes = [
+            GinIndex(
+                fields=["search_name"],
+                opclasses=["gin_trgm_ops"],
+                name="accounts_user_search_trgm",
+            ),
+        ]
+
     def __str__(self):
         return self.email
+
+    def build_search_name(self):
+        return " ".join(
+            part.strip().lower()
+            for part in (self.first_name, self.last_name, self.email)
+            if part and part.strip()
+        )
+
+    def save(self, *args, **kwargs):
+        self.search_name = self.build_search_name()
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"first_name", "last_name", "email"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "search_name"}
+
+        super().save(*args, **kwargs)
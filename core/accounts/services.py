@@ -1,8 +1,41 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from rest_framework_simplejwt.token_blacklist.models import (
     OutstandingToken,
     BlacklistedToken,
 )
 
+from .models import User
+
+
+def _user_snapshot_key(user_id):
+    return f"user:snapshot:{user_id}"
+
+
+def get_cached_user(user_id):
+    """
+    User row for authentication, served from a short-lived shared cache so
+    reconnect storms don't turn into one SELECT per request/socket.
+    The password hash is deferred and never cached. Returns None if missing.
+    """
+    key = _user_snapshot_key(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = User.objects.defer("password").filter(id=user_id).first()
+        if user is None:
+            return None
+        cache.set(key, user, getattr(settings, "USER_SNAPSHOT_TTL", 60))
+    return user
+
+
+def invalidate_user_snapshot(user_id):
+    """
+    Drop the cached snapshot once the current transaction commits.
+    Called for every User save (accounts.signals).
+    """
+    transaction.on_commit(lambda: cache.delete(_user_snapshot_key(user_id)))
+
 
 def logout_user_everywhere(user):
     """
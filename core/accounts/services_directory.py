@@ -0,0 +1,55 @@
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import Exists, OuterRef
+
+from medical.models import ClinicUser
+
+
+def clinic_scope(requester):
+    """
+    Clinic ids the requester may look people up in (a subquery), or None
+    when the requester sees every clinic (owner).
+    """
+    if requester.role == "owner":
+        return None
+    return ClinicUser.objects.filter(user=requester).values("clinic_id")
+
+
+def search_people(qs, text="", *, requester=None, user_field=""):
+    """
+    Shared people search of the user pickers.
+
+    qs is a User queryset, or a queryset of a model pointing at User
+    through user_field (e.g. ClinicUser with user_field="user").
+    With a requester the rows are limited to people sharing one of the
+    requester's clinics (ClinicUser rows: to those clinics). text is
+    matched against User.search_name, whose pg_trgm GIN index serves the
+    substring LIKE; matches are ranked by word similarity, then name.
+    """
+    prefix = f"{user_field}__" if user_field else ""
+
+    if requester is not None:
+        clinic_ids = clinic_scope(requester)
+        if clinic_ids is not None:
+            if user_field:
+                qs = qs.filter(clinic_id__in=clinic_ids)
+            else:
+                qs = qs.filter(
+                    Exists(
+                        ClinicUser.objects.filter(
+                            user_id=OuterRef("pk"),
+                            clinic_id__in=clinic_ids
+                        )
+                    )
+                )
+
+    term = " ".join(text.lower().split())
+    if not term:
+        return qs
+
+    return qs.filter(
+        **{f"{prefix}search_name__contains": term}
+    ).annotate(
+        search_rank=TrigramWordSimilarity(term, f"{prefix}search_name")
+    ).order_by(
+        "-search_rank", f"{prefix}first_name", f"{prefix}last_name", f"{prefix}id"
+    )
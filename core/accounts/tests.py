@@ -1,3 +1,86 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
 
-# Create your tests here.
+from accounts.authentication import ClaimsJWTAuthentication
+from accounts.models import User
+from accounts.tokens import ClaimsTokenRefreshSerializer, tokens_for_user
+from permissions_app.models import Permission
+
+TEST_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(CACHES=TEST_CACHES, JWT_PERMISSION_CLAIMS=True)
+class PermissionClaimsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="claims@example.com", password="x", role="doctor", first_name="Cla"
+        )
+        self.auth = ClaimsJWTAuthentication()
+
+    def authenticate(self, token):
+        return self.auth.get_user(self.auth.get_validated_token(str(token)))
+
+    def assertStale(self, token):
+        with self.assertRaises(AuthenticationFailed) as ctx:
+            self.authenticate(token)
+        self.assertEqual(ctx.exception.get_codes(), "token_stale")
+
+    def test_fresh_token_is_served_from_claims(self):
+        user = self.authenticate(tokens_for_user(self.user).access_token)
+        self.assertIsInstance(user, TokenUser)
+        # the user id claim is a string; views only use it in ORM filters
+        self.assertEqual(user.id, str(self.user.id))
+
+    def test_profile_saves_keep_tokens_valid(self):
+        token = tokens_for_user(self.user).access_token
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = "Renamed"
+            self.user.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.get(id=self.user.id).save()
+
+        self.assertEqual(self.authenticate(token).id, str(self.user.id))
+
+    def test_role_change_makes_tokens_stale(self):
+        token = tokens_for_user(self.user).access_token
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.role = "admin"
+            self.user.save()
+
+        self.assertStale(token)
+
+    def test_permission_edit_makes_tokens_stale(self):
+        permission = Permission.objects.create(code="chat:test_old")
+        token = tokens_for_user(self.user).access_token
+
+        with self.captureOnCommitCallbacks(execute=True):
+            permission.code = "chat:test_new"
+            permission.save()
+
+        self.assertStale(token)
+
+    def test_refresh_restamps_current_claims(self):
+        refresh = tokens_for_user(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.role = "admin"
+            self.user.save()
+
+        serializer = ClaimsTokenRefreshSerializer(data={"refresh": str(refresh)})
+        self.assertTrue(serializer.is_valid())
+        user = self.authenticate(serializer.validated_data["access"])
+        self.assertEqual(user.token["role"], "admin")
+
+    def test_refresh_is_refused_for_blocked_users(self):
+        refresh = tokens_for_user(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_blocked = True
+            self.user.save()
+
+        serializer = ClaimsTokenRefreshSerializer(data={"refresh": str(refresh)})
+        with self.assertRaises(AuthenticationFailed):
+            serializer.is_valid()
@@ -0,0 +1,63 @@
+from django.conf import settings
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from medical.models import ClinicUser
+from permissions_app.services import get_permissions_stamp
+
+
+def add_permission_claims(token, user):
+    """
+    Stamp role, clinic ids and the current permissions version on a token
+    so ClaimsJWTAuthentication can authorize without loading the user.
+    """
+    token["role"] = user.role
+    token["is_superuser"] = user.is_superuser
+    token["clinic_ids"] = sorted(
+        ClinicUser.objects.filter(user=user).values_list("clinic_id", flat=True)
+    )
+    token["perm_ver"] = get_permissions_stamp(user.id)
+    return token
+
+
+def tokens_for_user(user) -> RefreshToken:
+    """
+    RefreshToken.for_user plus permission claims (copied into its access token).
+    """
+    refresh = RefreshToken.for_user(user)
+    if getattr(settings, "JWT_PERMISSION_CLAIMS", False):
+        add_permission_claims(refresh, user)
+    return refresh
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        return tokens_for_user(user)
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Re-stamps claims on refresh, so a client whose token went stale after a
+    permission change gets a current one instead of copying the old claims.
+    Blocked and deleted accounts are refused here too: simplejwt only
+    checks is_active, and claims-authenticated views never load the user.
+    """
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+
+        if getattr(settings, "JWT_PERMISSION_CLAIMS", False):
+            from accounts.models import User
+
+            access = AccessToken(data["access"])
+            user = User.objects.filter(id=access["user_id"]).first()
+            if user is None or not user.is_active or user.is_deleted or user.is_blocked:
+                raise AuthenticationFailed(
+                    "User account is inactive or blocked",
+                    code="user_inactive",
+                )
+            data["access"] = str(add_permission_claims(access, user))
+
+        return data
@@ -1,9 +1,7 @@
-from django.db.models import Q
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.parsers import MultiPartParser, FormParser
 from .models import User
 from django.shortcuts import get_object_or_404
@@ -13,6 +11,8 @@ from medical.models import ClinicUser
 from core.utils.pagination import StandardResultsSetPagination
 from django.core.exceptions import ObjectDoesNotExist
 from accounts.services import deactivate_user
+from accounts.services_directory import search_people
+from accounts.tokens import tokens_for_user
 from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 #login
 class LoginView(APIView):
@@ -47,7 +47,7 @@ class LoginView(APIView):
                 "errors": None,
                 "data": None,
             }, status=status.HTTP_403_FORBIDDEN)
-        refresh = RefreshToken.for_user(user)
+        refresh = tokens_for_user(user)
 
         return Response({
             "access": str(refresh.access_token),
@@ -91,27 +91,14 @@ class ListUserView(APIView):
         )
 
         # 2️⃣ Visibility rule
-        if request.user.role != "owner":
-            my_clinic_ids = ClinicUser.objects.filter(
-                user=request.user
-            ).values_list("clinic_id", flat=True)
-
-            qs = qs.filter(
-                clinicuser__clinic_id__in=my_clinic_ids
-            )
-
         # 3️⃣ Filters
         search = request.GET.get("search")
         role = request.GET.get("role")
         active = request.GET.get("active")
         clinic = request.GET.get("clinic")
 
-        if search:
-            qs = qs.filter(
-                Q(email__icontains=search)
-                | Q(first_name__icontains=search)
-                | Q(last_name__icontains=search)
-            )
+        # clinic scope + ranked name/email search
+        qs = search_people(qs, search or "", requester=request.user)
 
         if role:
             qs = qs.filter(role__iexact=role)
@@ -124,7 +111,9 @@ class ListUserView(APIView):
                 clinicuser__clinic_id=int(clinic)
             )
 
-        qs = qs.distinct().order_by("id")
+        qs = qs.distinct()
+        if not search:
+            qs = qs.order_by("id")
 
         paginator = StandardResultsSetPagination()
         page = paginator.paginate_queryset(qs, request)
@@ -410,19 +399,15 @@ class ClinicUsersView(APIView):
 
         # 🔹 search (name/email)
         search = (request.GET.get("search") or "").strip()
-        if search:
-            qs = qs.filter(
-                Q(user__email__icontains=search) |
-                Q(user__first_name__icontains=search) |
-                Q(user__last_name__icontains=search)
-            )
+        qs = search_people(qs, search, user_field="user")
 
         # 🔹 exclude selected users
         exclude_ids = request.GET.get("exclude")
         if exclude_ids:
             qs = qs.exclude(user_id__in=exclude_ids.split(","))
 
-        qs = qs.order_by("user__first_name", "user__last_name")
+        if not search:
+            qs = qs.order_by("user__first_name", "user__last_name")
 
         results = [
             {
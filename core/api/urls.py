@@ -1,6 +1,6 @@
 from django.urls import path
 from accounts.views import LoginView, CreateUserView, ListUserView, UpdateUserView, DeleteUserView , UserDetailView ,PasswordResetView , UserNotificationView ,OwnerChangeUserPasswordView ,UpdateUserStatusView
-from medical.views import CreateClinicView, ListClinicView, UpdateClinicView, DeleteClinicView , ClinicDetailView , ChatUsersView 
+from medical.views import CreateClinicView, ListClinicView, UpdateClinicView, DeleteClinicView , ClinicDeletionJobView , ClinicDetailView , ChatUsersView 
 
 from subject_matters.views import CreateSubjectView, ListSubjectView, UpdateSubjectView , DeleteSubjectView ,SubjectDetailView
 
@@ -8,14 +8,15 @@ from chat.views import (
     ChatUserPickerView, RoomListView, CreatePrivateRoomView, MyAiRoomView,
     EnsureClinicGroupRoomView, CreateClinicGroupView,
     MessageListView, SendMessageView, MarkRoomReadView,
-    MentionCountView, ReactMessageView,  SoftDeleteChatView , BlockUnblockUserView ,
+    MentionCountView, UnreadCountView, WsTicketView, ReactMessageView,  SoftDeleteChatView , BlockUnblockUserView ,
     SendDirectMessageView ,AddGroupMembersView ,ChatRoomMembersView ,BlockUnblockGroupMemberView, ClinicReactionListView
 )
 from permissions_app.views import ToggleUserPermissionView ,UserPermissionsView
 from chat.views_user_history import *
+from chat.views_search import MessageSearchView
 from notifications.views import *
 from assessments.views import (CreateAssessmentView , AssessmentQuestionsView , AddQuestionView ,DeleteQuestionView ,UpdateAssessmentEndDateView , UpdateAssessmentStatusView , MyAssessmentsView ,
-                               CandidateAssessmentQuestionsView ,SubmitAssessmentUnifiedView , CreatorAssessmentHistoryView ,ReviewAssessmentResultView ,ViewUserAnswersView) 
+                               CandidateAssessmentQuestionsView ,SubmitAssessmentUnifiedView ,MyAssessmentResultView , CreatorAssessmentHistoryView ,ReviewAssessmentResultView ,ViewUserAnswersView) 
 
 urlpatterns = [
     path("login/", LoginView.as_view()),
@@ -37,6 +38,7 @@ urlpatterns = [
     path("clinics/<int:pk>/", ClinicDetailView.as_view()),
     path("clinics/<int:clinic_id>/update/", UpdateClinicView.as_view()),
     path("clinics/<int:clinic_id>/delete/", DeleteClinicView.as_view()),
+    path("clinics/deletion-jobs/<int:job_id>/", ClinicDeletionJobView.as_view()),
     path(
     "chat/clinic/members/",
     ChatUsersView.as_view(),
@@ -62,6 +64,7 @@ urlpatterns = [
     path("rooms/group/create/", CreateClinicGroupView.as_view()),
 
     path("rooms/<int:room_id>/messages/", MessageListView.as_view()),
+    path("messages/search/", MessageSearchView.as_view()),
     path("rooms/<int:room_id>/send/", SendMessageView.as_view()),
     path("rooms/<int:room_id>/read/", MarkRoomReadView.as_view()),
     path("rooms/<int:room_id>/delete/", SoftDeleteChatView.as_view()),
@@ -72,11 +75,14 @@ urlpatterns = [
     path("messages/react/", ClinicReactionListView.as_view()),
 
     path("mentions/count/", MentionCountView.as_view()),
+    path("unread/count/", UnreadCountView.as_view()),
+    path("ws/ticket/", WsTicketView.as_view()),
    
     path("block/", BlockUnblockUserView.as_view()),
     
     path("users/<int:user_id>/rooms/", UserRoomHistoryView.as_view()),
     path("users/<int:user_id>/rooms/<int:room_id>/messages/",UserMessageHistoryView.as_view()),
+    path("chat/export/", ChatExportView.as_view()),
     
     path("notifications/", NotificationListView.as_view()),
     path("notifications/<int:notif_id>/seen/", NotificationMarkSeenView.as_view()),
@@ -92,6 +98,7 @@ urlpatterns = [
     path("my-assessments/", MyAssessmentsView.as_view()),
     path("assessments/<int:assessment_id>/questions/candidate", CandidateAssessmentQuestionsView.as_view()),
     path("assessments/<int:assessment_id>/submit/", SubmitAssessmentUnifiedView.as_view()),
+    path("assessments/<int:assessment_id>/result/", MyAssessmentResultView.as_view()),
     path("assessments/", CreatorAssessmentHistoryView.as_view()),
     path("assessments/<int:assessment_id>/", ReviewAssessmentResultView.as_view()),
     path("assessments/<int:assessment_id>/users/<int:user_id>/", ViewUserAnswersView.as_view()),
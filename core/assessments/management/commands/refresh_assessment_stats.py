@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from assessments.models import Assessment
+from assessments.services_stats import refresh_assessment_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute AssessmentStats rollups from assignments and scores"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--assessment", type=int, action="append", dest="assessment_ids")
+
+    def handle(self, *args, **options):
+        assessments = Assessment.objects.order_by("id")
+        if options["assessment_ids"]:
+            assessments = assessments.filter(id__in=options["assessment_ids"])
+
+        count = 0
+        for assessment_id in assessments.values_list("id", flat=True).iterator():
+            refresh_assessment_stats(assessment_id)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {count} assessments"))
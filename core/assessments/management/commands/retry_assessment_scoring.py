@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from assessments.services_scoring import requeue_unscored
+
+
+class Command(BaseCommand):
+    help = "Re-queue scoring for failed submissions and stale in-progress ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--stale-after",
+            type=int,
+            default=None,
+            help="Seconds after which a submission still being scored is retried "
+                 "(default: AI_SCORING_STALE_AFTER)",
+        )
+
+    def handle(self, *args, **options):
+        ids = requeue_unscored(stale_after=options["stale_after"])
+        self.stdout.write(self.style.SUCCESS(f"{len(ids)} submission(s) queued for scoring"))
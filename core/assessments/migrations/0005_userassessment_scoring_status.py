@@ -0,0 +1,32 @@
+# Generated by Django 5.2.9 on 2026-10-18 07:39
+
+from django.db import migrations, models
+
+
+def backfill_scoring_status(apps, schema_editor):
+    UserAssessment = apps.get_model("assessments", "UserAssessment")
+    Score = apps.get_model("assessments", "Score")
+
+    scored = Score.objects.filter(
+        user_id=models.OuterRef("user_id"),
+        assessment_id=models.OuterRef("assessment_id"),
+    )
+    UserAssessment.objects.filter(status="completed").filter(
+        models.Exists(scored)
+    ).update(scoring_status="scored")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0004_assessment_role'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userassessment',
+            name='scoring_status',
+            field=models.CharField(blank=True, choices=[('pending', 'Pending'), ('scoring', 'Scoring'), ('scored', 'Scored'), ('failed', 'Failed')], max_length=20, null=True),
+        ),
+        migrations.RunPython(backfill_scoring_status, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.9 on 2026-10-18 07:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_assessment_stats(apps, schema_editor):
+    Assessment = apps.get_model("assessments", "Assessment")
+    AssessmentStats = apps.get_model("assessments", "AssessmentStats")
+    UserAssessment = apps.get_model("assessments", "UserAssessment")
+    Answer = apps.get_model("assessments", "Answer")
+    Score = apps.get_model("assessments", "Score")
+
+    answered = (
+        Answer.objects.filter(
+            user_id=models.OuterRef("user_id"),
+            question__assessment_id=models.OuterRef("assessment_id"),
+        )
+        .exclude(answer_text="")
+        .values("user_id")
+        .annotate(c=models.Count("id"))
+        .values("c")
+    )
+    UserAssessment.objects.filter(status="completed").update(
+        answered_count=Coalesce(models.Subquery(answered), 0)
+    )
+
+    counts = Assessment.objects.annotate(
+        total=models.Count("userassessment"),
+        completed=models.Count(
+            "userassessment", filter=models.Q(userassessment__status="completed")
+        ),
+    ).values_list("id", "total", "completed")
+
+    percentages = {}
+    for assessment_id, score, max_score in Score.objects.values_list(
+        "assessment_id", "score", "max_score"
+    ):
+        percentages.setdefault(assessment_id, []).append(
+            score * 100.0 / max_score if max_score else 0
+        )
+
+    AssessmentStats.objects.bulk_create(
+        [
+            AssessmentStats(
+                assessment_id=assessment_id,
+                total_members=total,
+                completed_members=completed,
+                scored_members=len(percentages.get(assessment_id, [])),
+                percentage_sum=sum(percentages.get(assessment_id, [])),
+            )
+            for assessment_id, total, completed in counts
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0005_userassessment_scoring_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssessmentStats',
+            fields=[
+                ('assessment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='assessments.assessment')),
+                ('total_members', models.PositiveIntegerField(default=0)),
+                ('completed_members', models.PositiveIntegerField(default=0)),
+                ('scored_members', models.PositiveIntegerField(default=0)),
+                ('percentage_sum', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='userassessment',
+            name='answered_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_assessment_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-18 07:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0006_assessment_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userassessment',
+            name='scoring_started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
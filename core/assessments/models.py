@@ -87,6 +87,12 @@ class UserAssessment(models.Model):
         ("paused", "Paused"),
         ("completed", "Completed"),
     )
+    SCORING_STATUS = (
+        ("pending", "Pending"),
+        ("scoring", "Scoring"),
+        ("scored", "Scored"),
+        ("failed", "Failed"),
+    )
 
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     assessment = models.ForeignKey(Assessment, on_delete=models.CASCADE)
@@ -96,6 +102,20 @@ class UserAssessment(models.Model):
     paused_at = models.DateTimeField(null=True, blank=True)
     submitted_at = models.DateTimeField(null=True, blank=True)
 
+    # non-blank answers stored on submit
+    answered_count = models.PositiveIntegerField(default=0)
+
+    # set on submit; the scoring pipeline moves it to scored / failed
+    scoring_status = models.CharField(
+        max_length=20,
+        choices=SCORING_STATUS,
+        null=True,
+        blank=True
+    )
+    # when the current scoring attempt claimed the row; stale claims are
+    # re-queued by manage.py retry_assessment_scoring
+    scoring_started_at = models.DateTimeField(null=True, blank=True)
+
     class Meta:
         unique_together = ("user", "assessment")
 
@@ -122,6 +142,31 @@ class Score(models.Model):
         unique_together = ("user", "assessment")
 
 
+class AssessmentStats(models.Model):
+    """
+    Result rollup per assessment, kept current by fan-out, submission and
+    scoring (assessments.services_stats) so dashboards read one row.
+    """
+    assessment = models.OneToOneField(
+        Assessment,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stats"
+    )
+    total_members = models.PositiveIntegerField(default=0)
+    completed_members = models.PositiveIntegerField(default=0)
+    scored_members = models.PositiveIntegerField(default=0)
+    # sum of per-user score percentages; average = sum / scored_members
+    percentage_sum = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def average_percentage(self):
+        if not self.scored_members:
+            return 0
+        return self.percentage_sum / self.scored_members
+
+
 class AssesmentNotification(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="assessment_notifications")
     assessment = models.ForeignKey(
@@ -1,8 +1,7 @@
 from rest_framework import serializers
-from .models import Assessment, Question, Answer, AssesmentNotification , Score
+from .models import Assessment, Question, Answer, AssesmentNotification
 from accounts.models import User
 
-from django.db.models import Avg, F, FloatField, ExpressionWrapper
 
 
 class AssessmentSerializer(serializers.ModelSerializer):
@@ -85,8 +84,8 @@ class NotificationSerializer(serializers.ModelSerializer):
 
 
 class CreatorAssessmentHistorySerializer(serializers.ModelSerializer):
-    total_members = serializers.IntegerField(read_only=True)
-    completed_members = serializers.IntegerField(read_only=True)
+    total_members = serializers.SerializerMethodField()
+    completed_members = serializers.SerializerMethodField()
     average_score = serializers.SerializerMethodField()
     due_date = serializers.SerializerMethodField()
     created_by_user = serializers.SerializerMethodField(read_only=True)
@@ -108,22 +107,22 @@ class CreatorAssessmentHistorySerializer(serializers.ModelSerializer):
     def get_due_date(self, obj):
         return obj.end_date.date() if obj.end_date else None
 
-    def get_average_score(self, obj):
-        scores = Score.objects.filter(assessment=obj)
+    def _stats(self, obj):
+        # AssessmentStats row, absent until the assessment is first activated
+        return getattr(obj, "stats", None)
+
+    def get_total_members(self, obj):
+        stats = self._stats(obj)
+        return stats.total_members if stats else 0
 
-        if not scores.exists():
-            return 0
+    def get_completed_members(self, obj):
+        stats = self._stats(obj)
+        return stats.completed_members if stats else 0
 
-        avg = scores.aggregate(
-            avg=Avg(
-                ExpressionWrapper(
-                    F("total_score") * 100.0 / F("max_score"),
-                    output_field=FloatField(),
-                )
-            )
-        )["avg"]
+    def get_average_score(self, obj):
+        stats = self._stats(obj)
+        return round(stats.average_percentage) if stats else 0
 
-        return round(avg or 0)
     def get_created_by_user(self, obj):
         user = obj.created_by
         if not user:
@@ -1,5 +1,5 @@
 from .models import Assessment
-import random
+from core.ai import get_provider
 # def generate_questions_for_assessment(
 #     assessment: Assessment,
 #     count: int,
@@ -32,27 +32,40 @@ def generate_questions_for_assessment(assessment, count: int) -> list[str]:
     if count <= 0:
         raise ValueError("count must be positive")
 
-    return [
-        f"Demo Question {i}: Explain this topic."
-        for i in range(1, count + 1)
-    ]
+    return get_provider().generate_questions(
+        clinic_id=assessment.clinic_id,
+        role=assessment.role,
+        count=count,
+    )
 
 def score_assessment_answers(
     *,
     questions,
     answers,
     role,
+    clinic_id=None,
 ):
-    scores = {}
+    return get_provider().score_answers(
+        questions=questions,
+        answers=answers,
+        role=role,
+        clinic_id=clinic_id,
+    )
 
-    for q in questions:
-        q_id = q["id"]
-        if q_id in answers:
-            scores[q_id] = random.randint(5, 9)  # demo AI score
-        else:
-            scores[q_id] = 0
 
-    return scores
+def review_assessment_answers(
+    *,
+    questions,
+    answers,
+    role,
+    clinic_id=None,
+):
+    return get_provider().review_answers(
+        questions=questions,
+        answers=answers,
+        role=role,
+        clinic_id=clinic_id,
+    )
 
 # from ai_engine.kb_generator import EnhancedKnowledgeBasedAssessmentGenerator
 # from ai_engine.healthdesk import healthdesk_ai
@@ -0,0 +1,107 @@
+from django.conf import settings
+from django.db import transaction
+
+from accounts.models import User
+from chat.realtime import queue_group_events
+from medical.models import ClinicUser
+from .models import Assessment, UserAssessment, AssesmentNotification
+from .services_stats import bump_assessment_stats
+
+
+def schedule_assessment_fan_out(assessment_id):
+    """
+    Assign an activated assessment in a Celery worker after commit when
+    Celery is enabled, otherwise inline once the transaction commits.
+    """
+    if not getattr(settings, "CELERY_ENABLED", False):
+        transaction.on_commit(lambda: fan_out_assessment(assessment_id))
+        return
+
+    from assessments.tasks import fan_out_assessment_task
+
+    transaction.on_commit(lambda: fan_out_assessment_task.delay(assessment_id))
+
+
+@transaction.atomic
+def fan_out_assessment(assessment_id):
+    """
+    Assign an active assessment to every clinic member with its role.
+
+    Only users without a UserAssessment yet are new; they get their rows
+    in one bulk insert, and those with notify_assessments on also get an
+    AssesmentNotification and an "assessment_assigned" event on their
+    user_<id> socket group. The assessment row is locked so a repeated
+    activation cannot notify anyone twice.
+    Returns the number of new assignments.
+    """
+    assessment = (
+        Assessment.objects
+        .select_for_update()
+        .filter(id=assessment_id, status="active")
+        .first()
+    )
+    if not assessment:
+        return 0
+
+    member_ids = set(
+        ClinicUser.objects.filter(
+            clinic_id=assessment.clinic_id,
+            user__role=assessment.role,
+        ).values_list("user_id", flat=True)
+    )
+    assigned_ids = set(
+        UserAssessment.objects.filter(
+            assessment=assessment
+        ).values_list("user_id", flat=True)
+    )
+    new_ids = sorted(member_ids - assigned_ids)
+    if not new_ids:
+        return 0
+
+    batch_size = getattr(settings, "ASSESSMENT_FANOUT_BATCH_SIZE", 1000)
+
+    UserAssessment.objects.bulk_create(
+        [UserAssessment(user_id=uid, assessment=assessment) for uid in new_ids],
+        batch_size=batch_size,
+        ignore_conflicts=True
+    )
+    bump_assessment_stats(assessment.id, total_members=len(new_ids))
+
+    notify_ids = list(
+        User.objects.filter(
+            id__in=new_ids,
+            notify_assessments=True
+        ).values_list("id", flat=True)
+    )
+
+    title = "New Assessment Available"
+    message = f"{assessment.title} is now active. Deadline: {assessment.end_date.date()}"
+
+    AssesmentNotification.objects.bulk_create(
+        [
+            AssesmentNotification(
+                user_id=uid,
+                assessment=assessment,
+                title=title,
+                message=message,
+            )
+            for uid in notify_ids
+        ],
+        batch_size=batch_size
+    )
+
+    event = {
+        "type": "assessment_event",
+        "event": "assessment_assigned",
+        "assessment": {
+            "id": assessment.id,
+            "title": assessment.title,
+            "clinic_id": assessment.clinic_id,
+            "end_date": assessment.end_date.isoformat(),
+        },
+        "title": title,
+        "message": message,
+    }
+    queue_group_events([(f"user_{uid}", event) for uid in notify_ids])
+
+    return len(new_ids)
@@ -0,0 +1,186 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from chat.realtime import queue_group_event
+from .models import Question, Answer, UserAssessment, Score, AssesmentNotification
+from .services_ai_assesment import review_assessment_answers
+from .services_stats import bump_assessment_stats, score_percentage
+
+logger = logging.getLogger(__name__)
+
+QUESTION_MAX_SCORE = 10
+
+
+def schedule_scoring(user_assessment_id):
+    """
+    Score a submission in a Celery worker after commit when Celery is
+    enabled, otherwise inline once the transaction commits.
+    """
+    if not getattr(settings, "CELERY_ENABLED", False):
+        transaction.on_commit(lambda: _score_inline(user_assessment_id))
+        return
+
+    from assessments.tasks import score_user_assessment_task
+
+    transaction.on_commit(lambda: score_user_assessment_task.delay(user_assessment_id))
+
+
+def _score_inline(user_assessment_id):
+    # runs in the submit request's on_commit: the answers are stored, so a
+    # failure only leaves the submission "failed" for requeue_unscored
+    try:
+        score_user_assessment(user_assessment_id)
+    except Exception:
+        logger.exception("Scoring user assessment %s failed", user_assessment_id)
+
+
+def score_user_assessment(user_assessment_id):
+    """
+    Score one submitted UserAssessment.
+
+    Answered questions go to the AI provider in batches of
+    AI_SCORING_BATCH_SIZE (one model call each); unanswered ones score 0
+    and do not count towards max_score. Writes Score with the joined
+    feedback, marks the submission scored and tells the candidate.
+    Any error marks it failed and is re-raised so Celery can retry; only
+    pending or failed submissions are picked up, so a duplicate delivery
+    does nothing.
+    """
+    claimed = UserAssessment.objects.filter(
+        id=user_assessment_id,
+        status="completed",
+        scoring_status__in=["pending", "failed"]
+    ).update(scoring_status="scoring", scoring_started_at=timezone.now())
+    if not claimed:
+        return None
+
+    try:
+        return _score_claimed(user_assessment_id)
+    except Exception:
+        UserAssessment.objects.filter(
+            id=user_assessment_id,
+            scoring_status="scoring"
+        ).update(scoring_status="failed")
+        raise
+
+
+def _score_claimed(user_assessment_id):
+    ua = UserAssessment.objects.select_related("assessment", "user").get(id=user_assessment_id)
+    assessment = ua.assessment
+
+    answers = dict(
+        Answer.objects.filter(
+            user_id=ua.user_id,
+            question__assessment=assessment
+        ).values_list("question_id", "answer_text")
+    )
+    answers = {qid: text for qid, text in answers.items() if text and text.strip()}
+
+    questions = [
+        {"id": q.id, "text": q.text}
+        for q in Question.objects.filter(
+            assessment=assessment,
+            id__in=list(answers)
+        ).only("id", "text").order_by("number", "id")
+    ]
+
+    batch_size = getattr(settings, "AI_SCORING_BATCH_SIZE", 20)
+    scores, feedback = {}, []
+
+    for start in range(0, len(questions), batch_size):
+        batch = questions[start:start + batch_size]
+        review = review_assessment_answers(
+            questions=batch,
+            answers={q["id"]: answers[q["id"]] for q in batch},
+            role=assessment.role,
+            clinic_id=assessment.clinic_id,
+        )
+        scores.update(review["scores"])
+        if review["feedback"]:
+            feedback.append(review["feedback"])
+
+    total_score = sum(scores.values())
+    max_score = len(questions) * QUESTION_MAX_SCORE
+
+    with transaction.atomic():
+        previous = Score.objects.filter(
+            user_id=ua.user_id,
+            assessment=assessment
+        ).values_list("score", "max_score").first()
+
+        score, _ = Score.objects.update_or_create(
+            user_id=ua.user_id,
+            assessment=assessment,
+            defaults={
+                "score": total_score,
+                "max_score": max_score,
+                "feedback": "\n".join(feedback),
+            },
+        )
+        UserAssessment.objects.filter(id=ua.id).update(scoring_status="scored")
+
+        percentage = score_percentage(total_score, max_score)
+        if previous:
+            bump_assessment_stats(
+                assessment.id,
+                percentage_sum=percentage - score_percentage(*previous)
+            )
+        else:
+            bump_assessment_stats(assessment.id, scored_members=1, percentage_sum=percentage)
+
+        if ua.user.notify_assessments:
+            title = "Assessment Result Ready"
+            message = f"Your result for {assessment.title} is available."
+
+            AssesmentNotification.objects.create(
+                user_id=ua.user_id,
+                assessment=assessment,
+                title=title,
+                message=message,
+            )
+            queue_group_event(
+                f"user_{ua.user_id}",
+                {
+                    "type": "assessment_event",
+                    "event": "assessment_scored",
+                    "assessment": {
+                        "id": assessment.id,
+                        "title": assessment.title,
+                        "clinic_id": assessment.clinic_id,
+                    },
+                    "title": title,
+                    "message": message,
+                },
+            )
+
+    return score
+
+
+def requeue_unscored(*, stale_after=None):
+    """
+    Re-schedule failed submissions and ones stuck in "scoring" longer than
+    stale_after seconds (AI_SCORING_STALE_AFTER; a crashed worker never
+    releases its claim). Returns the re-queued ids.
+    """
+    if stale_after is None:
+        stale_after = getattr(settings, "AI_SCORING_STALE_AFTER", 15 * 60)
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+
+    stale = UserAssessment.objects.filter(status="completed", scoring_status="scoring").filter(
+        Q(scoring_started_at__lt=cutoff) | Q(scoring_started_at__isnull=True)
+    )
+    stale.update(scoring_status="failed")
+
+    ids = list(
+        UserAssessment.objects.filter(status="completed", scoring_status="failed")
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    for user_assessment_id in ids:
+        schedule_scoring(user_assessment_id)
+    return ids
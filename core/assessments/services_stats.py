@@ -0,0 +1,52 @@
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import UserAssessment, Score, AssessmentStats
+
+
+def score_percentage(score, max_score):
+    return score * 100.0 / max_score if max_score else 0
+
+
+def refresh_assessment_stats(assessment_id):
+    """
+    Recompute an assessment's rollup from its rows (first use, repairs).
+    """
+    counts = UserAssessment.objects.filter(
+        assessment_id=assessment_id
+    ).aggregate(
+        total=Count("id"),
+        completed=Count("id", filter=Q(status="completed")),
+    )
+    percentages = [
+        score_percentage(score, max_score)
+        for score, max_score in Score.objects.filter(
+            assessment_id=assessment_id
+        ).values_list("score", "max_score")
+    ]
+
+    stats, _ = AssessmentStats.objects.update_or_create(
+        assessment_id=assessment_id,
+        defaults={
+            "total_members": counts["total"],
+            "completed_members": counts["completed"],
+            "scored_members": len(percentages),
+            "percentage_sum": sum(percentages),
+        },
+    )
+    return stats
+
+
+def bump_assessment_stats(assessment_id, **deltas):
+    """
+    Apply counter deltas in one UPDATE. Call after the rows it counts are
+    written: a missing stats row is built from them instead.
+    """
+    updated = AssessmentStats.objects.filter(
+        assessment_id=assessment_id
+    ).update(
+        updated_at=timezone.now(),
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+    if not updated:
+        refresh_assessment_stats(assessment_id)
@@ -0,0 +1,20 @@
+from celery import shared_task
+
+from assessments.services_assignments import fan_out_assessment
+from assessments.services_scoring import score_user_assessment
+from core.ai import AIProviderError
+
+
+@shared_task(ignore_result=True)
+def fan_out_assessment_task(assessment_id: int):
+    fan_out_assessment(assessment_id)
+
+
+@shared_task(
+    ignore_result=True,
+    autoretry_for=(AIProviderError,),
+    retry_backoff=True,
+    max_retries=5,
+)
+def score_user_assessment_task(user_assessment_id: int):
+    score_user_assessment(user_assessment_id)
@@ -1,3 +1,101 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db.models.query import QuerySet
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from assessments.models import Answer, Assessment, AssessmentStats, Question, Score, UserAssessment
+from medical.models import Clinic, ClinicUser
+
+TEST_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(CACHES=TEST_CACHES, CELERY_ENABLED=False)
+class SubmitAssessmentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_user(email="owner@example.com", password="x", role="owner")
+        clinic = Clinic.objects.create(name="Submit clinic")
+        self.user = User.objects.create_user(email="doc@example.com", password="x", role="doctor")
+        ClinicUser.objects.create(user=self.user, clinic=clinic)
+
+        self.assessment = Assessment.objects.create(
+            clinic=clinic,
+            title="Submit",
+            role="doctor",
+            status="active",
+            created_by=owner,
+            end_date=timezone.now() + timedelta(days=3),
+        )
+        self.questions = [
+            Question.objects.create(assessment=self.assessment, number=i + 1, text=f"Q{i}")
+            for i in range(3)
+        ]
+        self.ua = UserAssessment.objects.create(user=self.user, assessment=self.assessment)
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f"/api/v1/assessments/{self.assessment.id}/submit/"
+
+    def submit(self, text="answer"):
+        return self.client.post(
+            self.url,
+            {"answers": [{"question_id": q.id, "answer_text": text} for q in self.questions]},
+            format="json",
+        )
+
+    def test_submit_stores_answers_and_queues_scoring(self):
+        response = self.submit()
+
+        self.assertEqual(response.status_code, 202)
+        self.ua.refresh_from_db()
+        self.assertEqual(self.ua.status, "completed")
+        self.assertEqual(self.ua.scoring_status, "pending")
+        self.assertEqual(self.ua.answered_count, 3)
+        self.assertEqual(Answer.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(AssessmentStats.objects.get(assessment=self.assessment).completed_members, 1)
+
+    def test_second_submit_is_rejected(self):
+        self.submit("first")
+        response = self.submit("second")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            set(Answer.objects.filter(user=self.user).values_list("answer_text", flat=True)),
+            {"first"},
+        )
+
+    def test_concurrent_submit_loses_the_claim(self):
+        self.submit("first")
+
+        # a racing request that read the row before the first one committed
+        stale = UserAssessment.objects.get(id=self.ua.id)
+        stale.status = "in_progress"
+        first = QuerySet.first
+
+        def stale_first(qs):
+            return stale if qs.model is UserAssessment else first(qs)
+
+        with mock.patch.object(QuerySet, "first", autospec=True, side_effect=stale_first):
+            response = self.submit("second")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            set(Answer.objects.filter(user=self.user).values_list("answer_text", flat=True)),
+            {"first"},
+        )
+        self.assertEqual(AssessmentStats.objects.get(assessment=self.assessment).completed_members, 1)
+
+    def test_scored_result_without_a_score_row_is_pending(self):
+        self.submit()
+        UserAssessment.objects.filter(id=self.ua.id).update(scoring_status="scored")
+        Score.objects.filter(user=self.user).delete()
+
+        response = self.client.get(f"/api/v1/assessments/{self.assessment.id}/result/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["data"]["scoring_status"], "pending")
@@ -9,7 +9,7 @@ from django.utils import timezone
 from datetime import timedelta
 from .models import (
     Assessment, Question, Answer,
-    UserAssessment, AssesmentNotification ,Score
+    UserAssessment, AssesmentNotification ,Score, AssessmentStats
 )
 from .serializers import (
     AssessmentSerializer,
@@ -20,7 +20,11 @@ from .serializers import (
 )
 from django.db import transaction
 from .utils import flatten_serializer_errors, ok, err
-from .services_ai_assesment import generate_questions_for_assessment , score_assessment_answers
+from .services_ai_assesment import generate_questions_for_assessment
+from .services_assignments import schedule_assessment_fan_out
+from .services_scoring import schedule_scoring
+from .services_stats import bump_assessment_stats, score_percentage
+from core.ai import AIProviderError
 
 def is_creator(user, assessment):
     return assessment.created_by_id == user.id
@@ -79,10 +83,14 @@ class CreateAssessmentView(APIView):
                 except ValueError:
                     return err("count must be a positive integer")
 
-                questions_text = generate_questions_for_assessment(
-                    assessment=assessment,
-                    count=count,
-                )
+                try:
+                    questions_text = generate_questions_for_assessment(
+                        assessment=assessment,
+                        count=count,
+                    )
+                except AIProviderError:
+                    transaction.set_rollback(True)
+                    return err("AI service is unavailable, please try again", status_code=503)
 
                 Question.objects.filter(assessment=assessment).delete()
 
@@ -221,24 +229,8 @@ class UpdateAssessmentStatusView(APIView):
 
         # Assign users only when activating
         if status_value == "active":
-            clinic_users = ClinicUser.objects.filter(
-                clinic=assessment.clinic,
-                user__role=assessment.role,
-            ).select_related("user")
-
-            for cu in clinic_users:
-                ua, created = UserAssessment.objects.get_or_create(
-                    user=cu.user,
-                    assessment=assessment,
-                )
-
-                if created:
-                    AssesmentNotification.objects.create(
-                        user=cu.user,
-                        assessment=assessment,
-                        title="New Assessment Available",
-                        message=f"{assessment.title} is now active. Deadline: {assessment.end_date.date()}",
-                    )
+            # assignments + notifications are fanned out in the background
+            schedule_assessment_fan_out(assessment.id)
 
         return ok(f"Assessment marked as {status_value}")
 
@@ -362,8 +354,6 @@ class CandidateAssessmentQuestionsView(APIView):
 class SubmitAssessmentUnifiedView(APIView):
     permission_classes = [IsAuthenticated]
 
-    QUESTIONS_MAX_SCORE = 10
-
     def post(self, request, assessment_id):
         assessment = get_object_or_404(Assessment, id=assessment_id)
 
@@ -393,82 +383,66 @@ class SubmitAssessmentUnifiedView(APIView):
         #  SAVE ANSWERS (optional)
         answers_payload = request.data.get("answers", [])
 
+        # one query validates every submitted question id
+        question_ids = set(
+            Question.objects.filter(assessment=assessment).values_list("id", flat=True)
+        )
+
+        answers_map = {}
         for item in answers_payload:
-            question_id = item.get("question_id")
-            answer_text = item.get("answer_text")
+            try:
+                question_id = int(item.get("question_id"))
+            except (TypeError, ValueError):
+                continue
 
-            if not question_id:
-                    continue
+            answer_text = item.get("answer_text")
 
-            # ❌ skip blank answers
+            # ❌ skip blank answers and foreign questions
             if answer_text is None or not str(answer_text).strip():
                 continue
-
-
-            question = Question.objects.filter(
-                id=question_id,
-                assessment=assessment
-            ).first()
-
-            if not question:
+            if question_id not in question_ids:
                 continue
 
-            Answer.objects.update_or_create(
-                user=request.user,
-                question=question,
-                defaults={"answer_text": answer_text},
-            )
-
-        
-        ua.status = "completed"
-        ua.submitted_at = submitted_at
-        ua.save(update_fields=["status", "submitted_at"])
+            answers_map[question_id] = str(answer_text)
 
-       
-        questions = list(
-            Question.objects.filter(assessment=assessment)
-        )
-
-        answers_map = {
-            a.question_id: a.answer_text
-            for a in Answer.objects.filter(
-                user=request.user,
-                question__assessment=assessment
+        with transaction.atomic():
+            # conditional flip: a concurrent/double submit matches 0 rows
+            claimed = UserAssessment.objects.filter(
+                id=ua.id
+            ).exclude(
+                status="completed"
+            ).update(
+                status="completed",
+                submitted_at=submitted_at,
+                scoring_status="pending",
+                answered_count=len(answers_map)
             )
-            if a.answer_text and a.answer_text.strip()
-}
-
+            if not claimed:
+                return err("Assessment already submitted")
 
-        ai_scores = score_assessment_answers(
-        questions=[{"id": q.id, "text": q.text} for q in questions],
-        answers=answers_map,
-        role=assessment.role,
-    )
+            bump_assessment_stats(assessment.id, completed_members=1)
 
-        total_score = sum(ai_scores.values())
-        answered_questions_count = len(answers_map)
-        max_score = answered_questions_count * self.QUESTIONS_MAX_SCORE
+            Answer.objects.bulk_create(
+                [
+                    Answer(user=request.user, question_id=qid, answer_text=text)
+                    for qid, text in answers_map.items()
+                ],
+                update_conflicts=True,
+                unique_fields=["user", "question"],
+                update_fields=["answer_text"],
+            )
 
-        Score.objects.update_or_create(
-            user=request.user,
-            assessment=assessment,
-            defaults={
-                "score": total_score,
-                "max_score": max_score,
-            },
-        )
+            # scored in the background; poll assessments/<id>/result/
+            schedule_scoring(ua.id)
 
         return ok(
-            "Assessment submitted and scored",
+            "Assessment submitted",
             {
                 "assessment_id": assessment.id,
                 "submitted_at": submitted_at,
-                "total_score": total_score,
-                "max_score": max_score,
-                "percentage": round(
-                    (total_score / max_score) * 100, 2
-                ) if max_score else 0,
+                "scoring_status": "pending",
             },
+            status_code=202,
         )
 
 class MarkNotificationReadView(APIView):
@@ -504,30 +478,41 @@ class MyAssessmentResultView(APIView):
         assessment = get_object_or_404(Assessment, id=assessment_id)
 
         # must be assigned
-        if not UserAssessment.objects.filter(
+        ua = UserAssessment.objects.filter(
             user=request.user,
             assessment=assessment,
             status="completed"
-        ).exists():
+        ).first()
+        if not ua:
             return err("Result not available", status_code=403)
 
-        score = Score.objects.filter(
-            user=request.user,
-            assessment=assessment
-        ).first()
+        data = {
+            "assessment_id": assessment.id,
+            "scoring_status": ua.scoring_status,
+        }
+
+        score = None
+        if ua.scoring_status == "scored":
+            score = Score.objects.filter(
+                user=request.user,
+                assessment=assessment
+            ).first()
 
-        if not score:
-            return err("Score not generated yet")
+        if score is None:
+            if ua.scoring_status == "scored":
+                # flagged scored but the Score row is missing: not ready yet
+                data["scoring_status"] = "pending"
+            return ok("Score not generated yet", data)
 
-        return ok(
-            "Result fetched",
-            {
-                "assessment_id": assessment.id,
-                "total_score": score.total_score,
-                "max_score": score.max_score,
-            },
-            status_code=200,
-        )
+        data.update({
+            "total_score": score.score,
+            "max_score": score.max_score,
+            "percentage": round(
+                (score.score / score.max_score) * 100, 2
+            ) if score.max_score else 0,
+            "feedback": score.feedback,
+        })
+        return ok("Result fetched", data)
 
 
 # class CreatorAssessmentHistoryView(APIView):
@@ -597,17 +582,8 @@ class CreatorAssessmentHistoryView(APIView):
         if request.user.role != "owner":
             qs = qs.filter(created_by=request.user)
 
-        qs = (
-            qs.annotate(
-                total_members=Count("userassessment", distinct=True),
-                completed_members=Count(
-                    "userassessment",
-                    filter=Q(userassessment__status="completed"),
-                    distinct=True,
-                ),
-            )
-            .order_by("-created_at")
-        )
+        # counts and averages come from the AssessmentStats rollup
+        qs = qs.select_related("stats", "created_by").order_by("-created_at")
 
         serializer = CreatorAssessmentHistorySerializer(qs, many=True)
         return ok("Assessment history fetched", serializer.data)
@@ -633,32 +609,8 @@ class ReviewAssessmentResultView(APIView):
             )
 
         
-        total_members = UserAssessment.objects.filter(
-            assessment=assessment
-        ).count()
-
-        completed_members = UserAssessment.objects.filter(
-            assessment=assessment,
-            status="completed"
-        ).count()
+        stats = AssessmentStats.objects.filter(assessment=assessment).first()
 
-        scores = Score.objects.filter(assessment=assessment)
-
-        avg_percentage = 0
-        if scores.exists():
-            avg_percentage = (
-                scores.aggregate(
-                    avg=Avg(
-                        ExpressionWrapper(
-                            F("total_score") * 100.0 / F("max_score"),
-                            output_field=FloatField(),
-                        )
-                    )
-                )["avg"]
-                or 0
-            )
-
-        # --- PARTICIPANTS ---
         participants = []
 
         questions_count = Question.objects.filter(
@@ -671,29 +623,25 @@ class ReviewAssessmentResultView(APIView):
             .select_related("user")
         )
 
+        # one query for every participant's score
+        scores = {
+            user_id: (score, max_score)
+            for user_id, score, max_score in Score.objects.filter(
+                assessment=assessment
+            ).values_list("user_id", "score", "max_score")
+        }
+
         for idx, ua in enumerate(user_assessments, start=1):
             user = ua.user
 
-            answered_count = Answer.objects.filter(
-                user=user,
-                question__assessment=assessment
-            ).count()
-
-            score = Score.objects.filter(
-                user=user,
-                assessment=assessment
-            ).first()
-
-            percentage = 0
-            if score and score.max_score > 0:
-                percentage = round((score.total_score / score.max_score) * 100)
+            percentage = round(score_percentage(*scores.get(user.id, (0, 0))))
 
             participants.append({
                 "id_no": idx,
                 "user_id": user.id,
                 "user_name": f"{user.first_name} {user.last_name}",
                 "clinic": assessment.clinic.name,
-                "answered": f"{answered_count}/{questions_count}",
+                "answered": f"{ua.answered_count}/{questions_count}",
                 "score": percentage,
             })
 
@@ -706,9 +654,9 @@ class ReviewAssessmentResultView(APIView):
                     "role": assessment.role,
                     "status": assessment.status,
                     "due_date": assessment.end_date.date(),
-                    "completed_members": completed_members,
-                    "total_members": total_members,
-                    "average_score": round(avg_percentage),
+                    "completed_members": stats.completed_members if stats else 0,
+                    "total_members": stats.total_members if stats else 0,
+                    "average_score": round(stats.average_percentage) if stats else 0,
                 },
                 "participants": participants,
             },
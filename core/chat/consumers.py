@@ -1,18 +1,177 @@
+import logging
+from urllib.parse import parse_qs
+
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import transaction
+
+from chat.guards import (
+    ensure_room_access,
+    get_private_chat_block,
+    get_socket_permissions,
+    get_subscribable_rooms,
+)
+from chat.models import ChatRoom, Message
+from chat.realtime import serialize_message_payload
+from chat.services_messages import (
+    create_message_with_mentions,
+    get_history_cutoff,
+    get_messages_after,
+    mark_room_read_and_clear_mentions,
+    publish_new_message,
+)
+from chat.services_recent import get_recent_messages_after
+
+logger = logging.getLogger(__name__)
 
-from chat.models import RoomUserState, Message
-from chat.services_messages import mark_room_read_and_clear_mentions
+# how long a client_id is remembered for duplicate-send detection (seconds)
+CLIENT_ID_TTL = 300
 
 
 @database_sync_to_async
 def can_user_connect(user, room_id):
-    return RoomUserState.objects.filter(
+    return ensure_room_access(user, room_id)
+
+
+@database_sync_to_async
+def load_socket_permissions(user):
+    return get_socket_permissions(user)
+
+
+@database_sync_to_async
+def load_subscribable_rooms(user, room_ids):
+    return get_subscribable_rooms(user, room_ids)
+
+
+@database_sync_to_async
+def send_message_from_socket(user, room_id, meta, content, mention_ids, group_autoreply):
+    """
+    Same checks as SendMessageView, minus the ones already settled when
+    the room was subscribed. Membership is re-checked (cached) on every
+    send, since removals don't always reach open sockets. Returns
+    (message, error).
+    """
+    if not ensure_room_access(user, room_id):
+        return None, {
+            "code": "ROOM_ACCESS_REVOKED",
+            "message": "You no longer have access to this room",
+        }
+
+    if meta["room_type"] == "private":
+        block = get_private_chat_block(user, meta["other_id"])
+        if block:
+            return None, {
+                "code": "CHAT_BLOCKED",
+                "message": "You cannot send messages to this user",
+                "blocked_by": "me" if block.blocker_id == user.id else "other",
+                "blocked_at": block.blocked_at.isoformat(),
+            }
+
+    room = ChatRoom.objects.get(id=room_id)
+
+    with transaction.atomic():
+        msg = create_message_with_mentions(
+            room=room,
+            sender=user,
+            content=content,
+            mention_user_ids=mention_ids
+        )
+
+        publish_new_message(
+            room=room,
+            message=msg,
+            group_autoreply=group_autoreply,
+        )
+
+    return msg, None
+
+
+@database_sync_to_async
+def mark_room_read_from_socket(room_id, user, last_message_id):
+    mark_room_read_and_clear_mentions(
         room_id=room_id,
         user=user,
-        is_blocked=False,   
-    ).exists()
+        last_message_id=last_message_id,
+    )
+
+
+@database_sync_to_async
+def load_history_cutoff(user, room_id):
+    return get_history_cutoff(user, room_id)
+
+
+@database_sync_to_async
+def load_resume_chunk(room_id, after_id, limit, hide_before):
+    cached = get_recent_messages_after(room_id, after_id, limit, hide_before)
+    if cached is not None:
+        return cached
+
+    return [
+        serialize_message_payload(m)
+        for m in get_messages_after(
+            room_id=room_id,
+            after_id=after_id,
+            limit=limit,
+            hide_before=hide_before,
+        )
+    ]
+
+
+async def stream_missed_messages(consumer, room_id, last_seen_message_id):
+    """
+    Replay messages newer than the client's cursor in bounded chunks.
+    The room group is joined before replaying, so a message may arrive
+    both live and in the replay; clients dedupe by id. Past
+    CHAT_RESUME_MAX_MESSAGES the replay stops with truncated=True and the
+    client pages the rest over HTTP.
+    """
+    chunk_size = getattr(settings, "CHAT_RESUME_CHUNK_SIZE", 50)
+    max_messages = getattr(settings, "CHAT_RESUME_MAX_MESSAGES", 500)
+
+    hide_before = await load_history_cutoff(consumer.scope["user"], room_id)
+    cursor = last_seen_message_id
+    sent = 0
+    truncated = False
+
+    while True:
+        batch = await load_resume_chunk(room_id, cursor, chunk_size + 1, hide_before)
+        has_more = len(batch) > chunk_size
+        batch = batch[:chunk_size]
+
+        if batch:
+            cursor = batch[-1]["id"]
+            sent += len(batch)
+            await consumer.send_json(
+                {
+                    "type": "resume",
+                    "room_id": room_id,
+                    "messages": batch,
+                    "has_more": has_more,
+                }
+            )
+
+        if not has_more:
+            break
+        if sent >= max_messages:
+            truncated = True
+            break
+
+    await consumer.send_json(
+        {
+            "type": "resume_complete",
+            "room_id": room_id,
+            "last_message_id": cursor,
+            "count": sent,
+            "truncated": truncated,
+        }
+    )
+
+
+def _parse_cursor(value):
+    return int(value) if str(value).isdigit() else None
 
 
 @database_sync_to_async
@@ -43,7 +202,11 @@ class ChatRoomConsumer(AsyncJsonWebsocketConsumer):
         self.room_id = int(self.scope["url_route"]["kwargs"]["room_id"])
         self.group_name = f"room_{self.room_id}"
 
-        allowed = await can_user_connect(user, self.room_id)
+        ticket = self.scope.get("ws_ticket")
+        if ticket and self.room_id in ticket["rooms"]:
+            allowed = True
+        else:
+            allowed = await can_user_connect(user, self.room_id)
         if not allowed:
             await self.close(code=4403)
             return
@@ -63,6 +226,12 @@ class ChatRoomConsumer(AsyncJsonWebsocketConsumer):
             }
         )
 
+        # ws/chat/<room_id>/?last_seen_message_id=123
+        qs = parse_qs(self.scope.get("query_string", b"").decode())
+        last_seen = _parse_cursor((qs.get("last_seen_message_id") or [None])[0])
+        if last_seen is not None:
+            await stream_missed_messages(self, self.room_id, last_seen)
+
     async def disconnect(self, close_code):
         if hasattr(self, "group_name"):
             await self.channel_layer.group_discard(
@@ -76,6 +245,7 @@ class ChatRoomConsumer(AsyncJsonWebsocketConsumer):
                 self.group_name,
                 {
                     "type": "typing_event",
+                    "room_id": self.room_id,
                     "user_id": self.scope["user"].id,
                 },
             )
@@ -110,3 +280,331 @@ class ChatRoomConsumer(AsyncJsonWebsocketConsumer):
             "user_id": event["user_id"],
             "reaction": event["reaction"],
         })
+
+    async def message_delta_event(self, event):
+        await self.send_json({
+            "type": "message_delta",
+            **{k: v for k, v in event.items() if k != "type"},
+        })
+
+
+
+def _parse_room_id(data):
+    value = data.get("room_id")
+    return int(value) if str(value).isdigit() else None
+
+
+def _parse_room_ids(data):
+    raw = data.get("room_ids")
+    if raw is None:
+        raw = [data.get("room_id")]
+    if not isinstance(raw, list):
+        return []
+    return list({int(x) for x in raw if str(x).isdigit()})
+
+
+class ChatConsumer(AsyncJsonWebsocketConsumer):
+    """
+    One socket per user, multiplexing any number of rooms.
+
+    Client frames:
+      {"type": "subscribe", "room_ids": [1, 2],
+       "last_seen_message_ids": {"1": 340}}        (or "room_id": 1,
+                                                    "last_seen_message_id": 340)
+      {"type": "unsubscribe", "room_ids": [1]}
+      {"type": "typing", "room_id": 1}
+      {"type": "read", "room_id": 1, "last_message_id": 99}
+      {"type": "send", "room_id": 1, "client_id": "tmp-1", "content": "hi",
+       "mention_user_ids": [5]}
+
+    A send is answered with {"type": "ack", "client_id", "message_id"} (or an
+    error carrying the same client_id); the message itself arrives through
+    the normal room broadcast. Every server event carries its room_id.
+    """
+
+    async def connect(self):
+        user = self.scope.get("user")
+
+        if not user or isinstance(user, AnonymousUser) or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+
+        self.rooms = {}
+        self.user_group = f"user_{user.id}"
+
+        # a ticket already carries permissions and pre-checked rooms
+        ticket = self.scope.get("ws_ticket")
+        if ticket:
+            self.permissions = ticket["permissions"]
+        else:
+            self.permissions = await load_socket_permissions(user)
+
+        # per-user events (not tied to a room)
+        await self.channel_layer.group_add(
+            self.user_group,
+            self.channel_name,
+        )
+
+        await self.accept()
+
+        await self.send_json(
+            {
+                "type": "connected",
+                "user_id": user.id,
+            }
+        )
+
+        if ticket and ticket["rooms"]:
+            await self.join_rooms(ticket["rooms"], list(ticket["rooms"]))
+
+    async def disconnect(self, close_code):
+        for room_id in getattr(self, "rooms", ()):
+            await self.channel_layer.group_discard(
+                f"room_{room_id}",
+                self.channel_name,
+            )
+
+        if hasattr(self, "user_group"):
+            await self.channel_layer.group_discard(
+                self.user_group,
+                self.channel_name,
+            )
+
+    async def receive_json(self, data):
+        handler = {
+            "subscribe": self.handle_subscribe,
+            "unsubscribe": self.handle_unsubscribe,
+            "typing": self.handle_typing,
+            "read": self.handle_read,
+            "send": self.handle_send,
+        }.get(data.get("type"))
+
+        if handler is None:
+            await self.send_error("UNKNOWN_FRAME", "Unknown frame type")
+            return
+
+        await handler(data)
+
+    async def send_error(self, code, message, **extra):
+        await self.send_json(
+            {
+                "type": "error",
+                "error": {"code": code, "message": message},
+                **extra,
+            }
+        )
+
+    # ---- client frames ----
+
+    async def handle_subscribe(self, data):
+        requested = [r for r in _parse_room_ids(data) if r not in self.rooms]
+        if not requested:
+            await self.send_json({"type": "subscribed", "room_ids": []})
+            return
+
+        limit = getattr(settings, "CHAT_WS_MAX_ROOMS", 200)
+        if len(self.rooms) + len(requested) > limit:
+            await self.send_error(
+                "TOO_MANY_ROOMS",
+                f"A socket can subscribe to at most {limit} rooms",
+            )
+            return
+
+        allowed = await load_subscribable_rooms(self.scope["user"], requested)
+        await self.join_rooms(allowed, requested)
+
+        cursors = data.get("last_seen_message_ids")
+        if not isinstance(cursors, dict):
+            cursors = {}
+        if "last_seen_message_id" in data and data.get("room_id") is not None:
+            cursors[str(data["room_id"])] = data["last_seen_message_id"]
+
+        for room_id in sorted(allowed):
+            last_seen = _parse_cursor(cursors.get(str(room_id)))
+            if last_seen is not None:
+                await stream_missed_messages(self, room_id, last_seen)
+
+    async def join_rooms(self, allowed, requested):
+        for room_id in allowed:
+            await self.channel_layer.group_add(
+                f"room_{room_id}",
+                self.channel_name,
+            )
+        self.rooms.update(allowed)
+
+        await self.send_json(
+            {
+                "type": "subscribed",
+                "room_ids": sorted(allowed),
+                "denied": sorted(set(requested) - set(allowed)),
+            }
+        )
+
+    async def handle_unsubscribe(self, data):
+        removed = [r for r in _parse_room_ids(data) if r in self.rooms]
+
+        for room_id in removed:
+            await self.channel_layer.group_discard(
+                f"room_{room_id}",
+                self.channel_name,
+            )
+            self.rooms.pop(room_id, None)
+
+        await self.send_json({"type": "unsubscribed", "room_ids": removed})
+
+    async def handle_typing(self, data):
+        room_id = _parse_room_id(data)
+        if room_id not in self.rooms:
+            await self.send_error("NOT_SUBSCRIBED", "Subscribe to the room first", room_id=room_id)
+            return
+
+        await self.channel_layer.group_send(
+            f"room_{room_id}",
+            {
+                "type": "typing_event",
+                "room_id": room_id,
+                "user_id": self.scope["user"].id,
+            },
+        )
+
+    async def handle_read(self, data):
+        room_id = _parse_room_id(data)
+        last_message_id = data.get("last_message_id")
+
+        if room_id not in self.rooms:
+            await self.send_error("NOT_SUBSCRIBED", "Subscribe to the room first", room_id=room_id)
+            return
+        if not str(last_message_id).isdigit():
+            await self.send_error("VALIDATION_ERROR", "last_message_id required", room_id=room_id)
+            return
+
+        await mark_room_read_from_socket(room_id, self.scope["user"], int(last_message_id))
+
+    async def handle_send(self, data):
+        room_id = _parse_room_id(data)
+        client_id = data.get("client_id")
+        reply = {"room_id": room_id, "client_id": client_id}
+
+        if not self.permissions["send"]:
+            await self.send_error("FORBIDDEN", "You cannot send messages", **reply)
+            return
+        if room_id not in self.rooms:
+            await self.send_error("NOT_SUBSCRIBED", "Subscribe to the room first", **reply)
+            return
+
+        content = str(data.get("content") or "").strip()
+        if not content:
+            await self.send_error("VALIDATION_ERROR", "content required", **reply)
+            return
+
+        # a retried frame with the same client_id must not create a duplicate
+        dedupe_key = None
+        if client_id:
+            dedupe_key = f"chat:ws_send:{self.scope['user'].id}:{client_id}"
+            if not await cache.aadd(dedupe_key, 0, CLIENT_ID_TTL):
+                existing = await cache.aget(dedupe_key)
+                if existing:
+                    await self.send_json({"type": "ack", "message_id": existing, **reply})
+                else:
+                    await self.send_error("DUPLICATE", "Message is already being sent", **reply)
+                return
+
+        mention_ids = data.get("mention_user_ids") or []
+        if not isinstance(mention_ids, list):
+            mention_ids = []
+
+        try:
+            msg, error = await send_message_from_socket(
+                self.scope["user"],
+                room_id,
+                self.rooms[room_id],
+                content,
+                mention_ids,
+                self.permissions["group_autoreply"],
+            )
+        except Exception:
+            # free the client_id so the client's retry isn't reported as a duplicate
+            logger.exception("Socket send to room %s failed", room_id)
+            if dedupe_key:
+                await cache.adelete(dedupe_key)
+            await self.send_error("INTERNAL_ERROR", "Message could not be sent", **reply)
+            return
+
+        if error:
+            if dedupe_key:
+                await cache.adelete(dedupe_key)
+            if error["code"] == "ROOM_ACCESS_REVOKED" and self.rooms.pop(room_id, None) is not None:
+                await self.channel_layer.group_discard(
+                    f"room_{room_id}",
+                    self.channel_name,
+                )
+            await self.send_json({"type": "error", "error": error, **reply})
+            return
+
+        if dedupe_key:
+            await cache.aset(dedupe_key, msg.id, CLIENT_ID_TTL)
+
+        await self.send_json(
+            {
+                "type": "ack",
+                "message_id": msg.id,
+                "created_at": msg.created_at.isoformat(),
+                **reply,
+            }
+        )
+
+    # ---- group events ----
+
+    async def message_event(self, event):
+        await self.send_json(
+            {
+                "type": "message",
+                "room_id": event["message"]["room_id"],
+                "data": event["message"],
+            }
+        )
+
+    async def typing_event(self, event):
+        if event["user_id"] == self.scope["user"].id:
+            return
+
+        await self.send_json(
+            {
+                "type": "typing",
+                "room_id": event.get("room_id"),
+                "user_id": event["user_id"],
+            }
+        )
+
+    async def reaction_event(self, event):
+        await self.send_json({
+            "type": "reaction",
+            "room_id": event.get("room_id"),
+            "message_id": event["message_id"],
+            "reactions": event["reactions"],
+            "user_id": event["user_id"],
+            "reaction": event["reaction"],
+        })
+
+    async def message_delta_event(self, event):
+        await self.send_json({
+            "type": "message_delta",
+            **{k: v for k, v in event.items() if k != "type"},
+        })
+
+    async def assessment_event(self, event):
+        await self.send_json({
+            "type": event["event"],
+            **{k: v for k, v in event.items() if k not in ("type", "event")},
+        })
+
+    async def room_access_revoked_event(self, event):
+        room_id = event["room_id"]
+        if self.rooms.pop(room_id, None) is None:
+            return
+
+        await self.channel_layer.group_discard(
+            f"room_{room_id}",
+            self.channel_name,
+        )
+        await self.send_json({"type": "unsubscribed", "room_ids": [room_id]})
@@ -1,8 +1,154 @@
-from .models import ChatParticipant, RoomUserState
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from permissions_app.services import has_permission
+from .models import ChatParticipant, RoomUserState, UserBlock
+from .realtime import queue_group_events
+
+# cached block lookups store this instead of None, which means "miss"
+NO_BLOCK = 0
+
+# Entries are keyed by a version that invalidation bumps after commit. A
+# reader that queried before the commit caches under the old version,
+# which nobody reads again, instead of overwriting a fresh delete.
+
+
+def _room_access_key(room_id):
+    return f"chat:room_access:{room_id}"
+
+
+def _private_block_key(user_id, other_id):
+    a, b = sorted([int(user_id), int(other_id)])
+    return f"chat:block:{a}:{b}"
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # missing/evicted: restart from a value no earlier version used
+        cache.set(key, time.time_ns(), None)
+
+
+def get_room_member_ids(room_id) -> frozenset:
+    """
+    Ids of users who may use the room: participants whose state is not
+    blocked. Cached per room; every membership write invalidates it.
+    """
+    base = _room_access_key(room_id)
+    key = f"{base}:{_version(f'{base}:ver')}"
+    member_ids = cache.get(key)
+    if member_ids is None:
+        participants = set(
+            ChatParticipant.objects.filter(room_id=room_id)
+            .values_list("user_id", flat=True)
+        )
+        member_ids = frozenset(
+            RoomUserState.objects.filter(
+                room_id=room_id,
+                user_id__in=participants,
+                is_blocked=False
+            ).values_list("user_id", flat=True)
+        )
+        cache.set(key, member_ids, getattr(settings, "CHAT_ACCESS_CACHE_TTL", 300))
+    return member_ids
+
 
 def ensure_room_access(user, room_id: int) -> bool:
-    if not ChatParticipant.objects.filter(room_id=room_id, user=user).exists():
-        return False
-    if not RoomUserState.objects.filter(room_id=room_id, user=user, is_blocked=False).exists():
-        return False
-    return True
+    return user.id in get_room_member_ids(room_id)
+
+
+def get_block_between(user_id, other_id):
+    """
+    Personal block between two users, either direction (cached per pair).
+    """
+    if other_id is None:
+        return None
+
+    base = _private_block_key(user_id, other_id)
+    key = f"{base}:{_version(f'{base}:ver')}"
+    block = cache.get(key)
+    if block is None:
+        block = UserBlock.objects.filter(
+            Q(blocker_id=user_id, blocked_id=other_id) |
+            Q(blocker_id=other_id, blocked_id=user_id)
+        ).first() or NO_BLOCK
+        cache.set(key, block, getattr(settings, "CHAT_ACCESS_CACHE_TTL", 300))
+    return block or None
+
+
+def get_private_chat_block(user, other_id):
+    """
+    Personal block between the two sides of a private chat, either direction.
+    """
+    return get_block_between(user.id, other_id)
+
+
+def invalidate_room_access(room_id):
+    """
+    Call after membership writes that bypass model signals (bulk_create,
+    queryset.update). Runs after commit so readers can't re-cache old rows.
+    """
+    transaction.on_commit(lambda: _bump(f"{_room_access_key(room_id)}:ver"))
+
+
+def revoke_room_access(room_id, user_ids):
+    """
+    invalidate_room_access for writes that remove (or block) members: also
+    drops the room from the removed users' open sockets after commit.
+    """
+    invalidate_room_access(room_id)
+    queue_group_events(
+        (f"user_{user_id}", {"type": "room_access_revoked_event", "room_id": room_id})
+        for user_id in user_ids
+    )
+
+
+def invalidate_private_block(user_id, other_id):
+    transaction.on_commit(lambda: _bump(f"{_private_block_key(user_id, other_id)}:ver"))
+
+
+def get_socket_permissions(user):
+    """
+    Permission flags a chat socket needs, resolved once per connection.
+    """
+    return {
+        "send": has_permission(user, "chat:send"),
+        "group_autoreply": has_permission(user, "chat:ai_group_autoreply"),
+    }
+
+
+def get_subscribable_rooms(user, room_ids):
+    """
+    One query for a whole batch of subscribe requests (plus one for
+    private-chat peers). Returns {room_id: {"room_type", "other_id"}}.
+    """
+    rooms = {
+        room_id: {"room_type": room_type, "other_id": None}
+        for room_id, room_type in RoomUserState.objects.filter(
+            room_id__in=room_ids,
+            user=user,
+            is_blocked=False,
+            room__participants__user=user,
+        ).values_list("room_id", "room__room_type")
+    }
+
+    private_ids = [r for r, meta in rooms.items() if meta["room_type"] == "private"]
+    if private_ids:
+        for room_id, other_id in ChatParticipant.objects.filter(
+            room_id__in=private_ids
+        ).exclude(user=user).values_list("room_id", "user_id"):
+            rooms[room_id]["other_id"] = other_id
+
+    return rooms
@@ -0,0 +1,115 @@
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+from core.ai.local import LocalAIProvider
+
+
+class FakeAIHandler(BaseHTTPRequestHandler):
+    """
+    Serves the HttpAIProvider contract with the local rule provider, plus
+    configurable latency and failures to exercise timeouts and retries.
+    """
+
+    provider = LocalAIProvider()
+    latency = 0.0
+    fail_rate = 0.0
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+
+        time.sleep(self.latency)
+        if random.random() < self.fail_rate:
+            return self._json(503, {"detail": "injected failure"})
+
+        p = self.provider
+        if self.path == "/v1/chat":
+            return self._json(200, {"reply": p.chat_reply(
+                payload.get("text", ""), has_attachments=payload.get("has_attachments", False)
+            )})
+
+        if self.path == "/v1/chat/stream":
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            for delta in p.stream_chat_reply(
+                payload.get("text", ""), has_attachments=payload.get("has_attachments", False)
+            ):
+                self.wfile.write(json.dumps({"delta": delta}).encode() + b"\n")
+                self.wfile.flush()
+                time.sleep(self.latency / 10)
+            return
+
+        if self.path == "/v1/moderate":
+            return self._json(200, p.moderate(payload))
+
+        if self.path == "/v1/assessments/questions":
+            return self._json(200, {"questions": p.generate_questions(
+                clinic_id=payload.get("clinic_id"),
+                role=payload.get("role"),
+                count=int(payload.get("count") or 0),
+            )})
+
+        if self.path == "/v1/assessments/score":
+            answers = payload.get("answers", {})
+            review = p.review_answers(
+                questions=payload.get("questions", []),
+                answers={int(k): v for k, v in answers.items()},
+                role=payload.get("role"),
+            )
+            return self._json(200, {
+                "scores": {str(k): v for k, v in review["scores"].items()},
+                "feedback": review["feedback"],
+            })
+
+        return self._json(404, {"detail": "Not found"})
+
+
+class Command(BaseCommand):
+    help = "Run a local fake AI backend for AI_PROVIDER=http"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0.0,
+            help="Seconds to wait before answering each request",
+        )
+        parser.add_argument(
+            "--fail-rate",
+            type=float,
+            default=0.0,
+            help="Fraction of requests answered with 503",
+        )
+
+    def handle(self, *args, **options):
+        FakeAIHandler.latency = options["latency"]
+        FakeAIHandler.fail_rate = options["fail_rate"]
+
+        server = ThreadingHTTPServer((options["host"], options["port"]), FakeAIHandler)
+        self.stdout.write(self.style.SUCCESS(
+            f"Fake AI backend on http://{options['host']}:{options['port']}"
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
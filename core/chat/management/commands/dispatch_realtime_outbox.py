@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from chat.realtime import drain_outbox
+
+
+class Command(BaseCommand):
+    help = "Continuously drain the realtime outbox into the channel layer"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0.5,
+            help="Seconds to sleep when the outbox is empty",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain what is queued and exit",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            sent = drain_outbox(options["batch_size"])
+
+            if options["once"]:
+                self.stdout.write(self.style.SUCCESS(f"Dispatched {sent} events"))
+                return
+
+            if not sent:
+                time.sleep(options["interval"])
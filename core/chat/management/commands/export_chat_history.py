@@ -0,0 +1,48 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from chat.services_export import EXPORT_FORMATS, iter_export
+
+
+class Command(BaseCommand):
+    help = "Stream a room, user or clinic chat history as NDJSON or CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--room", type=int, dest="room_id")
+        parser.add_argument("--user", type=int, dest="user_id")
+        parser.add_argument("--clinic", type=int, dest="clinic_id")
+        parser.add_argument("--since", help="YYYY-MM-DD")
+        parser.add_argument("--until", help="YYYY-MM-DD")
+        parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="ndjson", dest="fmt")
+        parser.add_argument("--output", "-o", help="File to write (default: stdout)")
+
+    def handle(self, *args, **options):
+        scope = {key: options[key] for key in ("room_id", "user_id", "clinic_id")}
+        for key in ("since", "until"):
+            try:
+                # None when malformed, ValueError for e.g. 2024-02-30
+                scope[key] = parse_date(options[key]) if options[key] else None
+            except ValueError:
+                scope[key] = None
+            if options[key] and scope[key] is None:
+                raise CommandError(f"--{key} must be YYYY-MM-DD")
+
+        try:
+            lines = iter_export(options["fmt"], **scope)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        out = open(options["output"], "w", encoding="utf-8", newline="") if options["output"] else sys.stdout
+        count = 0
+        try:
+            for line in lines:
+                out.write(line)
+                count += 1
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+        if options["output"]:
+            self.stdout.write(self.style.SUCCESS(f"Wrote {count} lines to {options['output']}"))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from chat.services_membership import reconcile_clinic_groups, schedule_clinic_group_reconcile
+
+
+class Command(BaseCommand):
+    help = "Sync clinic group room membership with clinic members and roles"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clinic", type=int, action="append", dest="clinic_ids")
+        parser.add_argument("--user", type=int, action="append", dest="user_ids")
+        parser.add_argument(
+            "--async",
+            action="store_true",
+            dest="use_celery",
+            help="Queue the work on Celery instead of running it here",
+        )
+
+    def handle(self, *args, **options):
+        scope = {"user_ids": options["user_ids"], "clinic_ids": options["clinic_ids"]}
+        if scope["user_ids"] is None and scope["clinic_ids"] is None:
+            raise CommandError("Pass at least one --clinic or --user")
+
+        if options["use_celery"]:
+            schedule_clinic_group_reconcile(**scope)
+            self.stdout.write(self.style.SUCCESS("Reconciliation queued"))
+            return
+
+        added, removed = reconcile_clinic_groups(**scope)
+        self.stdout.write(self.style.SUCCESS(f"Added {added}, removed {removed} memberships"))
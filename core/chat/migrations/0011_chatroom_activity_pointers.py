@@ -0,0 +1,61 @@
+# Generated by Django 5.2.9 on 2026-10-18 07:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_activity_pointers(apps, schema_editor):
+    ChatRoom = apps.get_model("chat", "ChatRoom")
+    Message = apps.get_model("chat", "Message")
+
+    last_ids = (
+        Message.objects.values("room_id")
+        .annotate(last_id=models.Max("id"))
+        .values_list("last_id", flat=True)
+    )
+
+    for msg in Message.objects.filter(id__in=list(last_ids)).iterator():
+        ChatRoom.objects.filter(id=msg.room_id).update(
+            last_message_id=msg.id,
+            last_message_at=msg.created_at,
+            last_sender_id=msg.sender_id,
+            last_message_preview=(msg.content or "")[:200],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0010_realtimeoutbox'),
+        ('medical', '0006_alter_clinicuser_clinic_alter_clinicuser_user'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message_preview',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_sender',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_activity_pointers, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='chatroom',
+            index=models.Index(fields=['-last_message_at', '-id'], name='chat_chatro_last_me_e033c4_idx'),
+        ),
+    ]
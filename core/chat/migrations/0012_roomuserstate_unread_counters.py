@@ -0,0 +1,71 @@
+# Generated by Django 5.2.9 on 2026-10-18 07:23
+
+from datetime import datetime, timezone
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_unread_counters(apps, schema_editor):
+    RoomUserState = apps.get_model("chat", "RoomUserState")
+    Message = apps.get_model("chat", "Message")
+    MessageMention = apps.get_model("chat", "MessageMention")
+    UserChatHistoryPreference = apps.get_model("chat", "UserChatHistoryPreference")
+
+    # same rules as services_messages.count_unread_messages
+    hide_before = UserChatHistoryPreference.objects.filter(
+        room_id=models.OuterRef("room_id"),
+        user_id=models.OuterRef(models.OuterRef("user_id")),
+    ).values("hide_history_before")[:1]
+    unread = (
+        Message.objects.filter(
+            room_id=models.OuterRef("room_id"),
+            id__gt=Coalesce(models.OuterRef("last_read_message_id"), 0),
+            is_deleted=False,
+            created_at__gt=Coalesce(
+                models.Subquery(hide_before),
+                models.Value(datetime(1970, 1, 1, tzinfo=timezone.utc)),
+                output_field=models.DateTimeField(),
+            ),
+        )
+        .exclude(sender_id=models.OuterRef("user_id"))
+        .values("room_id")
+        .annotate(c=models.Count("id"))
+        .values("c")
+    )
+    mentions = (
+        MessageMention.objects.filter(
+            message__room_id=models.OuterRef("room_id"),
+            mentioned_user_id=models.OuterRef("user_id"),
+            seen_at__isnull=True,
+        )
+        .values("mentioned_user_id")
+        .annotate(c=models.Count("id"))
+        .values("c")
+    )
+
+    RoomUserState.objects.filter(is_blocked=False, is_deleted=False).update(
+        unread_count=Coalesce(models.Subquery(unread), 0),
+        unread_mentions=Coalesce(models.Subquery(mentions), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0011_chatroom_activity_pointers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='roomuserstate',
+            name='unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='roomuserstate',
+            name='unread_mentions',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_unread_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,111 @@
+# Generated by Django 5.2.9 on 2026-10-18 07:43
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+# keep in sync with chat.services_search.SEARCH_CONFIG
+SEARCH_CONFIG = "english"
+BACKFILL_BATCH = 10000
+
+CREATE_TRIGGER = f"""
+CREATE OR REPLACE FUNCTION chat_message_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.content, ''));
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS chat_message_search_vector_trg ON chat_message;
+CREATE TRIGGER chat_message_search_vector_trg
+    BEFORE INSERT OR UPDATE OF content ON chat_message
+    FOR EACH ROW EXECUTE FUNCTION chat_message_search_vector_update();
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS chat_message_search_vector_trg ON chat_message;
+DROP FUNCTION IF EXISTS chat_message_search_vector_update();
+"""
+
+
+def create_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(CREATE_TRIGGER)
+
+
+def drop_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(DROP_TRIGGER)
+
+
+def backfill_search_vector(apps, schema_editor):
+    """
+    Fill existing rows in id ranges, one short transaction each, so a large
+    message table is never locked as a whole.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    Message = apps.get_model("chat", "Message")
+    last_id = Message.objects.order_by("-id").values_list("id", flat=True).first() or 0
+
+    with schema_editor.connection.cursor() as cursor:
+        for start in range(0, last_id, BACKFILL_BATCH):
+            cursor.execute(
+                "UPDATE chat_message "
+                "SET search_vector = to_tsvector(%s, coalesce(content, '')) "
+                "WHERE id > %s AND id <= %s",
+                [SEARCH_CONFIG, start, start + BACKFILL_BATCH],
+            )
+
+
+def create_search_index(apps, schema_editor):
+    Message = apps.get_model("chat", "Message")
+    index = django.contrib.postgres.indexes.GinIndex(
+        fields=["search_vector"], name="chat_message_search_gin"
+    )
+
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index.name} "
+            "ON chat_message USING gin (search_vector)"
+        )
+    else:
+        schema_editor.add_index(Message, index)
+
+
+def drop_search_index(apps, schema_editor):
+    schema_editor.execute("DROP INDEX IF EXISTS chat_message_search_gin")
+
+
+class Migration(migrations.Migration):
+
+    # batched backfill + CREATE INDEX CONCURRENTLY cannot run in one transaction
+    atomic = False
+
+    dependencies = [
+        ('chat', '0012_roomuserstate_unread_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_trigger, drop_search_trigger),
+        migrations.RunPython(backfill_search_vector, migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='message',
+                    index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='chat_message_search_gin'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(create_search_index, drop_search_index),
+            ],
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.9 on 2026-10-18 08:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+ACTIVITY_INDEX = models.Index(
+    models.OrderBy(models.F('last_message_at'), descending=True, nulls_last=True),
+    models.OrderBy(models.F('id'), descending=True),
+    name='chat_room_activity_idx',
+)
+
+
+def create_activity_index(apps, schema_editor):
+    ChatRoom = apps.get_model("chat", "ChatRoom")
+
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.add_index(ChatRoom, ACTIVITY_INDEX)
+    else:
+        # SQLite index definitions can't say NULLS LAST
+        schema_editor.add_index(
+            ChatRoom,
+            models.Index(fields=["-last_message_at", "-id"], name=ACTIVITY_INDEX.name),
+        )
+
+
+def drop_activity_index(apps, schema_editor):
+    schema_editor.execute(f"DROP INDEX IF EXISTS {ACTIVITY_INDEX.name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0013_message_search_vector'),
+        ('medical', '0007_clinicdeletionjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='chatroom',
+            name='chat_chatro_last_me_e033c4_idx',
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='chatroom',
+                    index=ACTIVITY_INDEX,
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(create_activity_index, drop_activity_index),
+            ],
+        ),
+    ]
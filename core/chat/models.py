@@ -1,4 +1,6 @@
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from medical.models import Clinic
@@ -49,6 +51,28 @@ class ChatRoom(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # activity pointers, kept current by create_message_with_mentions
+    last_message_id = models.BigIntegerField(null=True, blank=True)
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    last_sender = models.ForeignKey(
+        User,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="+"
+    )
+    last_message_preview = models.CharField(max_length=200, blank=True, default="")
+
+    class Meta:
+        # matches RoomListView's ordering; rooms without messages sort last
+        indexes = [
+            models.Index(
+                models.F("last_message_at").desc(nulls_last=True),
+                models.F("id").desc(),
+                name="chat_room_activity_idx",
+            )
+        ]
+
     def clean(self):
         if self.room_type != "group":
             if self.group_kind or self.role or self.clinic:
@@ -85,6 +109,9 @@ class RoomUserState(models.Model):
     is_deleted = models.BooleanField(default=False)
     deleted_at = models.DateTimeField(null=True, blank=True)
     last_read_message_id = models.BigIntegerField(null=True, blank=True)
+    # incremented on message/mention creation, reset when the room is read
+    unread_count = models.PositiveIntegerField(default=0)
+    unread_mentions = models.PositiveIntegerField(default=0)
 
     class Meta:
         unique_together = ("room", "user")
@@ -93,6 +120,13 @@ class RoomUserState(models.Model):
 #Message
 
         
+class MessageManager(models.Manager):
+    def get_queryset(self):
+        # search_vector is only ever used inside SQL (chat.services_search),
+        # so message reads don't carry the tsvector over the wire
+        return super().get_queryset().defer("search_vector")
+
+
 class Message(models.Model):
     room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, related_name="messages")
     sender = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
@@ -104,8 +138,16 @@ class Message(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_deleted = models.BooleanField(default=False)
 
+    # to_tsvector(content), maintained by a database trigger (migration 0013)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = MessageManager()
+
     class Meta:
-        indexes = [models.Index(fields=["room", "-id"])]
+        indexes = [
+            models.Index(fields=["room", "-id"]),
+            GinIndex(fields=["search_vector"], name="chat_message_search_gin"),
+        ]
 
 
 #Attachments
@@ -177,3 +219,17 @@ class UserChatHistoryPreference(models.Model):
             models.Index(fields=["user", "room"]),
             models.Index(fields=["room", "hide_history_before"]),
         ]
+
+
+class RealtimeOutbox(models.Model):
+    """
+    Channel-layer events written in the same transaction as the rows they
+    describe. chat.realtime.drain_outbox sends them after commit and deletes
+    them, so delivery is at-least-once and never happens for a rollback.
+    """
+    group = models.CharField(max_length=100)
+    event = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["id"]
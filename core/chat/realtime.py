@@ -1,6 +1,8 @@
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
-from chat.models import Message
+from django.conf import settings
+from django.db import transaction
+from chat.models import Message, RealtimeOutbox
 
 
 # def serialize_message_payload(message: Message):
@@ -45,18 +47,87 @@ def serialize_message_payload(message):
     }
 
 
-def broadcast_message(message: Message):
+def queue_group_event(group: str, event: dict):
     """
-    Send new message to room WS
+    Queue a channel-layer event; it is sent only after the surrounding
+    transaction commits (immediately, outside a transaction).
+    """
+    RealtimeOutbox.objects.create(group=group, event=event)
+    transaction.on_commit(kick_outbox_dispatcher)
+
+
+def queue_group_events(items):
+    """
+    Bulk variant of queue_group_event for fan-outs: items are (group, event).
     """
+    rows = [RealtimeOutbox(group=group, event=event) for group, event in items]
+    if not rows:
+        return
+
+    RealtimeOutbox.objects.bulk_create(rows)
+    transaction.on_commit(kick_outbox_dispatcher)
+
+
+def kick_outbox_dispatcher():
+    if getattr(settings, "CELERY_ENABLED", False):
+        from chat.tasks import dispatch_realtime_outbox
+
+        dispatch_realtime_outbox.delay()
+    else:
+        drain_outbox()
+
+
+def send_group_event_now(group: str, event: dict):
+    """
+    Send an ephemeral event straight to the channel layer, bypassing the
+    outbox. Only for transient updates (e.g. streamed AI deltas) that are
+    worthless if they arrive late and must not be persisted.
+    """
+    async_to_sync(get_channel_layer().group_send)(group, event)
+
+
+async def _send_batch(channel_layer, rows):
+    for row in rows:
+        await channel_layer.group_send(row.group, row.event)
+
+
+def drain_outbox(batch_size: int | None = None) -> int:
+    """
+    Send queued events in id order, one batch per transaction. Rows are
+    locked with SKIP LOCKED so several dispatchers can run side by side.
+    """
+    batch_size = batch_size or getattr(settings, "REALTIME_OUTBOX_BATCH_SIZE", 200)
     channel_layer = get_channel_layer()
-    payload = serialize_message_payload(message)
+    sent = 0
+
+    while True:
+        with transaction.atomic():
+            rows = list(
+                RealtimeOutbox.objects
+                .select_for_update(skip_locked=True)
+                .order_by("id")[:batch_size]
+            )
+            if not rows:
+                return sent
+
+            async_to_sync(_send_batch)(channel_layer, rows)
 
-    async_to_sync(channel_layer.group_send)(
+            RealtimeOutbox.objects.filter(
+                id__in=[r.id for r in rows]
+            ).delete()
+
+        sent += len(rows)
+
+
+def broadcast_message(message: Message):
+    """
+    Send new message to room WS
+    """
+    queue_group_event(
         f"room_{message.room_id}",
         {
             "type": "message_event",
-            "message": payload,
+            "message": serialize_message_payload(message),
         }
     )
 
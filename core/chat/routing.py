@@ -1,6 +1,7 @@
 from django.urls import re_path
-from .consumers import ChatRoomConsumer
+from .consumers import ChatRoomConsumer, ChatConsumer
 
 websocket_urlpatterns = [
+    re_path(r"ws/chat/$", ChatConsumer.as_asgi()),
     re_path(r"ws/chat/(?P<room_id>\d+)/$", ChatRoomConsumer.as_asgi()),
 ]
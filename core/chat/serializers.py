@@ -1,5 +1,6 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
-from .models import Message ,ChatRoom
+from .models import Message ,ChatRoom, MessageReaction
 from medical.models import ClinicUser
 from accounts.models import User
 
@@ -24,6 +25,10 @@ class MessageSerializer(serializers.ModelSerializer):
             "my_reaction",
         )
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._reaction_summaries = {}
+
     def get_sender(self, obj):
         if not obj.sender:
             return None
@@ -44,44 +49,46 @@ class MessageSerializer(serializers.ModelSerializer):
             for a in obj.attachments.all()
         ]
 
-    def get_reactions(self, obj):
-        likes = obj.reactions.filter(reaction="like").select_related("user")
-        dislikes = obj.reactions.filter(reaction="dislike").select_related("user")
+    def _reaction_summary(self, obj):
+        # one pass over the prefetched reactions, shared by both fields
+        cache = self._reaction_summaries
+        if obj.pk in cache:
+            return cache[obj.pk]
 
-        return {
-            "like": {
-                "count": likes.count(),
-                "users": [
-                    {
-                        "id": r.user.id,
-                        "name": f"{r.user.first_name} {r.user.last_name}".strip()
-                                or r.user.email,
-                        "role": r.user.role,
-                    }
-                    for r in likes
-                ],
-            },
-            "dislike": {
-                "count": dislikes.count(),
-                "users": [
-                    {
-                        "id": r.user.id,
-                        "name": f"{r.user.first_name} {r.user.last_name}".strip()
-                                or r.user.email,
-                        "role": r.user.role,
-                    }
-                    for r in dislikes
-                ],
-            },
-        }
+        req = self.context.get("request")
+        viewer_id = req.user.id if req and not req.user.is_anonymous else None
+
+        summary = {"like": [], "dislike": []}
+        mine = None
+        for r in obj.reactions.all():
+            if r.reaction in summary:
+                summary[r.reaction].append({
+                    "id": r.user.id,
+                    "name": f"{r.user.first_name} {r.user.last_name}".strip()
+                            or r.user.email,
+                    "role": r.user.role,
+                })
+            if r.user_id == viewer_id:
+                mine = r.reaction
+
+        cache[obj.pk] = (
+            {k: {"count": len(users), "users": users} for k, users in summary.items()},
+            mine,
+        )
+        return cache[obj.pk]
+
+    def get_reactions(self, obj):
+        return self._reaction_summary(obj)[0]
 
     def get_my_reaction(self, obj):
-        req = self.context.get("request")
-        if not req or req.user.is_anonymous:
-            return None
+        return self._reaction_summary(obj)[1]
+
 
-        r = obj.reactions.filter(user=req.user).first()
-        return r.reaction if r else None
+# use with MessageSerializer so reactions and their users load in one query
+REACTIONS_PREFETCH = Prefetch(
+    "reactions",
+    queryset=MessageReaction.objects.select_related("user").order_by("id"),
+)
 
 
 
@@ -1,9 +1,8 @@
 from django.db import transaction
+from core.ai import get_provider
 from chat.models import ChatRoom, Message
 from chat.services_messages import create_message_with_mentions
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-from chat.realtime import serialize_message_payload
+from chat.realtime import broadcast_message, queue_group_event, send_group_event_now
 from accounts.models import User
 
 
@@ -12,10 +11,12 @@ def send_ai_message(
     *,
     room: ChatRoom,
     content: str,
+    parent_message: Message | None = None,
 ):
     """
     Internal-only AI message sender.
     NO authentication required.
+    parent_message links a reply to the message it answers.
     """
 
     ai_user = User.objects.filter(
@@ -36,51 +37,103 @@ def send_ai_message(
         room=room,
         sender=ai_user,
         content=content,
-        mention_user_ids=[]
+        mention_user_ids=[],
+        parent_message=parent_message,
     )
 
-    
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
-        f"room_{room.id}",
-        {
-            "type": "message_event",
-            "message": serialize_message_payload(msg),
-        }
-    )
+    broadcast_message(msg)
 
     return msg
 
 
 # chat/services_ai.py
 
-def get_reply(user_message: str | None, *, has_attachments: bool = False) -> str:
+def get_reply(user_message: str | None, *, has_attachments: bool = False, clinic_id=None) -> str:
     """
-    Temporary AI logic.
-    Replace later with OpenAI / LLM.
+    AI reply for a chat message, from the configured provider (core.ai).
     """
+    return get_provider().chat_reply(
+        user_message or "",
+        has_attachments=has_attachments,
+        clinic_id=clinic_id,
+    )
 
-    text = (user_message or "").lower().strip()
-
-    # CASE 1: FILE-ONLY MESSAGE
-    if not text and has_attachments:
-        return "I’ve received the file 📎. What would you like me to do with it?"
 
-    # CASE 2: Greeting
-    if text in ("hi", "hello", "hey"):
-        return "Hello 👋 How can I help you today?"
+def stream_reply(user_message: str | None, *, has_attachments: bool = False, clinic_id=None):
+    """
+    Yield the reply in chunks as the provider produces them.
+    """
+    yield from get_provider().stream_chat_reply(
+        user_message or "",
+        has_attachments=has_attachments,
+        clinic_id=clinic_id,
+    )
 
-    # ✅ CASE 3: Asking for help
-    if "help" in text:
-        return "Sure 🙂 Tell me what you need help with."
 
-    # ✅ CASE 4: Empty message, no file
-    if not text:
-        return ""
+def stream_ai_reply(*, room: ChatRoom, message: Message, has_attachments: bool = False, attempt: int = 0):
+    """
+    Stream the AI answer to `message` into room_<id> as message_delta events,
+    then store it as a normal AI message replying to `message`. Meant to
+    run in a worker.
 
-    # ✅ CASE 5: Default
-    return "I’m here 🤖 Please tell me more."
+    Every attempt streams under its own stream_id; a stream that breaks
+    midway ends with an error delta so clients drop the partial draft
+    before a retry starts a new one.
+    """
+    group = f"room_{room.id}"
+    stream_id = f"ai-{message.id}" if not attempt else f"ai-{message.id}-{attempt}"
+
+    parts = []
+    chunks = stream_reply(
+        message.content,
+        has_attachments=has_attachments,
+        clinic_id=room.clinic_id,
+    )
+    try:
+        for seq, delta in enumerate(chunks):
+            parts.append(delta)
+            send_group_event_now(
+                group,
+                {
+                    "type": "message_delta_event",
+                    "room_id": room.id,
+                    "stream_id": stream_id,
+                    "seq": seq,
+                    "delta": delta,
+                }
+            )
+    except Exception:
+        send_group_event_now(
+            group,
+            {
+                "type": "message_delta_event",
+                "room_id": room.id,
+                "stream_id": stream_id,
+                "error": True,
+            }
+        )
+        raise
+
+    content = "".join(parts).strip()
+    if not content:  # empty reply is ignored
+        return None
+
+    with transaction.atomic():
+        msg = send_ai_message(room=room, content=content, parent_message=message)
+
+        # queued after the message itself, so clients swap the draft for it
+        queue_group_event(
+            group,
+            {
+                "type": "message_delta_event",
+                "room_id": room.id,
+                "stream_id": stream_id,
+                "done": True,
+                "message_id": msg.id,
+            }
+        )
 
+    return msg
 
 
 # def build_ai_prompt(user, message_text: str) -> str:
@@ -0,0 +1,138 @@
+import csv
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from chat.models import Message, MessageReaction, RoomUserState
+
+CSV_COLUMNS = (
+    "id", "room_id", "room_type", "room_name", "clinic_id",
+    "sender_id", "sender_email", "sender_name", "is_ai", "is_deleted",
+    "parent_message_id", "created_at", "content", "attachments", "reactions",
+)
+
+
+def export_queryset(*, room_id=None, user_id=None, clinic_id=None, since=None, until=None):
+    """
+    Messages to export, oldest first. A user export covers every room the
+    user still has in their history (as in UserRoomHistoryView). Filters
+    combine; at least one of room_id / user_id / clinic_id is required.
+    """
+    if not (room_id or user_id or clinic_id):
+        raise ValueError("room_id, user_id or clinic_id is required")
+
+    qs = Message.objects.all()
+
+    if room_id:
+        qs = qs.filter(room_id=room_id)
+    if clinic_id:
+        qs = qs.filter(room__clinic_id=clinic_id)
+    if user_id:
+        qs = qs.filter(
+            room_id__in=RoomUserState.objects.filter(
+                user_id=user_id,
+                is_deleted=False
+            ).values("room_id")
+        )
+    if since:
+        qs = qs.filter(created_at__date__gte=since)
+    if until:
+        qs = qs.filter(created_at__date__lte=until)
+
+    return (
+        qs.select_related("room", "sender")
+        .prefetch_related(
+            "attachments",
+            Prefetch("reactions", queryset=MessageReaction.objects.order_by("id")),
+        )
+        .order_by("id")
+    )
+
+
+def iter_export_rows(qs, chunk_size=None):
+    """
+    One dict per message. iterator() streams through a server-side cursor
+    and prefetches attachments/reactions per chunk, so memory stays flat
+    whatever the history size.
+    """
+    chunk_size = chunk_size or getattr(settings, "CHAT_EXPORT_CHUNK_SIZE", 2000)
+
+    for m in qs.iterator(chunk_size=chunk_size):
+        yield {
+            "id": m.id,
+            "room_id": m.room_id,
+            "room_type": m.room.room_type,
+            "room_name": m.room.name,
+            "clinic_id": m.room.clinic_id,
+            "sender_id": m.sender_id,
+            "sender_email": m.sender.email if m.sender else None,
+            "sender_name": (
+                f"{m.sender.first_name} {m.sender.last_name}".strip() if m.sender else None
+            ),
+            "is_ai": m.is_ai,
+            "is_deleted": m.is_deleted,
+            "parent_message_id": m.parent_message_id,
+            "created_at": m.created_at,
+            "content": m.content,
+            "attachments": [
+                {
+                    "id": a.id,
+                    "name": a.file.name,
+                    "type": a.attachment_type,
+                    "uploaded_at": a.uploaded_at,
+                }
+                for a in m.attachments.all()
+            ],
+            "reactions": [
+                {
+                    "user_id": r.user_id,
+                    "reaction": r.reaction,
+                    "created_at": r.created_at,
+                }
+                for r in m.reactions.all()
+            ],
+        }
+
+
+def _dumps(value):
+    return json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+class _Echo:
+    # csv.writer target that hands each formatted line back
+    def write(self, value):
+        return value
+
+
+def iter_ndjson(rows):
+    for row in rows:
+        yield _dumps(row) + "\n"
+
+
+def iter_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_COLUMNS)
+
+    for row in rows:
+        yield writer.writerow([
+            _dumps(row[col]) if col in ("attachments", "reactions")
+            else row[col].isoformat() if col == "created_at"
+            else row[col]
+            for col in CSV_COLUMNS
+        ])
+
+
+EXPORT_FORMATS = {
+    "ndjson": (iter_ndjson, "application/x-ndjson"),
+    "csv": (iter_csv, "text/csv"),
+}
+
+
+def iter_export(fmt, **scope):
+    """
+    Encoded export lines in the given format ("ndjson" or "csv").
+    """
+    encode, _ = EXPORT_FORMATS[fmt]
+    return encode(iter_export_rows(export_queryset(**scope)))
@@ -26,40 +26,163 @@ from chat.models import ChatRoom, ChatParticipant, RoomUserState
 #             room=room,
 #             user=user
 #         )
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from chat.guards import invalidate_room_access, revoke_room_access
 from chat.models import ChatRoom, ChatParticipant, RoomUserState
-from medical.models import Clinic   # adjust import if needed
+from medical.models import Clinic, ClinicUser
 
-def auto_join_clinic_groups_for_user(user, clinic):
-    # 🔒 Normalize clinic to model instance
-    if isinstance(clinic, int):
-        clinic = Clinic.objects.filter(id=clinic).first()
-        if not clinic:
-            return  # clinic deleted or invalid
-
-    rooms = ChatRoom.objects.filter(
-        room_type="group",
-        clinic=clinic
+# clinic groups whose membership is derived from ClinicUser + User.role
+MANAGED_GROUP_KINDS = ("clinic_all", "clinic_role")
+
+
+@transaction.atomic
+def reconcile_clinic_groups(*, user_ids=None, clinic_ids=None, previous_role=None):
+    """
+    Bring managed clinic group rooms in line with clinic membership and
+    roles for the given users and/or clinics (at least one is required).
+
+    Desired membership is computed as a set: every active clinic member
+    belongs to the clinic_all rooms and to the clinic_role rooms of their
+    role. Missing rows are bulk inserted. Only on a role change
+    (previous_role given) are the users taken out of that role's
+    clinic_role rooms; members an admin added to another role's room on
+    purpose stay. Existing RoomUserState rows (read markers, soft
+    deletes) are left untouched.
+    Returns (added, removed) membership counts.
+    """
+    if user_ids is None and clinic_ids is None:
+        raise ValueError("reconcile_clinic_groups needs user_ids or clinic_ids")
+
+    members = ClinicUser.objects.filter(
+        user__is_active=True,
+        user__is_deleted=False,
     )
+    if user_ids is not None:
+        members = members.filter(user_id__in=user_ids)
+    if clinic_ids is not None:
+        members = members.filter(clinic_id__in=clinic_ids)
 
-    print("AUTO JOIN:", user.id, clinic.id)
+    members = list(members.values_list("user_id", "clinic_id", "user__role"))
+    if not members:
+        return 0, 0
+
+    rooms = list(
+        ChatRoom.objects.filter(
+            room_type="group",
+            group_kind__in=MANAGED_GROUP_KINDS,
+            clinic_id__in={clinic_id for _, clinic_id, _ in members},
+        ).values_list("id", "clinic_id", "group_kind", "role")
+    )
+    if not rooms:
+        return 0, 0
 
+    rooms_by_clinic = {}
     for room in rooms:
-        join = False
+        rooms_by_clinic.setdefault(room[1], []).append(room)
 
-        if room.group_kind == "clinic_all":
-            join = True
-        elif room.group_kind == "clinic_role" and room.role == user.role:
-            join = True
+    desired = set()
+    left_behind = set()
+    for user_id, clinic_id, role in members:
+        for room_id, _, kind, room_role in rooms_by_clinic.get(clinic_id, ()):
+            if kind == "clinic_all" or room_role == role:
+                desired.add((room_id, user_id))
+            elif previous_role is not None and room_role == previous_role:
+                left_behind.add((room_id, user_id))
 
-        if not join:
-            continue
+    scope_users = {user_id for user_id, _, _ in members}
+    current = set(
+        ChatParticipant.objects.filter(
+            room_id__in=[r[0] for r in rooms],
+            user_id__in=scope_users,
+        ).values_list("room_id", "user_id")
+    )
 
-        ChatParticipant.objects.get_or_create(
-            room=room,
-            user=user
-        )
+    to_add = desired - current
+    to_remove = left_behind & current
 
-        RoomUserState.objects.get_or_create(
-            room=room,
-            user=user
+    if to_add:
+        ChatParticipant.objects.bulk_create(
+            [ChatParticipant(room_id=r, user_id=u) for r, u in to_add],
+            ignore_conflicts=True
         )
+        RoomUserState.objects.bulk_create(
+            [RoomUserState(room_id=r, user_id=u) for r, u in to_add],
+            ignore_conflicts=True
+        )
+
+    if to_remove:
+        by_room = {}
+        for room_id, user_id in to_remove:
+            by_room.setdefault(room_id, []).append(user_id)
+
+        for room_id, room_user_ids in by_room.items():
+            ChatParticipant.objects.filter(room_id=room_id, user_id__in=room_user_ids).delete()
+            RoomUserState.objects.filter(room_id=room_id, user_id__in=room_user_ids).delete()
+            revoke_room_access(room_id, room_user_ids)
+
+    for room_id in {r for r, _ in to_add}:
+        invalidate_room_access(room_id)
+
+    return len(to_add), len(to_remove)
+
+
+def schedule_clinic_group_reconcile(*, user_ids=None, clinic_ids=None):
+    """
+    Run reconcile_clinic_groups in a Celery worker after commit when Celery
+    is enabled (large clinics, bulk role changes), otherwise inline.
+    """
+    if not getattr(settings, "CELERY_ENABLED", False):
+        return reconcile_clinic_groups(user_ids=user_ids, clinic_ids=clinic_ids)
+
+    from chat.tasks import reconcile_clinic_groups_task
+
+    user_ids = list(user_ids) if user_ids is not None else None
+    clinic_ids = list(clinic_ids) if clinic_ids is not None else None
+    transaction.on_commit(
+        lambda: reconcile_clinic_groups_task.delay(user_ids=user_ids, clinic_ids=clinic_ids)
+    )
+
+
+def auto_join_clinic_groups_for_user(user, clinic):
+    clinic_id = clinic.id if isinstance(clinic, Clinic) else clinic
+    reconcile_clinic_groups(user_ids=[user.id], clinic_ids=[clinic_id])
+
+
+def remove_user_from_group_rooms(user_id):
+    """
+    Deactivation: leave every group room, soft-delete the room states.
+    """
+    remove_users_from_group_rooms([user_id])
+
+
+def remove_users_from_group_rooms(user_ids):
+    """
+    Set-based remove_user_from_group_rooms for bulk deactivations that go
+    through QuerySet.update() and therefore skip the User signals.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+
+    by_room = {}
+    for room_id, user_id in ChatParticipant.objects.filter(
+        user_id__in=user_ids,
+        room__room_type="group"
+    ).values_list("room_id", "user_id"):
+        by_room.setdefault(room_id, []).append(user_id)
+
+    ChatParticipant.objects.filter(user_id__in=user_ids, room_id__in=by_room).delete()
+
+    RoomUserState.objects.filter(
+        user_id__in=user_ids,
+        room__room_type="group"
+    ).update(
+        is_deleted=True,
+        deleted_at=timezone.now()
+    )
+
+    for room_id, room_user_ids in by_room.items():
+        revoke_room_access(room_id, room_user_ids)
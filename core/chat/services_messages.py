@@ -1,22 +1,82 @@
+import logging
+
 from django.db import transaction
 from django.utils import timezone
 from notifications.models import Notification
 from accounts.models import User
 from chat.models import UserBlock
-from .models import Message, MessageMention, ChatParticipant, RoomUserState
+from django.db.models import F, Q
+from .models import ChatRoom, Message, MessageMention, ChatParticipant, RoomUserState, UserChatHistoryPreference
 from accounts.models import User
 from channels.db import database_sync_to_async
+PREVIEW_LENGTH = 200
+
+logger = logging.getLogger(__name__)
+
+
+def touch_room_activity(msg: Message):
+    """
+    Move the room's last-message pointers forward (never backwards, so
+    concurrent senders can't leave an older message on top).
+    """
+    ChatRoom.objects.filter(
+        Q(last_message_id__isnull=True) | Q(last_message_id__lt=msg.id),
+        id=msg.room_id,
+    ).update(
+        last_message_id=msg.id,
+        last_message_at=msg.created_at,
+        last_sender_id=msg.sender_id,
+        last_message_preview=(msg.content or "")[:PREVIEW_LENGTH],
+    )
+
+
+def retract_room_activity(*, room_id: int, message_id: int):
+    """
+    The message on top of the room was deleted / soft-deleted: point the
+    room back at its newest remaining message. A no-op when a newer
+    message already took its place.
+    """
+    newest = (
+        Message.objects
+        .filter(room_id=room_id, is_deleted=False)
+        .exclude(id=message_id)
+        .order_by("-id")
+        .first()
+    )
+    ChatRoom.objects.filter(id=room_id, last_message_id=message_id).update(
+        last_message_id=newest.id if newest else None,
+        last_message_at=newest.created_at if newest else None,
+        last_sender_id=newest.sender_id if newest else None,
+        last_message_preview=(newest.content or "")[:PREVIEW_LENGTH] if newest else "",
+    )
+
+
 @transaction.atomic
-def create_message_with_mentions(room, sender, content: str, mention_user_ids: list[int]) -> Message:
-    msg = Message.objects.create(room=room, sender=sender, content=content)
+def create_message_with_mentions(room, sender, content: str, mention_user_ids: list[int], parent_message=None) -> Message:
+    msg = Message.objects.create(room=room, sender=sender, content=content, parent_message=parent_message)
+    touch_room_activity(msg)
+
+    # blocked / soft-deleted states don't count unread (same rule as mentions)
+    RoomUserState.objects.filter(
+        room=room, is_blocked=False, is_deleted=False
+    ).exclude(user=sender).update(
+        unread_count=F("unread_count") + 1
+    )
 
     mention_user_ids = list({int(x) for x in (mention_user_ids or []) if str(x).isdigit()})
     if not mention_user_ids:
         return msg
 
-    # only participants can be mentioned
+    # only participants can be mentioned; mentioning yourself isn't unread
     allowed = set(ChatParticipant.objects.filter(room=room, user_id__in=mention_user_ids)
                   .values_list("user_id", flat=True))
+    allowed.discard(sender.id)
+
+    RoomUserState.objects.filter(
+        room=room, user_id__in=allowed, is_blocked=False, is_deleted=False
+    ).update(
+        unread_mentions=F("unread_mentions") + 1
+    )
 
     for uid in allowed:
         MessageMention.objects.get_or_create(message=msg, mentioned_user_id=uid)
@@ -38,77 +98,103 @@ def create_message_with_mentions(room, sender, content: str, mention_user_ids: l
 
     return msg
 
-# def mark_room_read_and_clear_mentions(room_id: int, user, last_message_id: int):
-#     from .models import RoomUserState, MessageMention
-#     st, _ = RoomUserState.objects.get_or_create(room_id=room_id, user=user)
-#     st.last_read_message_id = last_message_id
-#     st.save(update_fields=["last_read_message_id"])
 
-#     MessageMention.objects.filter(
-#         mentioned_user=user,
-#         message__room_id=room_id,
-#         message_id__lte=last_message_id,
-#         seen_at__isnull=True
-#     ).update(seen_at=timezone.now())
+def get_history_cutoff(user, room_id: int):
+    """
+    hide_history_before set by the user's soft-delete of the room, or None.
+    """
+    return (
+        UserChatHistoryPreference.objects
+        .filter(user=user, room_id=room_id)
+        .values_list("hide_history_before", flat=True)
+        .first()
+    )
+
+
+def get_messages_after(*, room_id: int, after_id: int, limit: int, hide_before=None):
+    """
+    Oldest-first messages with id > after_id, for resuming a socket.
+    """
+    qs = Message.objects.filter(room_id=room_id, id__gt=after_id)
+
+    if hide_before:
+        qs = qs.filter(created_at__gt=hide_before)
+
+    return list(
+        qs.select_related("sender")
+          .prefetch_related("attachments")
+          .order_by("id")[:limit]
+    )
+
 
+def publish_new_message(*, room, message, has_attachments=False, ai_reply=True, group_autoreply=False):
+    """
+    Realtime fan-out plus AI follow-ups for a freshly stored message.
+    Shared by the HTTP send view and the chat socket; call it inside the
+    transaction that stored the message so the broadcast commits with it.
+    """
+    from chat.realtime import broadcast_message
 
-# def mark_room_read_and_clear_mentions(*, room_id: int, user, last_message_id: int):
-#     # 🔹 update room read state
-#     st, _ = RoomUserState.objects.get_or_create(
-#         room_id=room_id,
-#         user=user
-#     )
-#     st.last_read_message_id = last_message_id
-#     st.save(update_fields=["last_read_message_id"])
+    broadcast_message(message)
 
-#     # 🔹 find unread mentions that were actually read
-#     mentions_qs = MessageMention.objects.filter(
-#         mentioned_user=user,
-#         message__room_id=room_id,
-#         message_id__lte=last_message_id,
-#         seen_at__isnull=True
-#     )
+    transaction.on_commit(
+        lambda: _run_ai_followups(
+            room=room,
+            message=message,
+            has_attachments=has_attachments,
+            ai_reply=ai_reply,
+            group_autoreply=group_autoreply,
+        )
+    )
 
-#     mention_message_ids = list(
-#         mentions_qs.values_list("message_id", flat=True)
-#     )
 
-#     # 🔹 mark mentions as seen
-#     mentions_qs.update(seen_at=timezone.now())
+def _run_ai_followups(*, room, message, has_attachments, ai_reply, group_autoreply):
+    from django.conf import settings
 
-#     # 🔹 sync notifications (VERY IMPORTANT)
-#     if mention_message_ids:
-#         Notification.objects.filter(
-#             user=user,
-#             type="mention",
-#             message_id__in=mention_message_ids,
-#             is_seen=False
-#         ).update(is_seen=True)
-        
+    # AI group auto-reply (only if real human message)
+    if room.room_type == "group" and group_autoreply:
+        from .tasks import group_ai_reply_if_no_human_response
 
+        if getattr(settings, "CELERY_ENABLED", False):
+            group_ai_reply_if_no_human_response.apply_async(
+                args=[message.id],
+                countdown=180
+            )
 
-# def can_users_chat(user1: User, user2: User) -> bool:
-#     # 🔒 system-level block
-#     if user1.is_blocked or user2.is_blocked:
-#         return False
+    # AI room reply: generated and streamed by a worker, never in the request
+    if room.room_type == "ai" and ai_reply:
+        if getattr(settings, "CELERY_ENABLED", False):
+            from .tasks import ai_reply_to_message
 
-#     # 🔒 personal block (either direction)
-#     if UserBlock.objects.filter(
-#         blocker=user1,
-#         blocked=user2
-#     ).exists():
-#         return False
+            ai_reply_to_message.delay(message.id, has_attachments)
+        else:
+            _reply_inline(room=room, message=message, has_attachments=has_attachments)
 
-#     if UserBlock.objects.filter(
-#         blocker=user2,
-#         blocked=user1
-#     ).exists():
-#         return False
 
-#     return True
+def _reply_inline(*, room, message, has_attachments):
+    # runs in the request's on_commit: the user's message is already stored,
+    # so no failure here (provider, missing AI user, ...) may turn into a 500
+    from chat.services_ai import stream_ai_reply
 
+    try:
+        stream_ai_reply(room=room, message=message, has_attachments=has_attachments)
+    except Exception:
+        logger.exception("AI reply to message %s failed", message.id)
 
 
+def count_unread_messages(*, room_id: int, user, after_id: int):
+    """
+    Messages after after_id the user would see in the room's history:
+    not deleted, not their own and not hidden by their history cutoff.
+    """
+    qs = Message.objects.filter(
+        room_id=room_id, id__gt=after_id, is_deleted=False
+    ).exclude(sender=user)
+
+    hide_before = get_history_cutoff(user, room_id)
+    if hide_before:
+        qs = qs.filter(created_at__gt=hide_before)
+    return qs.count()
 
 
 def mark_room_read_and_clear_mentions(*, room_id: int, user, last_message_id: int):
@@ -124,9 +210,6 @@ def mark_room_read_and_clear_mentions(*, room_id: int, user, last_message_id: in
         if effective == prev:
             return
 
-        st.last_read_message_id = effective
-        st.save(update_fields=["last_read_message_id"])
-
         mentions_qs = MessageMention.objects.filter(
             mentioned_user=user,
             message__room_id=room_id,
@@ -140,6 +223,12 @@ def mark_room_read_and_clear_mentions(*, room_id: int, user, last_message_id: in
 
         mentions_qs.update(seen_at=timezone.now())
 
+        # the row lock above serialises this with concurrent increments
+        st.last_read_message_id = effective
+        st.unread_count = count_unread_messages(room_id=room_id, user=user, after_id=effective)
+        st.unread_mentions = max(0, st.unread_mentions - len(mention_message_ids))
+        st.save(update_fields=["last_read_message_id", "unread_count", "unread_mentions"])
+
         if mention_message_ids:
             Notification.objects.filter(
                 user=user,
@@ -147,105 +236,3 @@ def mark_room_read_and_clear_mentions(*, room_id: int, user, last_message_id: in
                 is_seen=False,
                 payload__message_id__in=mention_message_ids
             ).update(is_seen=True)
-
-
-
-
-def mark_room_read_internal(*, room_id: int, user, last_message_id: int):
-    from .models import RoomUserState, MessageMention
-    from notifications.models import Notification
-    from django.utils import timezone
-
-    # 🔹 update read pointer
-    state, _ = RoomUserState.objects.get_or_create(
-        room_id=room_id,
-        user=user
-    )
-
-    if state.last_read_message_id and state.last_read_message_id >= last_message_id:
-        return  # already read
-
-    state.last_read_message_id = last_message_id
-    state.save(update_fields=["last_read_message_id"])
-
-    # 🔹 clear mentions
-    mentions = MessageMention.objects.filter(
-        mentioned_user=user,
-        message__room_id=room_id,
-        message_id__lte=last_message_id,
-        seen_at__isnull=True
-    )
-
-    mention_message_ids = list(
-        mentions.values_list("message_id", flat=True)
-    )
-
-    mentions.update(seen_at=timezone.now())
-
-    # 🔹 clear mention notifications
-    if mention_message_ids:
-        Notification.objects.filter(
-            user=user,
-            notif_type="mention",
-            payload__message_id__in=mention_message_ids,
-            is_seen=False
-        ).update(is_seen=True)
-
-
-
-# chat/services_messages.py
-
-from django.db import transaction
-from django.utils import timezone
-from chat.models import RoomUserState, MessageMention
-from notifications.models import Notification
-
-
-def mark_room_read(
-    *,
-    room_id: int,
-    user,
-    last_message_id: int
-):
-    """
-    Backend-authoritative read logic
-    """
-    with transaction.atomic():
-        state, _ = RoomUserState.objects.select_for_update().get_or_create(
-            room_id=room_id,
-            user=user
-        )
-
-        prev = state.last_read_message_id or 0
-        effective = max(prev, last_message_id)
-
-        if effective == prev:
-            return False  # nothing changed
-
-        state.last_read_message_id = effective
-        state.save(update_fields=["last_read_message_id"])
-
-        # 🔹 clear mentions
-        mentions = MessageMention.objects.filter(
-            mentioned_user=user,
-            message__room_id=room_id,
-            message_id__lte=effective,
-            seen_at__isnull=True
-        )
-
-        mention_ids = list(
-            mentions.values_list("message_id", flat=True)
-        )
-
-        mentions.update(seen_at=timezone.now())
-
-        # 🔹 clear notifications
-        if mention_ids:
-            Notification.objects.filter(
-                user=user,
-                notif_type="mention",
-                is_seen=False,
-                payload__message_id__in=mention_ids
-            ).update(is_seen=True)
-
-        return True
@@ -0,0 +1,230 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from .models import ChatParticipant, Message, MessageReaction
+from .serializers import MessageSerializer, REACTIONS_PREFETCH
+
+# Newest CHAT_RECENT_CACHE_SIZE messages per room, serialized once for every
+# viewer (my_reaction is filled in per request). Entries are keyed by a room
+# version: each message/reaction/attachment write bumps it and derives the
+# next entry from the previous one, so an entry built from an older read can
+# never be served after a newer write. Sender/reactor name or role changes
+# drop the windows of the rooms involved. Rooms nobody reads or writes drop
+# out after CHAT_RECENT_CACHE_TTL seconds.
+RESUME_FIELDS = ("id", "room_id", "content", "is_ai", "created_at", "sender", "attachments")
+
+
+def _size():
+    return getattr(settings, "CHAT_RECENT_CACHE_SIZE", 50)
+
+
+def _ttl():
+    return getattr(settings, "CHAT_RECENT_CACHE_TTL", 600)
+
+
+def _version_key(room_id):
+    return f"chat:recent:ver:{room_id}"
+
+
+def _entry_key(room_id, version):
+    return f"chat:recent:{room_id}:{version}"
+
+
+def _version(room_id):
+    key = _version_key(room_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def _messages_qs():
+    return (
+        Message.objects
+        .select_related("sender")
+        .prefetch_related("attachments", REACTIONS_PREFETCH)
+    )
+
+
+def _serialize(messages):
+    data = MessageSerializer(messages, many=True).data
+    for item in data:
+        item.pop("my_reaction", None)
+    return [dict(item) for item in data]
+
+
+def _build(room_id):
+    size = _size()
+    rows = list(_messages_qs().filter(room_id=room_id).order_by("-id")[:size + 1])
+    return {
+        "messages": _serialize(rows[:size]),
+        # True when the room has no messages older than the cached ones
+        "complete": len(rows) <= size,
+    }
+
+
+def get_recent_messages(room_id):
+    """
+    {"messages": newest-first payloads, "complete": bool} for a room,
+    built from the database on a miss.
+    """
+    key = _entry_key(room_id, _version(room_id))
+    entry = cache.get(key)
+    if entry is None:
+        entry = _build(room_id)
+        cache.add(key, entry, _ttl())
+    return entry
+
+
+def refresh_recent_message(message_id):
+    """
+    Re-serialize one message into its room's cached window. Run after
+    commit; the message is loaded after the version bump so the payload
+    is at least as new as every write the new version stands for.
+    """
+    room_id = Message.objects.filter(id=message_id).values_list("room_id", flat=True).first()
+    if room_id is None:
+        return
+
+    try:
+        version = cache.incr(_version_key(room_id))
+    except ValueError:
+        # missing/evicted: restart from a value no earlier version used
+        cache.set(_version_key(room_id), time.time_ns(), None)
+        return
+
+    previous_key = _entry_key(room_id, version - 1)
+    previous = cache.get(previous_key)
+    if previous is None:
+        # nothing cached to patch; the next read rebuilds
+        return
+
+    message = _messages_qs().filter(id=message_id).first()
+    messages = [m for m in previous["messages"] if m["id"] != message_id]
+    complete = previous["complete"]
+
+    # only keep it when it falls inside the contiguous newest window
+    if message and (complete or not messages or message.id > messages[-1]["id"]):
+        messages.extend(_serialize([message]))
+        messages.sort(key=lambda m: m["id"], reverse=True)
+
+    size = _size()
+    if len(messages) > size:
+        messages = messages[:size]
+        complete = False
+
+    cache.set(_entry_key(room_id, version), {"messages": messages, "complete": complete}, _ttl())
+    cache.delete(previous_key)
+
+
+def schedule_recent_refresh(message_id):
+    transaction.on_commit(lambda: refresh_recent_message(message_id))
+
+
+def invalidate_recent_messages(room_id):
+    """
+    Drop a room's cached window (e.g. a message row was deleted outright).
+    """
+    def _bump():
+        try:
+            cache.incr(_version_key(room_id))
+        except ValueError:
+            cache.set(_version_key(room_id), time.time_ns(), None)
+
+    transaction.on_commit(_bump)
+
+
+def invalidate_recent_messages_for_user(user_id):
+    """
+    Drop the cached windows that may show the user's name or role: rooms
+    they belong to, posted in or reacted in. For renames / role changes.
+    """
+    room_ids = set(
+        ChatParticipant.objects.filter(user_id=user_id).values_list("room_id", flat=True)
+    )
+    room_ids.update(
+        Message.objects.filter(sender_id=user_id).values_list("room_id", flat=True).distinct()
+    )
+    room_ids.update(
+        MessageReaction.objects.filter(user_id=user_id)
+        .values_list("message__room_id", flat=True).distinct()
+    )
+    for room_id in room_ids:
+        invalidate_recent_messages(room_id)
+
+
+def _visible(messages, hide_before):
+    return [m for m in messages if parse_datetime(m["created_at"]) > hide_before]
+
+
+def with_viewer(messages, user_id):
+    """
+    Cached payloads completed with the viewer's own reaction.
+    """
+    result = []
+    for m in messages:
+        mine = None
+        for reaction, summary in m["reactions"].items():
+            if any(u["id"] == user_id for u in summary["users"]):
+                mine = reaction
+                break
+        result.append({**m, "my_reaction": mine})
+    return result
+
+
+def get_recent_page(room_id, params, *, hide_before=None, default_limit=50, max_limit=100):
+    """
+    The first (newest) page of keyset_paginate served from the cache, as
+    (payloads, meta). None when the request pages from a cursor or asks
+    for more than the cache holds; the caller then queries as usual.
+    """
+    if any(params.get(k) not in (None, "") for k in ("before_id", "after_id", "around_id")):
+        return None
+    try:
+        limit = int(params.get("limit") or default_limit)
+    except (TypeError, ValueError):
+        return None
+    if limit <= 0:
+        return None
+    limit = min(limit, max_limit)
+    if limit > _size():
+        return None
+
+    entry = get_recent_messages(room_id)
+    messages, complete = entry["messages"], entry["complete"]
+
+    if hide_before:
+        visible = _visible(messages, hide_before)
+        if len(visible) < len(messages):
+            # the cut-off falls inside the window, so nothing older is visible
+            complete = True
+        messages = visible
+
+    has_more_before = len(messages) > limit or not complete
+    return messages[:limit], {
+        "has_more": has_more_before,
+        "has_more_before": has_more_before,
+        "has_more_after": False,
+    }
+
+
+def get_recent_messages_after(room_id, after_id, limit, hide_before=None):
+    """
+    Oldest-first socket resume payloads with id > after_id from the cache,
+    or None when the cached window doesn't reach back to after_id.
+    """
+    entry = get_recent_messages(room_id)
+    messages = entry["messages"]
+    if not entry["complete"] and (not messages or messages[-1]["id"] > after_id):
+        return None
+
+    newer = [m for m in reversed(messages) if m["id"] > after_id]
+    if hide_before:
+        newer = _visible(newer, hide_before)
+
+    return [{k: m[k] for k in RESUME_FIELDS} for m in newer[:limit]]
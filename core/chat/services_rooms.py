@@ -1,7 +1,8 @@
 from django.db import transaction
 from medical.models import ClinicUser, Clinic
-from .models import ChatRoom, ChatParticipant, RoomUserState, UserBlock
+from .models import ChatRoom, ChatParticipant, RoomUserState
 from accounts.models import User
+from .guards import get_block_between, invalidate_room_access
 
 # @transaction.atomic
 # def ensure_clinic_group_room(clinic: Clinic) -> ChatRoom:
@@ -33,13 +34,13 @@ def ensure_clinic_group_room(clinic: Clinic) -> ChatRoom:
         [RoomUserState(room=room, user_id=u) for u in user_ids],
         ignore_conflicts=True
     )
+    invalidate_room_access(room.id)
 
     return room
 
 @transaction.atomic
 def get_or_create_private_room(user_id: int, other_id: int) -> ChatRoom:
-    if UserBlock.objects.filter(blocker_id=user_id, blocked_id=other_id).exists() or \
-       UserBlock.objects.filter(blocker_id=other_id, blocked_id=user_id).exists():
+    if get_block_between(user_id, other_id):
         raise PermissionError("Chat not allowed (blocked).")
 
     a, b = sorted([user_id, other_id])
@@ -52,6 +53,7 @@ def get_or_create_private_room(user_id: int, other_id: int) -> ChatRoom:
     room = ChatRoom.objects.create(room_type="private", unique_key=key)
     ChatParticipant.objects.bulk_create([ChatParticipant(room=room, user_id=a), ChatParticipant(room=room, user_id=b)])
     RoomUserState.objects.bulk_create([RoomUserState(room=room, user_id=a), RoomUserState(room=room, user_id=b)])
+    invalidate_room_access(room.id)
     return room
 
 
@@ -137,4 +139,5 @@ def create_custom_group(created_by, name: str, user_ids: list[int]) -> ChatRoom:
     room = ChatRoom.objects.create(room_type="group", name=name, created_by=created_by)
     ChatParticipant.objects.bulk_create([ChatParticipant(room=room, user_id=u) for u in user_ids], ignore_conflicts=True)
     RoomUserState.objects.bulk_create([RoomUserState(room=room, user_id=u) for u in user_ids], ignore_conflicts=True)
+    invalidate_room_access(room.id)
     return room
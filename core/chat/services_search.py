@@ -0,0 +1,88 @@
+from django.contrib.postgres.search import SearchHeadline, SearchQuery
+from django.db.models import Exists, OuterRef
+
+from chat.models import Message, ChatParticipant, RoomUserState, UserChatHistoryPreference
+from permissions_app.services import has_permission
+
+# text search configuration of the search_vector trigger (chat migration 0013)
+SEARCH_CONFIG = "english"
+
+
+def searchable_messages(user):
+    """
+    Messages the user may search, by the rules of the message list views:
+    chat:view_all_history reads every room (deleted messages included);
+    everyone else only rooms they belong to and are not blocked from,
+    minus deleted messages and history they chose to hide.
+    """
+    if has_permission(user, "chat:view_all_history"):
+        return Message.objects.all()
+
+    member_rooms = ChatParticipant.objects.filter(
+        user=user,
+        room_id__in=RoomUserState.objects.filter(
+            user=user,
+            is_blocked=False
+        ).values("room_id")
+    ).values("room_id")
+
+    hidden = UserChatHistoryPreference.objects.filter(
+        user=user,
+        room_id=OuterRef("room_id"),
+        hide_history_before__gte=OuterRef("created_at")
+    )
+
+    return Message.objects.filter(
+        room_id__in=member_rooms,
+        is_deleted=False
+    ).exclude(Exists(hidden))
+
+
+def search_messages(user, text, *, room_id=None, clinic_id=None, sender_id=None,
+                    date_from=None, date_to=None):
+    """
+    Full-text match on the GIN-indexed search_vector (websearch syntax:
+    quoted phrases, OR, -exclusion), scoped to searchable_messages(user).
+    """
+    qs = searchable_messages(user).filter(
+        search_vector=SearchQuery(text, config=SEARCH_CONFIG, search_type="websearch")
+    )
+
+    if room_id:
+        qs = qs.filter(room_id=room_id)
+    if clinic_id:
+        qs = qs.filter(room__clinic_id=clinic_id)
+    if sender_id:
+        qs = qs.filter(sender_id=sender_id)
+    if date_from:
+        qs = qs.filter(created_at__date__gte=date_from)
+    if date_to:
+        qs = qs.filter(created_at__date__lte=date_to)
+
+    return qs
+
+
+def with_highlights(messages, text):
+    """
+    Headlines for one page of results. ts_headline re-parses the content,
+    so it runs on the page ids only, never across the whole match set.
+    """
+    ids = [m.id for m in messages]
+    if not ids:
+        return []
+
+    return list(
+        Message.objects.filter(id__in=ids)
+        .select_related("sender", "room")
+        .annotate(
+            highlight=SearchHeadline(
+                "content",
+                SearchQuery(text, config=SEARCH_CONFIG, search_type="websearch"),
+                config=SEARCH_CONFIG,
+                start_sel="<mark>",
+                stop_sel="</mark>",
+                max_fragments=2,
+            )
+        )
+        .order_by("-id")
+    )
@@ -1,10 +1,20 @@
-from django.db.models.signals import post_save ,post_delete ,pre_save
+from django.db.models.signals import post_save ,post_delete ,post_init
 from django.dispatch import receiver
 from medical.models import ClinicUser
-from .services_membership import auto_join_clinic_groups_for_user
-from chat.models import ChatParticipant, RoomUserState, ChatRoom
+from .services_messages import retract_room_activity
+from .services_membership import (
+    auto_join_clinic_groups_for_user,
+    reconcile_clinic_groups,
+    remove_user_from_group_rooms,
+)
+from chat.models import ChatParticipant, RoomUserState, ChatRoom, UserBlock, Message, MessageAttachment, MessageReaction
+from chat.guards import invalidate_room_access, invalidate_private_block, revoke_room_access
+from chat.services_recent import (
+    invalidate_recent_messages,
+    invalidate_recent_messages_for_user,
+    schedule_recent_refresh,
+)
 from accounts.models import User
-from django.utils import timezone
 @receiver(post_save, sender=ClinicUser)
 def on_clinic_user_created(sender, instance, created, **kwargs):
     if not created:
@@ -22,6 +32,10 @@ def remove_user_from_clinic_groups(sender, instance, **kwargs):
         room_type="group",
         clinic=clinic
     )
+    room_ids = list(
+        ChatParticipant.objects.filter(room__in=rooms, user=user)
+        .values_list("room_id", flat=True)
+    )
 
     ChatParticipant.objects.filter(
         room__in=rooms,
@@ -32,76 +46,51 @@ def remove_user_from_clinic_groups(sender, instance, **kwargs):
         room__in=rooms,
         user=user
     ).delete()
+
+    for room_id in room_ids:
+        revoke_room_access(room_id, [user.id])
     
  
  
  
-@receiver(pre_save, sender=User)
-def sync_chat_membership_on_user_change(sender, instance, **kwargs):
-    if not instance.pk:
-        return
+CHAT_PROFILE_FIELDS = ("first_name", "last_name", "email", "role")
 
-    old = User.objects.get(pk=instance.pk)
 
-    clinics = ClinicUser.objects.filter(
-        user=instance
-    ).values_list("clinic_id", flat=True)
+@receiver(post_init, sender=User)
+def remember_chat_membership_fields(sender, instance, **kwargs):
+    # snapshot of the loaded values, so saves can be diffed without a query
+    # (read from __dict__ to avoid loading deferred fields)
+    instance._chat_membership_snapshot = (
+        instance.__dict__.get("is_active"),
+        instance.__dict__.get("role"),
+    )
+    # fields shown on cached messages (sender / reaction users)
+    instance._chat_profile_snapshot = tuple(
+        instance.__dict__.get(field) for field in CHAT_PROFILE_FIELDS
+    )
 
-    # USER DEACTIVATED
-    if old.is_active and not instance.is_active:
-        ChatParticipant.objects.filter(
-            user=instance,
-            room__room_type="group"
-        ).delete()
-
-        RoomUserState.objects.filter(
-            user=instance,
-            room__room_type="group"
-        ).update(
-            is_deleted=True,
-            deleted_at=timezone.now()
-        )
+
+@receiver(post_save, sender=User)
+def sync_chat_membership_on_user_change(sender, instance, created, update_fields=None, **kwargs):
+    was_active, old_role = getattr(instance, "_chat_membership_snapshot", (None, None))
+    instance._chat_membership_snapshot = (instance.is_active, instance.role)
+
+    if created or old_role is None:
+        return
+    if update_fields is not None and not {"is_active", "role"} & set(update_fields):
         return
 
-    # USER REACTIVATED
-    if not old.is_active and instance.is_active:
-        for clinic_id in clinics:
-            auto_join_clinic_groups_for_user(
-                instance,
-                clinic_id
-            )
+    # USER DEACTIVATED
+    if was_active and not instance.is_active:
+        remove_user_from_group_rooms(instance.id)
         return
 
-    # ROLE CHANGED (ACTIVE USER)
-    if old.role != instance.role and instance.is_active:
-        for clinic_id in clinics:
-            rooms = ChatRoom.objects.filter(
-                room_type="group",
-                clinic_id=clinic_id,
-                group_kind="clinic_role"
-            )
-
-            # remove old role rooms
-            ChatParticipant.objects.filter(
-                room__in=rooms.filter(role=old.role),
-                user=instance
-            ).delete()
-
-            RoomUserState.objects.filter(
-                room__in=rooms.filter(role=old.role),
-                user=instance
-            ).delete()
-
-            # add new role rooms
-            for room in rooms.filter(role=instance.role):
-                ChatParticipant.objects.get_or_create(
-                    room=room,
-                    user=instance
-                )
-                RoomUserState.objects.get_or_create(
-                    room=room,
-                    user=instance
-                )
+    # USER REACTIVATED / ROLE CHANGED (ACTIVE USER)
+    if instance.is_active and (not was_active or old_role != instance.role):
+        reconcile_clinic_groups(
+            user_ids=[instance.id],
+            previous_role=old_role if old_role != instance.role else None,
+        )
  
     
 # @receiver(pre_save, sender=User)
@@ -144,3 +133,66 @@ def sync_chat_membership_on_user_change(sender, instance, **kwargs):
 #                 user=instance
 #             )
             
+
+
+# ---- access cache (chat.guards) ----
+@receiver(post_save, sender=ChatParticipant)
+@receiver(post_delete, sender=ChatParticipant)
+def on_participant_changed(sender, instance, **kwargs):
+    invalidate_room_access(instance.room_id)
+
+
+@receiver(post_save, sender=RoomUserState)
+def on_room_state_saved(sender, instance, created, update_fields=None, **kwargs):
+    # read markers, counters etc. don't affect access
+    if not created and update_fields is not None and "is_blocked" not in update_fields:
+        return
+    invalidate_room_access(instance.room_id)
+
+
+@receiver(post_delete, sender=RoomUserState)
+def on_room_state_deleted(sender, instance, **kwargs):
+    invalidate_room_access(instance.room_id)
+
+
+@receiver(post_save, sender=UserBlock)
+@receiver(post_delete, sender=UserBlock)
+def on_user_block_changed(sender, instance, **kwargs):
+    invalidate_private_block(instance.blocker_id, instance.blocked_id)
+
+
+# ---- recent-message cache (chat.services_recent) ----
+@receiver(post_save, sender=Message)
+def on_message_saved(sender, instance, **kwargs):
+    schedule_recent_refresh(instance.id)
+    if instance.is_deleted:
+        retract_room_activity(room_id=instance.room_id, message_id=instance.id)
+
+
+@receiver(post_delete, sender=Message)
+def on_message_deleted(sender, instance, **kwargs):
+    invalidate_recent_messages(instance.room_id)
+    retract_room_activity(room_id=instance.room_id, message_id=instance.id)
+
+
+@receiver(post_save, sender=MessageAttachment)
+@receiver(post_delete, sender=MessageAttachment)
+@receiver(post_save, sender=MessageReaction)
+@receiver(post_delete, sender=MessageReaction)
+def on_message_part_changed(sender, instance, **kwargs):
+    schedule_recent_refresh(instance.message_id)
+
+
+@receiver(post_save, sender=User)
+def on_user_profile_changed(sender, instance, created, update_fields=None, **kwargs):
+    old = getattr(instance, "_chat_profile_snapshot", None)
+    instance._chat_profile_snapshot = tuple(
+        getattr(instance, field) for field in CHAT_PROFILE_FIELDS
+    )
+
+    if created or old is None:
+        return
+    if update_fields is not None and not set(CHAT_PROFILE_FIELDS) & set(update_fields):
+        return
+    if old != instance._chat_profile_snapshot:
+        invalidate_recent_messages_for_user(instance.id)
@@ -6,7 +6,39 @@ from notifications.models import Notification
 from accounts.models import User
 from chat.models import Message, MessageAttachment, AiFeedback
 from chat.services_ai_moderation import ai_analyze_message
-from chat.services_ai import get_reply, send_ai_message
+from chat.services_ai import get_reply, send_ai_message, stream_ai_reply
+from chat.realtime import drain_outbox
+from chat.services_membership import reconcile_clinic_groups
+from core.ai import AIProviderError
+
+@shared_task(ignore_result=True)
+def dispatch_realtime_outbox():
+    drain_outbox()
+
+
+@shared_task(
+    bind=True,
+    ignore_result=True,
+    autoretry_for=(AIProviderError,),
+    retry_backoff=True,
+    max_retries=5,
+)
+def ai_reply_to_message(self, message_id: int, has_attachments: bool = False):
+    msg = Message.objects.select_related("room").filter(id=message_id).first()
+    if not msg or msg.room.room_type != "ai":
+        return
+
+    # retried or duplicated delivery: this message already has its answer
+    if msg.replies.filter(sender__role="ai").exists():
+        return
+
+    stream_ai_reply(
+        room=msg.room,
+        message=msg,
+        has_attachments=has_attachments,
+        attempt=self.request.retries,
+    )
+
 
 @shared_task
 def ai_observe_group_message(message_id: int):
@@ -89,10 +121,15 @@ def group_ai_reply_if_no_human_response(message_id: int):
 
     ai_text = get_reply(
         msg.content,
-        has_attachments=has_attachments
+        has_attachments=has_attachments,
+        clinic_id=room.clinic_id,
     )
 
     if not ai_text:
         return
 
-    send_ai_message(room=room, content=ai_text)
\ No newline at end of file
+    send_ai_message(room=room, content=ai_text)
+
+@shared_task(ignore_result=True)
+def reconcile_clinic_groups_task(user_ids=None, clinic_ids=None):
+    reconcile_clinic_groups(user_ids=user_ids, clinic_ids=clinic_ids)
@@ -1,3 +1,368 @@
-from django.test import TestCase
+import importlib
+import threading
+from datetime import timedelta
+from http.server import ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.apps import apps
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import User
+from chat.guards import ensure_room_access
+from chat.management.commands.ai_fake_server import FakeAIHandler
+from chat.models import (
+    ChatParticipant, ChatRoom, Message, MessageReaction, RealtimeOutbox, RoomUserState,
+    UserChatHistoryPreference,
+)
+from chat.realtime import drain_outbox, queue_group_event
+from chat.serializers import MessageSerializer, REACTIONS_PREFETCH
+from chat.services_membership import remove_users_from_group_rooms
+from chat.services_messages import create_message_with_mentions, mark_room_read_and_clear_mentions
+from chat import services_recent
+from core.ai import AIProviderError
+from core.ai import remote
+from core.utils.pagination import keyset_paginate
+
+TEST_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+TEST_CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+
+@override_settings(CHANNEL_LAYERS=TEST_CHANNEL_LAYERS, CELERY_ENABLED=False)
+class RealtimeOutboxTests(TestCase):
+    def setUp(self):
+        self.layer = get_channel_layer()
+        self.channel = async_to_sync(self.layer.new_channel)()
+        async_to_sync(self.layer.group_add)("room_1", self.channel)
+
+    def receive(self):
+        return async_to_sync(self.layer.receive)(self.channel)
+
+    def test_event_is_sent_after_commit_and_row_removed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                queue_group_event("room_1", {"type": "message_event", "n": 1})
+                # nothing leaves before the transaction commits
+                self.assertEqual(RealtimeOutbox.objects.count(), 1)
+
+        self.assertEqual(self.receive()["n"], 1)
+        self.assertFalse(RealtimeOutbox.objects.exists())
+
+    def test_rolled_back_event_is_never_sent(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    queue_group_event("room_1", {"type": "message_event", "n": 1})
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+
+        self.assertEqual(callbacks, [])
+        self.assertFalse(RealtimeOutbox.objects.exists())
+        self.assertEqual(drain_outbox(), 0)
+
+    def test_failed_send_keeps_rows_for_the_next_drain(self):
+        RealtimeOutbox.objects.create(group="room_1", event={"type": "message_event", "n": 1})
+        RealtimeOutbox.objects.create(group="room_1", event={"type": "message_event", "n": 2})
+
+        with mock.patch("chat.realtime._send_batch", side_effect=RuntimeError("layer down")):
+            with self.assertRaises(RuntimeError):
+                drain_outbox()
+        self.assertEqual(RealtimeOutbox.objects.count(), 2)
+
+        self.assertEqual(drain_outbox(batch_size=1), 2)
+        self.assertEqual([self.receive()["n"], self.receive()["n"]], [1, 2])
+        self.assertFalse(RealtimeOutbox.objects.exists())
+
+
+def make_user(email, role="doctor", **extra):
+    return User.objects.create_user(
+        email=email, password="x", role=role, first_name=email.split("@")[0], last_name="T", **extra
+    )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        sender = make_user("sender@example.com")
+        room = ChatRoom.objects.create(room_type="group", name="Keyset")
+        cls.ids = [
+            Message.objects.create(room=room, sender=sender, content=f"m{i}").id
+            for i in range(10)
+        ]
+        cls.qs = Message.objects.filter(room=room)
+
+    def page(self, **params):
+        rows, meta = keyset_paginate(self.qs, params)
+        return [m.id for m in rows], meta
+
+    def test_first_page_is_newest_first(self):
+        ids, meta = self.page(limit=4)
+        self.assertEqual(ids, self.ids[:-5:-1])
+        self.assertTrue(meta["has_more_before"])
+        self.assertFalse(meta["has_more_after"])
+
+    def test_before_id_walks_back_to_the_start(self):
+        ids, meta = self.page(limit=4, before_id=self.ids[4])
+        self.assertEqual(ids, self.ids[3::-1])
+        self.assertFalse(meta["has_more_before"])
+        self.assertTrue(meta["has_more_after"])
+
+    def test_after_id_returns_the_next_newer_rows(self):
+        ids, meta = self.page(limit=3, after_id=self.ids[2])
+        self.assertEqual(ids, self.ids[5:2:-1])
+        self.assertTrue(meta["has_more"])
+        self.assertTrue(meta["has_more_before"])
+
+    def test_around_id_includes_the_anchor(self):
+        ids, meta = self.page(limit=4, around_id=self.ids[5])
+        self.assertIn(self.ids[5], ids)
+        self.assertEqual(ids, sorted(ids, reverse=True))
+        self.assertEqual(len(ids), 4)
+        self.assertTrue(meta["has_more_before"] and meta["has_more_after"])
+
+    def test_limit_is_capped(self):
+        rows, _ = keyset_paginate(self.qs, {"limit": "500"}, max_limit=5)
+        self.assertEqual(len(rows), 5)
+
+    def test_bad_parameters_raise_value_error(self):
+        for params in ({"limit": "x"}, {"limit": "0"}, {"before_id": "1", "after_id": "2"}):
+            with self.assertRaises(ValueError):
+                keyset_paginate(self.qs, params)
+
+
+@override_settings(CACHES=TEST_CACHES, CHAT_RECENT_CACHE_SIZE=5)
+class RecentMessageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.sender = make_user("sender@example.com")
+        self.viewer = make_user("viewer@example.com")
+        self.room = ChatRoom.objects.create(room_type="group", name="Recent")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ids = [self.send(f"m{i}").id for i in range(8)]
+
+    def send(self, content):
+        return Message.objects.create(room=self.room, sender=self.sender, content=content)
+
+    def cached_ids(self):
+        return [m["id"] for m in services_recent.get_recent_messages(self.room.id)["messages"]]
+
+    def test_first_page_matches_the_database_and_skips_it_when_warm(self):
+        services_recent.get_recent_messages(self.room.id)
+        with self.assertNumQueries(0):
+            results, meta = services_recent.get_recent_page(self.room.id, {"limit": "3"})
+
+        rows, db_meta = keyset_paginate(
+            Message.objects.filter(room=self.room)
+            .select_related("sender")
+            .prefetch_related("attachments", REACTIONS_PREFETCH),
+            {"limit": "3"},
+        )
+        expected = [dict(m) for m in MessageSerializer(rows, many=True).data]
+        self.assertEqual(services_recent.with_viewer(results, None), expected)
+        self.assertEqual(meta, db_meta)
+
+    def test_cursor_requests_and_large_limits_fall_back(self):
+        self.assertIsNone(services_recent.get_recent_page(self.room.id, {"before_id": "3"}))
+        self.assertIsNone(services_recent.get_recent_page(self.room.id, {"limit": "6"}))
+
+    def test_writes_patch_the_window_in_place(self):
+        services_recent.get_recent_messages(self.room.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            new = self.send("new")
+        with self.captureOnCommitCallbacks(execute=True):
+            MessageReaction.objects.create(message=new, user=self.viewer, reaction="like")
+
+        with self.assertNumQueries(0):
+            entry = services_recent.get_recent_messages(self.room.id)
+        self.assertEqual([m["id"] for m in entry["messages"]], [new.id] + self.ids[:-5:-1])
+        self.assertFalse(entry["complete"])
+
+        page, _ = services_recent.get_recent_page(self.room.id, {"limit": "1"})
+        self.assertEqual(services_recent.with_viewer(page, self.viewer.id)[0]["my_reaction"], "like")
+
+    def test_build_from_before_a_write_is_never_served(self):
+        # a reader snapshots the room, then a write commits before it caches
+        version = services_recent._version(self.room.id)
+        stale = services_recent._build(self.room.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            new = self.send("racing")
+
+        cache.set(services_recent._entry_key(self.room.id, version), stale, 60)
+        self.assertEqual(self.cached_ids()[0], new.id)
+
+    def test_resume_needs_the_window_to_reach_the_cursor(self):
+        replay = services_recent.get_recent_messages_after(self.room.id, self.ids[5], 10)
+        self.assertEqual([m["id"] for m in replay], self.ids[6:])
+        self.assertIsNone(services_recent.get_recent_messages_after(self.room.id, self.ids[0], 10))
+
+    def test_sender_rename_drops_the_window(self):
+        self.assertEqual(self.cached_ids(), self.ids[:-6:-1])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sender.first_name = "Renamed"
+            self.sender.save()
+
+        sender = services_recent.get_recent_messages(self.room.id)["messages"][0]["sender"]
+        self.assertEqual(sender["name"], "Renamed T")
+
+
+@override_settings(CACHES=TEST_CACHES, CHANNEL_LAYERS=TEST_CHANNEL_LAYERS, CELERY_ENABLED=False)
+class UnreadCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.sender = make_user("sender@example.com")
+        self.reader = make_user("reader@example.com")
+        self.blocked = make_user("blocked@example.com")
+        self.room = ChatRoom.objects.create(room_type="group", name="Unread")
+        for user in (self.sender, self.reader, self.blocked):
+            ChatParticipant.objects.create(room=self.room, user=user)
+            RoomUserState.objects.create(room=self.room, user=user, is_blocked=user is self.blocked)
+
+    def send(self, content="hi", mentions=()):
+        with self.captureOnCommitCallbacks(execute=True):
+            return create_message_with_mentions(self.room, self.sender, content, list(mentions))
+
+    def state(self, user):
+        return RoomUserState.objects.get(room=self.room, user=user)
+
+    def counters(self, user):
+        state = self.state(user)
+        return state.unread_count, state.unread_mentions
+
+    def test_messages_and_mentions_increment_other_members(self):
+        self.send()
+        self.send(mentions=[self.reader.id, self.blocked.id, self.sender.id])
+
+        self.assertEqual(self.counters(self.reader), (2, 1))
+        self.assertEqual(self.counters(self.blocked), (0, 0))
+        # neither your own messages nor self-mentions are unread
+        self.assertEqual(self.counters(self.sender), (0, 0))
+
+    def test_read_recounts_only_visible_messages(self):
+        first = self.send(mentions=[self.reader.id])
+        hidden = self.send()
+        deleted = self.send()
+        kept = self.send()
+        Message.objects.filter(id=deleted.id).update(is_deleted=True)
+        Message.objects.filter(id=hidden.id).update(created_at=timezone.now() - timedelta(days=2))
+        UserChatHistoryPreference.objects.create(
+            user=self.reader, room=self.room, hide_history_before=timezone.now() - timedelta(days=1)
+        )
+
+        mark_room_read_and_clear_mentions(room_id=self.room.id, user=self.reader, last_message_id=first.id)
+
+        # only `kept` is still unread: `deleted` is gone and `hidden` is behind the cutoff
+        self.assertEqual(self.counters(self.reader), (1, 0))
+
+        mark_room_read_and_clear_mentions(room_id=self.room.id, user=self.reader, last_message_id=kept.id)
+        self.assertEqual(self.counters(self.reader), (0, 0))
+
+    def test_backfill_matches_the_live_counters(self):
+        self.send(mentions=[self.reader.id])
+        deleted = self.send()
+        Message.objects.filter(id=deleted.id).update(is_deleted=True)
+        self.send(mentions=[self.reader.id, self.blocked.id])
+
+        RoomUserState.objects.update(unread_count=0, unread_mentions=0)
+        migration = importlib.import_module("chat.migrations.0012_roomuserstate_unread_counters")
+        migration.backfill_unread_counters(apps, None)
+
+        self.assertEqual(self.counters(self.reader), (2, 2))
+        self.assertEqual(self.counters(self.sender), (0, 0))
+        self.assertEqual(self.counters(self.blocked), (0, 0))
+
+
+@override_settings(CACHES=TEST_CACHES, CHANNEL_LAYERS=TEST_CHANNEL_LAYERS, CELERY_ENABLED=False)
+class RoomAccessRevokedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user("member@example.com")
+        self.room = ChatRoom.objects.create(room_type="group", name="Revoked")
+        ChatParticipant.objects.create(room=self.room, user=self.user)
+        RoomUserState.objects.create(room=self.room, user=self.user)
+
+        self.layer = get_channel_layer()
+        self.channel = async_to_sync(self.layer.new_channel)()
+        async_to_sync(self.layer.group_add)(f"user_{self.user.id}", self.channel)
+
+    def test_removed_members_are_told_after_commit(self):
+        self.assertTrue(ensure_room_access(self.user, self.room.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            remove_users_from_group_rooms([self.user.id])
+
+        event = async_to_sync(self.layer.receive)(self.channel)
+        self.assertEqual(event, {"type": "room_access_revoked_event", "room_id": self.room.id})
+        self.assertFalse(ensure_room_access(self.user, self.room.id))
+
+
+class FlakyAIHandler(FakeAIHandler):
+    # answers the first `failures` requests with 503
+    failures = 0
+    requests = 0
+
+    def do_POST(self):
+        type(self).requests += 1
+        if type(self).requests <= self.failures:
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            return self._json(503, {"detail": "injected failure"})
+        return super().do_POST()
+
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # the timeout test hangs up on purpose
+        pass
+
+
+@override_settings(
+    AI_HTTP_MAX_RETRIES=2, AI_HTTP_BACKOFF=0, AI_HTTP_BACKOFF_MAX=0, AI_HTTP_TIMEOUT=0.2
+)
+class HttpAIProviderTests(TestCase):
+    def setUp(self):
+        FlakyAIHandler.failures = FlakyAIHandler.requests = 0
+        FlakyAIHandler.latency = 0.0
+        server = QuietHTTPServer(("127.0.0.1", 0), FlakyAIHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        # a fresh pooled client pointed at this server
+        base_url = override_settings(AI_HTTP_BASE_URL=f"http://127.0.0.1:{server.server_address[1]}")
+        base_url.enable()
+        self.addCleanup(base_url.disable)
+        client = mock.patch.object(remote, "_client", None)
+        client.start()
+        self.addCleanup(client.stop)
+        self.addCleanup(lambda: remote._client and remote._client.close())
+        self.provider = remote.HttpAIProvider()
+
+    def test_gateway_errors_are_retried(self):
+        FlakyAIHandler.failures = 2
+        self.assertTrue(self.provider.chat_reply("hello"))
+        self.assertEqual(FlakyAIHandler.requests, 3)
+
+    def test_gives_up_after_the_last_retry(self):
+        FlakyAIHandler.failures = 3
+        with self.assertRaises(AIProviderError):
+            self.provider.chat_reply("hello")
+        self.assertEqual(FlakyAIHandler.requests, 3)
+
+    def test_slow_backend_times_out(self):
+        FlakyAIHandler.latency = 0.5
+        with override_settings(AI_HTTP_MAX_RETRIES=0), self.assertRaises(AIProviderError):
+            self.provider.chat_reply("hello")
+
+    def test_malformed_scores_raise_provider_error(self):
+        with mock.patch.object(
+            remote.HttpAIProvider, "_post", return_value={"scores": {"1": "ten"}}
+        ), self.assertRaises(AIProviderError):
+            self.provider.review_answers(questions=[{"id": 1}], answers={1: "x"}, role="doctor")
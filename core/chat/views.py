@@ -1,4 +1,6 @@
-from django.db.models import Max
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Sum
 from django.utils import timezone
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
@@ -6,7 +8,9 @@ from rest_framework.response import Response
 from chat.utils import get_effective_user
 from rest_framework import status
 from permissions_app.services import has_permission
+from accounts.authentication import ClaimsJWTAuthentication
 from accounts.models import User
+from accounts.services_directory import search_people
 from medical.models import Clinic, ClinicUser
 from django.utils import timezone
 from django.db.models import Q
@@ -15,17 +19,17 @@ from .models import (
     Message, MessageAttachment, MessageReaction, AiFeedback , UserChatHistoryPreference
 )
 from notifications.models import Notification
-from chat.services_ai import get_reply ,send_ai_message
 
 
 from django.db.models import Q
-from .guards import ensure_room_access
-from .serializers import MessageSerializer , CreateClinicGroupSerializer ,DirectMessageCreateSerializer , AddGroupMembersSerializer ,BlockGroupMemberSerializer , BlockUnblockUserSerializer , BlockGroupMemberSerializer , ReactionListSerializer
+from .guards import ensure_room_access, get_private_chat_block, invalidate_room_access, revoke_room_access
+from .serializers import MessageSerializer, REACTIONS_PREFETCH, CreateClinicGroupSerializer ,DirectMessageCreateSerializer , AddGroupMembersSerializer ,BlockGroupMemberSerializer , BlockUnblockUserSerializer , BlockGroupMemberSerializer , ReactionListSerializer
 from .services_rooms import ensure_clinic_group_room, get_or_create_private_room, get_or_create_ai_room, create_custom_group
-from .services_messages import create_message_with_mentions, mark_room_read_and_clear_mentions
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-from chat.realtime import serialize_message_payload ,serialize_reaction_payload
+from .services_messages import create_message_with_mentions, mark_room_read_and_clear_mentions, publish_new_message
+from .services_recent import get_recent_page, with_viewer
+from chat.realtime import broadcast_message, queue_group_event
+from core.utils.pagination import keyset_paginate
+from .ws_tickets import issue_ws_ticket
 
 
 
@@ -38,12 +42,8 @@ class ChatUserPickerView(APIView):
         search = (request.GET.get("search") or "").strip()
         qs = User.objects.filter(is_deleted=False, is_active=True , is_blocked=False)
 
-        if not (request.user.role == "owner" or has_permission(request.user, "chat:view_all_users")):
-            clinic_ids = ClinicUser.objects.filter(user=request.user).values_list("clinic_id", flat=True)
-            qs = qs.filter(clinicuser__clinic_id__in=list(clinic_ids)).distinct()
-
-        if search:
-            qs = qs.filter(email__icontains=search)
+        sees_everyone = has_permission(request.user, "chat:view_all_users")
+        qs = search_people(qs, search, requester=None if sees_everyone else request.user)
 
         return Response(list(qs.values("id","email","first_name","last_name","role")[:50]))
 
@@ -85,47 +85,26 @@ class RoomListView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        rooms = ChatRoom.objects.filter(
-            participants__user=request.user,
-            user_states__user=request.user,
-            user_states__is_blocked=False,
-        ).distinct().prefetch_related(
-            "participants__user"
-        ).order_by("-id")[:200]
+        rooms = list(
+            ChatRoom.objects.filter(
+                participants__user=request.user,
+                user_states__user=request.user,
+                user_states__is_blocked=False,
+            ).distinct().prefetch_related(
+                "participants__user"
+            ).order_by(
+                F("last_message_at").desc(nulls_last=True),
+                "-id",
+            )[:200]
+        )
 
         # 🔒 STRICT RULE: not a member → see nothing
-        if not rooms.exists():
+        if not rooms:
             return Response({
                 "read_only": False,
                 "results": []
             })
 
-        # 🔹 Last messages
-        last_map = (
-            Message.objects
-            .filter(room__in=rooms)
-            .values("room_id")
-            .annotate(
-                last_id=Max("id"),
-                last_message_at=Max("created_at"),
-            )
-        )
-
-        last_by_room = {
-            x["room_id"]: {
-                "last_id": x["last_id"],
-                "last_message_at": x["last_message_at"],
-            }
-            for x in last_map
-        }
-
-        last_sender_by_room = {
-            m.room_id: m.sender_id
-            for m in Message.objects.filter(
-                id__in=[x["last_id"] for x in last_map]
-            )
-        }
-
         states = {
             s.room_id: s
             for s in RoomUserState.objects.filter(
@@ -136,26 +115,29 @@ class RoomListView(APIView):
 
         out = []
         for r in rooms:
-            last_info = last_by_room.get(r.id, {})
-            last_id = last_info.get("last_id")
-            last_message_at = last_info.get("last_message_at")
-            last_sender_id = last_sender_by_room.get(r.id)
             state = states.get(r.id)
             last_read = state.last_read_message_id if state else None
 
             unread = bool(
-                last_id and
-                last_sender_id != request.user.id and
-                (last_read is None or last_id > last_read)
+                r.last_message_id and
+                r.last_sender_id != request.user.id and
+                (last_read is None or r.last_message_id > last_read)
             )
 
             out.append({
-                "last_message_at": last_message_at,
+                "last_message_at": r.last_message_at,
+                "last_message": {
+                    "id": r.last_message_id,
+                    "sender_id": r.last_sender_id,
+                    "preview": r.last_message_preview,
+                } if r.last_message_id else None,
                 "room_id": r.id,
                 "type": r.room_type,
                 "clinic_id": r.clinic_id,
                 "name": r.name,
                 "unread": unread,
+                "unread_count": state.unread_count if state else 0,
+                "unread_mentions": state.unread_mentions if state else 0,
                 "member_count": r.participants.count(),
                 "members": [
                     {
@@ -438,6 +420,7 @@ class CreateClinicGroupView(APIView):
             [RoomUserState(room=room, user=u) for u in final_users],
             ignore_conflicts=True
         )
+        invalidate_room_access(room.id)
 
         return Response(
             {
@@ -547,18 +530,33 @@ class MessageListView(APIView):
         ).exists()
 
         if has_permission(request.user, "chat:view_all_history") and not is_participant:
+            recent = get_recent_page(room_id, request.GET)
+            if recent is not None:
+                results, page = recent
+                return Response({
+                    "read_only": True,
+                    "chat_blocked": False,
+                    **page,
+                    "results": with_viewer(results, request.user.id),
+                })
+
             qs = (
                 Message.objects
                 .filter(room_id=room_id)
                 .select_related("sender")
-                .prefetch_related("attachments", "reactions")
-                .order_by("-id")[:50]
+                .prefetch_related("attachments", REACTIONS_PREFETCH)
             )
+            try:
+                messages, page = keyset_paginate(qs, request.GET)
+            except ValueError as e:
+                return Response({"detail": str(e)}, status=400)
+
             return Response({
                 "read_only": True,
                 "chat_blocked": False,
+                **page,
                 "results": MessageSerializer(
-                    qs, many=True, context={"request": request}
+                    messages, many=True, context={"request": request}
                 ).data
             })
         
@@ -598,10 +596,7 @@ class MessageListView(APIView):
                 "user_id", flat=True
             ).first()
 
-            block = UserBlock.objects.filter(
-                Q(blocker=request.user, blocked_id=other_id) |
-                Q(blocker_id=other_id, blocked=request.user)
-            ).first()
+            block = get_private_chat_block(request.user, other_id)
 
             if block:
                 chat_blocked = True
@@ -615,24 +610,41 @@ class MessageListView(APIView):
             room_id=room_id
         ).first()
 
-        qs = Message.objects.filter(room_id=room_id)
+        # first page comes from the per-room recent-message cache
+        recent = get_recent_page(
+            room_id,
+            request.GET,
+            hide_before=pref.hide_history_before if pref else None,
+        )
+        if recent is not None:
+            results, page = recent
+            results = with_viewer(results, request.user.id)
+        else:
+            qs = Message.objects.filter(room_id=room_id)
 
-        if pref:
-            qs = qs.filter(created_at__gt=pref.hide_history_before)
+            if pref:
+                qs = qs.filter(created_at__gt=pref.hide_history_before)
 
-        qs = (
-            qs.select_related("sender")
-              .prefetch_related("attachments", "reactions")
-              .order_by("-id")[:50]
-        )
+            qs = (
+                qs.select_related("sender")
+                  .prefetch_related("attachments", REACTIONS_PREFETCH)
+            )
+
+            try:
+                messages, page = keyset_paginate(qs, request.GET)
+            except ValueError as e:
+                return Response({"detail": str(e)}, status=400)
+
+            results = MessageSerializer(
+                messages, many=True, context={"request": request}
+            ).data
 
-        # 5️⃣ Mark read safely
-        last_message_id = qs[0].id if qs else None
-        if last_message_id:
+        # 5️⃣ Mark read safely (only when the page reaches the newest message)
+        if results and not page["has_more_after"]:
             mark_room_read_and_clear_mentions(
                 room_id=room_id,
                 user=request.user,
-                last_message_id=last_message_id
+                last_message_id=results[0]["id"]
             )
 
         return Response({
@@ -641,9 +653,8 @@ class MessageListView(APIView):
             "blocked_by": blocked_by,
             "blocked_at": blocked_at,
             "can_unblock": can_unblock,
-            "results": MessageSerializer(
-                qs, many=True, context={"request": request}
-            ).data
+            **page,
+            "results": results
         })
         # 🔹 Fetch messages FIRST
         # qs = (
@@ -682,7 +693,6 @@ class SendMessageView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, room_id):
-        ai_reply = None 
         try:
             effective_user, is_impersonating = get_effective_user(request)
         except PermissionError as e:
@@ -716,10 +726,7 @@ class SendMessageView(APIView):
                 "user_id", flat=True
             ).first()
 
-            block = UserBlock.objects.filter(
-                Q(blocker=effective_user, blocked_id=other_id) |
-                Q(blocker_id=other_id, blocked=effective_user)
-            ).select_related().first()
+            block = get_private_chat_block(effective_user, other_id)
 
             if block:
                 blocked_by = "me" if block.blocker_id == effective_user.id else "other"
@@ -765,65 +772,39 @@ class SendMessageView(APIView):
 
         mention_ids = request.data.get("mention_user_ids", []) or []
 
-        msg = create_message_with_mentions(
-            room=room,
-            sender=effective_user,
-            content=content,
-            mention_user_ids=mention_ids
-        )
-
+        group_autoreply = has_permission(request.user, "chat:ai_group_autoreply")
         attachment_type = request.data.get("attachment_type", "file")
-        for f in files:
-            MessageAttachment.objects.create(
-                message=msg,
-                file=f,
-                attachment_type=attachment_type
-            )
-        has_attachments = bool(files)
-
-        # AI group auto-reply (only if real human message)
-        # if room.room_type == "group" and not is_impersonating and has_permission(request.user, "chat:ai_group_autoreply"):
-        #     from .tasks import group_ai_reply_if_no_human_response
-        #     group_ai_reply_if_no_human_response.apply_async(args=[msg.id], countdown=180)
-        if room.room_type == "group" and has_permission(request.user, "chat:ai_group_autoreply"):
-           from django.conf import settings
-           from .tasks import group_ai_reply_if_no_human_response
-
-           if getattr(settings, "CELERY_ENABLED", False):
-                group_ai_reply_if_no_human_response.apply_async(
-                    args=[msg.id],
-                    countdown=180
-                )
-      # REAL-TIME BROADCAST (THIS WAS MISSING)
-        if room.room_type == "ai" and not is_impersonating:
-            ai_reply = get_reply(
-            content,
-            has_attachments=has_attachments
-        )
 
-        if ai_reply:  # empty string is ignored
-            send_ai_message(
+        with transaction.atomic():
+            msg = create_message_with_mentions(
                 room=room,
-                content=ai_reply
+                sender=effective_user,
+                content=content,
+                mention_user_ids=mention_ids
             )
 
+            for f in files:
+                MessageAttachment.objects.create(
+                    message=msg,
+                    file=f,
+                    attachment_type=attachment_type
+                )
 
-      
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f"room_{room.id}",
-            {
-                "type": "message_event",
-                "message": serialize_message_payload(msg),
-            }
-        )
+            publish_new_message(
+                room=room,
+                message=msg,
+                has_attachments=bool(files),
+                ai_reply=not is_impersonating,
+                group_autoreply=group_autoreply,
+            )
 
         return Response(
             {
                 "success": True,
                 "message_id": msg.id,
                 "message_body": msg.content,
-                "impersonated": is_impersonating
+                "impersonated": is_impersonating,
+                "ai_reply_pending": room.room_type == "ai" and not is_impersonating,
             },
             status=201
         )
@@ -851,7 +832,6 @@ class SendDirectMessageView(APIView):
         user_ids = serializer.validated_data["user_ids"]
         content = serializer.validated_data["content"]
 
-        channel_layer = get_channel_layer()
         results = []
 
         for other_user_id in user_ids:
@@ -874,22 +854,15 @@ class SendDirectMessageView(APIView):
             RoomUserState.objects.get_or_create(room=room, user=request.user)
             RoomUserState.objects.get_or_create(room=room, user=other_user)
 
-            # 🔹 Create message
-            message = create_message_with_mentions(
-                room=room,
-                sender=request.user,
-                content=content,
-                mention_user_ids=[]
-            )
-
-            # 🔹 Broadcast
-            async_to_sync(channel_layer.group_send)(
-                f"room_{room.id}",
-                {
-                    "type": "message_event",
-                    "message": serialize_message_payload(message),
-                }
-            )
+            # 🔹 Create message + queue broadcast (one transaction)
+            with transaction.atomic():
+                message = create_message_with_mentions(
+                    room=room,
+                    sender=request.user,
+                    content=content,
+                    mention_user_ids=[]
+                )
+                broadcast_message(message)
 
             results.append(
                 {
@@ -928,18 +901,34 @@ class MarkRoomReadView(APIView):
 
 # ---- TAG COUNT (dashboard badge) ----
 class MentionCountView(APIView):
+    authentication_classes = [ClaimsJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        from .models import MessageMention
-        cnt = MessageMention.objects.filter(
-            mentioned_user=request.user,
-            seen_at__isnull=True,
-            message__room__user_states__user=request.user,
-            message__room__user_states__is_deleted=False
-        ).count()
+        cnt = RoomUserState.objects.filter(
+            user_id=request.user.id,
+            is_deleted=False
+        ).aggregate(total=Sum("unread_mentions"))["total"] or 0
         return Response({"tagged_unread": cnt})
 
+
+# ---- UNREAD TOTALS (dashboard badge) ----
+class UnreadCountView(APIView):
+    authentication_classes = [ClaimsJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        totals = RoomUserState.objects.filter(
+            user_id=request.user.id,
+            is_deleted=False,
+            is_blocked=False
+        ).aggregate(
+            unread_messages=Sum("unread_count"),
+            unread_rooms=Count("id", filter=Q(unread_count__gt=0)),
+            tagged_unread=Sum("unread_mentions"),
+        )
+        return Response({k: v or 0 for k, v in totals.items()})
+
 # ---- REACT (like/dislike role+override, group/private/ai) ----
 class ReactMessageView(APIView):
     permission_classes = [IsAuthenticated]
@@ -972,37 +961,34 @@ class ReactMessageView(APIView):
         ).first()
 
         removed = False
-        if not existing:
-            MessageReaction.objects.create(
-                message=msg, user=request.user, reaction=reaction
-            )
-        else:
-            if existing.reaction == reaction:
-                existing.delete()
-                removed = True
+        with transaction.atomic():
+            if not existing:
+                MessageReaction.objects.create(
+                    message=msg, user=request.user, reaction=reaction
+                )
             else:
-                existing.reaction = reaction
-                existing.save(update_fields=["reaction"])
-
-        #  REAL-TIME BROADCAST
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
-
-        channel_layer = get_channel_layer()
-
-        async_to_sync(channel_layer.group_send)(
-            f"room_{room.id}",
-            {
-                "type": "reaction_event",
-                "message_id": msg.id,
-                "reactions": {
-                    "like": msg.reactions.filter(reaction="like").count(),
-                    "dislike": msg.reactions.filter(reaction="dislike").count(),
-                },
-                "user_id": request.user.id,
-                "reaction": None if removed else reaction,
-            }
-        )
+                if existing.reaction == reaction:
+                    existing.delete()
+                    removed = True
+                else:
+                    existing.reaction = reaction
+                    existing.save(update_fields=["reaction"])
+
+            #  REAL-TIME BROADCAST
+            queue_group_event(
+                f"room_{room.id}",
+                {
+                    "type": "reaction_event",
+                    "room_id": room.id,
+                    "message_id": msg.id,
+                    "reactions": msg.reactions.aggregate(
+                        like=Count("id", filter=Q(reaction="like")),
+                        dislike=Count("id", filter=Q(reaction="dislike")),
+                    ),
+                    "user_id": request.user.id,
+                    "reaction": None if removed else reaction,
+                }
+            )
 
         return Response(
             {
@@ -1170,7 +1156,9 @@ class SoftDeleteChatView(APIView):
             defaults={
                 "is_deleted": True,
                 "deleted_at": timezone.now(),
-                "last_read_message_id": None
+                "last_read_message_id": None,
+                "unread_count": 0,
+                "unread_mentions": 0,
             }
         )
 
@@ -1311,6 +1299,7 @@ class AddGroupMembersView(APIView):
             [RoomUserState(room=room, user=u) for u in to_add],
             ignore_conflicts=True
         )
+        invalidate_room_access(room.id)
 
         return Response(
             {
@@ -1651,6 +1640,9 @@ class BlockUnblockGroupMemberView(APIView):
             state.is_blocked = True
             state.save(update_fields=["is_blocked"])
 
+            # drop the room from the user's open multiplexed sockets
+            revoke_room_access(room.id, [user_id])
+
         # ✅ UNBLOCK
         else:
             if not state.is_blocked:
@@ -1711,7 +1703,9 @@ class SoftDeleteChatView(APIView):
             defaults={
                 "is_deleted": True,
                 "deleted_at": timezone.now(),
-                "last_read_message_id": None
+                "last_read_message_id": None,
+                "unread_count": 0,
+                "unread_mentions": 0,
             }
         )
 
@@ -1749,4 +1743,29 @@ class ClinicReactionListView(APIView):
             "success": True,
             "count": qs.count(),
             "results": serializer.data
-        })
\ No newline at end of file
+        })
+
+
+# ---- WEBSOCKET TICKET ----
+class WsTicketView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        room_ids = request.data.get("room_ids") or []
+        if not isinstance(room_ids, list) or not all(str(r).isdigit() for r in room_ids):
+            return Response({"detail": "room_ids must be a list of ids"}, status=400)
+
+        limit = getattr(settings, "CHAT_WS_MAX_ROOMS", 200)
+        if len(room_ids) > limit:
+            return Response(
+                {"detail": f"A socket can subscribe to at most {limit} rooms"},
+                status=400
+            )
+
+        ticket, allowed = issue_ws_ticket(request.user, [int(r) for r in room_ids])
+
+        return Response({
+            "ticket": ticket,
+            "expires_in": getattr(settings, "CHAT_WS_TICKET_TTL", 30),
+            "room_ids": allowed,
+        })
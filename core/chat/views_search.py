@@ -0,0 +1,70 @@
+# chat/views_search.py
+from django.utils.dateparse import parse_date
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from chat.services_search import search_messages, with_highlights
+from core.utils.pagination import keyset_paginate
+
+
+class MessageSearchView(APIView):
+    """
+    GET /messages/search/?q=...&room_id=&clinic_id=&sender_id=&date_from=&date_to=
+    Newest first, paged with before_id / after_id like the message lists.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        text = (request.GET.get("q") or "").strip()
+        if len(text) < 2:
+            return Response({"detail": "q must be at least 2 characters"}, status=400)
+
+        try:
+            filters = {
+                key: int(request.GET[key]) if request.GET.get(key) else None
+                for key in ("room_id", "clinic_id", "sender_id")
+            }
+        except ValueError:
+            return Response({"detail": "room_id, clinic_id and sender_id must be integers"}, status=400)
+
+        for key in ("date_from", "date_to"):
+            value = request.GET.get(key)
+            try:
+                # None when malformed, ValueError for e.g. 2026-02-30
+                filters[key] = parse_date(value) if value else None
+            except ValueError:
+                filters[key] = None
+            if value and filters[key] is None:
+                return Response({"detail": f"{key} must be a valid YYYY-MM-DD date"}, status=400)
+
+        # page over bare ids first; headlines are built for this page only
+        qs = search_messages(request.user, text, **filters).only("id")
+
+        try:
+            page_rows, page = keyset_paginate(qs, request.GET, default_limit=20, max_limit=50)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=400)
+
+        results = [
+            {
+                "id": m.id,
+                "room_id": m.room_id,
+                "room_type": m.room.room_type,
+                "clinic_id": m.room.clinic_id,
+                "sender": {
+                    "id": m.sender_id,
+                    "name": f"{m.sender.first_name} {m.sender.last_name}".strip(),
+                } if m.sender else None,
+                "created_at": m.created_at,
+                "is_deleted": m.is_deleted,
+                "highlight": m.highlight,
+            }
+            for m in with_highlights(page_rows, text)
+        ]
+
+        return Response({
+            "query": text,
+            **page,
+            "results": results,
+        })
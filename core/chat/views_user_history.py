@@ -48,7 +48,8 @@ class UserRoomHistoryView(APIView):
         })
 # chat/views_user_history.py
 from chat.models import Message, RoomUserState
-from chat.serializers import MessageSerializer
+from chat.serializers import MessageSerializer, REACTIONS_PREFETCH
+from core.utils.pagination import keyset_paginate
 
 
 class UserMessageHistoryView(APIView):
@@ -79,9 +80,16 @@ class UserMessageHistoryView(APIView):
             "sender"
         ).prefetch_related(
             "attachments",
-            "reactions",
+            REACTIONS_PREFETCH,
             "mentions"
-        ).order_by("-id")[:100]
+        )
+
+        try:
+            messages, page = keyset_paginate(
+                qs, request.GET, default_limit=100, max_limit=200
+            )
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=400)
 
         return Response({
             "read_only": True,
@@ -90,9 +98,100 @@ class UserMessageHistoryView(APIView):
                 "email": target_user.email,
                 "role": target_user.role,
             },
+            **page,
             "results": MessageSerializer(
-                qs,
+                messages,
                 many=True,
                 context={"request": request}
             ).data
         })
+
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date
+
+from chat.services_export import EXPORT_FORMATS, iter_export
+
+
+def _batched(lines, size=64 * 1024):
+    # fewer, larger chunks: each one is a thread hop under ASGI
+    buf, buf_len = [], 0
+    for line in lines:
+        buf.append(line)
+        buf_len += len(line)
+        if buf_len >= size:
+            yield "".join(buf)
+            buf, buf_len = [], 0
+    if buf:
+        yield "".join(buf)
+
+
+async def _aiter(chunks):
+    """
+    Drive a sync generator from the ASGI response loop one chunk at a
+    time; a plain sync iterator would be read fully into memory first.
+    Every step runs on the same sync thread, which keeps the server-side
+    cursor on one DB connection.
+    """
+    done = object()
+    while True:
+        chunk = await sync_to_async(next, thread_sensitive=True)(chunks, done)
+        if chunk is done:
+            return
+        yield chunk
+
+
+class ChatExportView(APIView):
+    """
+    GET /chat/export/?room_id= | user_id= | clinic_id= [&since=&until=YYYY-MM-DD]
+    [&export_format=ndjson|csv] streams the full history with attachment
+    metadata and reactions.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        fmt = request.GET.get("export_format") or "ndjson"
+        if fmt not in EXPORT_FORMATS:
+            return Response({"detail": "export_format must be ndjson or csv"}, status=400)
+
+        try:
+            scope = {
+                key: int(request.GET[key]) if request.GET.get(key) else None
+                for key in ("room_id", "user_id", "clinic_id")
+            }
+        except ValueError:
+            return Response({"detail": "room_id, user_id and clinic_id must be integers"}, status=400)
+
+        can_export = has_permission(request.user, "chat:view_all_history") or (
+            scope["user_id"] and not scope["room_id"] and not scope["clinic_id"]
+            and has_permission(request.user, "chat:view_user_history")
+        )
+        if not can_export:
+            return Response({"detail": "Forbidden"}, status=403)
+
+        for key in ("since", "until"):
+            value = request.GET.get(key)
+            try:
+                # None when malformed, ValueError for e.g. 2026-02-30
+                scope[key] = parse_date(value) if value else None
+            except ValueError:
+                scope[key] = None
+            if value and scope[key] is None:
+                return Response({"detail": f"{key} must be a valid YYYY-MM-DD date"}, status=400)
+
+        try:
+            lines = iter_export(fmt, **scope)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=400)
+
+        label = "-".join(
+            f"{key.removesuffix('_id')}{scope[key]}"
+            for key in ("clinic_id", "room_id", "user_id") if scope[key]
+        )
+        response = StreamingHttpResponse(
+            _aiter(_batched(lines)),
+            content_type=EXPORT_FORMATS[fmt][1],
+        )
+        response["Content-Disposition"] = f'attachment; filename="chat-export-{label}.{fmt}"'
+        return response
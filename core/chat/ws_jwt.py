@@ -79,17 +79,24 @@ from django.contrib.auth.models import AnonymousUser
 from urllib.parse import parse_qs
 from channels.db import database_sync_to_async
 from django.db import close_old_connections
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from django.conf import settings
+from accounts.authentication import ActiveUserJWTAuthentication
+from chat.ws_tickets import redeem_ws_ticket
 
 
 @database_sync_to_async
 def get_user_from_token(token: str):
-    jwt_auth = JWTAuthentication()
+    jwt_auth = ActiveUserJWTAuthentication()
     validated_token = jwt_auth.get_validated_token(token)
     return jwt_auth.get_user(validated_token)
 
 
 class JwtAuthMiddleware(BaseMiddleware):
+    """
+    Authenticates from ?ticket=<one-time ticket> (POST /api/v1/ws/ticket/),
+    which needs no crypto or SQL, or the legacy ?token=<JWT>.
+    """
+
     async def __call__(self, scope, receive, send):
         close_old_connections()
 
@@ -97,9 +104,15 @@ class JwtAuthMiddleware(BaseMiddleware):
 
         try:
             query_string = parse_qs(scope.get("query_string", b"").decode())
+            ticket = query_string.get("ticket", [None])[0]
             token = query_string.get("token", [None])[0]
 
-            if token:
+            if ticket:
+                payload = await redeem_ws_ticket(ticket)
+                if payload:
+                    scope["user"] = payload["user"]
+                    scope["ws_ticket"] = payload
+            elif token and getattr(settings, "CHAT_WS_ALLOW_JWT_QUERY", True):
                 scope["user"] = await get_user_from_token(token)
 
         except Exception:
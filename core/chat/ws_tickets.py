@@ -0,0 +1,44 @@
+import secrets
+
+from django.conf import settings
+from django.core.cache import cache
+
+from chat.guards import get_socket_permissions, get_subscribable_rooms
+
+
+def _ticket_key(ticket):
+    return f"ws:ticket:{ticket}"
+
+
+def issue_ws_ticket(user, room_ids=()):
+    """
+    Mint an opaque single-use ticket for opening a chat socket. It carries
+    everything the handshake needs (user snapshot, socket permissions and
+    the requested rooms the user may join), so redeeming it costs one cache
+    round trip and no SQL. Returns (ticket, allowed room ids).
+    """
+    rooms = get_subscribable_rooms(user, room_ids) if room_ids else {}
+    ticket = secrets.token_urlsafe(32)
+
+    cache.set(
+        _ticket_key(ticket),
+        {
+            "user": user,
+            "permissions": get_socket_permissions(user),
+            "rooms": rooms,
+        },
+        getattr(settings, "CHAT_WS_TICKET_TTL", 30),
+    )
+    return ticket, sorted(rooms)
+
+
+async def redeem_ws_ticket(ticket):
+    """
+    Payload for a valid ticket, or None. Only the caller whose delete
+    actually removes the key wins, so a ticket works exactly once.
+    """
+    key = _ticket_key(ticket)
+    payload = await cache.aget(key)
+    if payload is None or not await cache.adelete(key):
+        return None
+    return payload
@@ -0,0 +1,4 @@
+from .base import AIProvider, AIProviderError, AIProviderBusy
+from .registry import get_provider
+
+__all__ = ["AIProvider", "AIProviderError", "AIProviderBusy", "get_provider"]
@@ -0,0 +1,53 @@
+class AIProviderError(Exception):
+    """The AI backend failed or answered with something unusable."""
+
+
+class AIProviderBusy(AIProviderError):
+    """The per-clinic concurrency limit was reached; try again later."""
+
+
+class AIProvider:
+    """
+    Interface every AI backend implements. Callers go through
+    core.ai.get_provider() and never talk to a backend directly.
+    """
+
+    def chat_reply(self, text: str, *, has_attachments: bool = False, clinic_id=None) -> str:
+        raise NotImplementedError
+
+    def stream_chat_reply(self, text: str, *, has_attachments: bool = False, clinic_id=None):
+        """
+        Yield the reply in chunks. Backends without streaming send it whole.
+        """
+        reply = self.chat_reply(text, has_attachments=has_attachments, clinic_id=clinic_id)
+        if reply:
+            yield reply
+
+    def moderate(self, payload: dict) -> dict:
+        """
+        payload is chat.services_ai_input.build_ai_input(); returns
+        {flagged, severity, reason, suggested_reply}.
+        """
+        raise NotImplementedError
+
+    def generate_questions(self, *, clinic_id, role, count: int) -> list[str]:
+        raise NotImplementedError
+
+    def score_answers(self, *, questions, answers, role, clinic_id=None) -> dict:
+        """
+        questions: [{id, text}], answers: {question_id: text}.
+        Returns {question_id: score}.
+        """
+        raise NotImplementedError
+
+    def review_answers(self, *, questions, answers, role, clinic_id=None) -> dict:
+        """
+        score_answers plus free-text feedback: {"scores": {...}, "feedback": str}.
+        Backends without feedback return an empty string.
+        """
+        return {
+            "scores": self.score_answers(
+                questions=questions, answers=answers, role=role, clinic_id=clinic_id
+            ),
+            "feedback": "",
+        }
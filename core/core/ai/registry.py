@@ -0,0 +1,26 @@
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+PROVIDERS = {
+    "local": "core.ai.local.LocalAIProvider",
+    "http": "core.ai.remote.HttpAIProvider",
+}
+
+_provider = None
+_lock = threading.Lock()
+
+
+def get_provider():
+    """
+    Process-wide provider picked by settings.AI_PROVIDER: "local", "http"
+    or a dotted path to an AIProvider subclass.
+    """
+    global _provider
+    if _provider is None:
+        with _lock:
+            if _provider is None:
+                name = getattr(settings, "AI_PROVIDER", "local")
+                _provider = import_string(PROVIDERS.get(name, name))()
+    return _provider
@@ -0,0 +1,191 @@
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .base import AIProvider, AIProviderError, AIProviderBusy
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 502, 503, 504}
+
+_client = None
+_client_lock = threading.Lock()
+
+_clinic_slots = {}
+_clinic_slots_lock = threading.Lock()
+
+
+def get_http_client():
+    """
+    One pooled httpx.Client per process, shared by every thread/task so
+    keep-alive connections are reused instead of opened per call.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import httpx
+
+                _client = httpx.Client(
+                    base_url=settings.AI_HTTP_BASE_URL,
+                    headers={"Authorization": f"Bearer {settings.AI_HTTP_API_KEY}"}
+                    if settings.AI_HTTP_API_KEY else {},
+                    timeout=httpx.Timeout(
+                        settings.AI_HTTP_TIMEOUT,
+                        connect=settings.AI_HTTP_CONNECT_TIMEOUT,
+                    ),
+                    limits=httpx.Limits(
+                        max_connections=settings.AI_HTTP_MAX_CONNECTIONS,
+                        max_keepalive_connections=settings.AI_HTTP_MAX_CONNECTIONS,
+                    ),
+                )
+    return _client
+
+
+@contextmanager
+def clinic_slot(clinic_id):
+    """
+    Bound concurrent calls per clinic within this process, so one busy
+    clinic cannot take every pooled connection. Waits up to
+    AI_CLINIC_QUEUE_TIMEOUT seconds for a slot, then gives up.
+    """
+    key = clinic_id or "global"
+    with _clinic_slots_lock:
+        slot = _clinic_slots.get(key)
+        if slot is None:
+            slot = _clinic_slots[key] = threading.BoundedSemaphore(
+                settings.AI_CLINIC_MAX_CONCURRENCY
+            )
+
+    if not slot.acquire(timeout=settings.AI_CLINIC_QUEUE_TIMEOUT):
+        raise AIProviderBusy(f"Too many AI requests in flight for clinic {key}")
+    try:
+        yield
+    finally:
+        slot.release()
+
+
+class HttpAIProvider(AIProvider):
+    """
+    JSON-over-HTTP backend (see manage.py ai_fake_server for the contract).
+    Transport errors, 429 and 5xx gateway errors are retried with
+    exponential backoff and jitter; anything else fails fast.
+    """
+
+    def _backoff(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), settings.AI_HTTP_BACKOFF_MAX)
+
+        delay = settings.AI_HTTP_BACKOFF * (2 ** attempt)
+        return min(delay, settings.AI_HTTP_BACKOFF_MAX) * random.uniform(0.5, 1.0)
+
+    def _post(self, path, payload, *, clinic_id=None):
+        import httpx
+
+        client = get_http_client()
+        retries = settings.AI_HTTP_MAX_RETRIES
+
+        with clinic_slot(clinic_id):
+            for attempt in range(retries + 1):
+                response = None
+                try:
+                    response = client.post(path, json=payload)
+                    if response.status_code not in RETRY_STATUSES:
+                        response.raise_for_status()
+                        return response.json()
+                    error = AIProviderError(f"AI backend returned {response.status_code}")
+                except httpx.TransportError as e:
+                    error = AIProviderError(f"AI backend unreachable: {e}")
+                except (httpx.HTTPStatusError, ValueError) as e:
+                    raise AIProviderError(f"AI backend error: {e}") from e
+
+                if attempt == retries:
+                    raise error
+
+                delay = self._backoff(attempt, response)
+                logger.warning("AI call %s failed (%s), retrying in %.2fs", path, error, delay)
+                time.sleep(delay)
+
+    def chat_reply(self, text, *, has_attachments=False, clinic_id=None):
+        data = self._post(
+            "/v1/chat",
+            {"text": text or "", "has_attachments": has_attachments, "clinic_id": clinic_id},
+            clinic_id=clinic_id,
+        )
+        return data.get("reply") or ""
+
+    def stream_chat_reply(self, text, *, has_attachments=False, clinic_id=None):
+        """
+        Reads NDJSON lines ({"delta": "..."}) as they arrive. Only the
+        connection is retried; a stream that breaks midway raises.
+        """
+        import httpx
+
+        payload = {"text": text or "", "has_attachments": has_attachments, "clinic_id": clinic_id}
+        client = get_http_client()
+        retries = settings.AI_HTTP_MAX_RETRIES
+
+        with clinic_slot(clinic_id):
+            for attempt in range(retries + 1):
+                try:
+                    with client.stream("POST", "/v1/chat/stream", json=payload) as response:
+                        if response.status_code in RETRY_STATUSES and attempt < retries:
+                            time.sleep(self._backoff(attempt, response))
+                            continue
+                        response.raise_for_status()
+
+                        for line in response.iter_lines():
+                            if line.strip():
+                                delta = json.loads(line).get("delta")
+                                if delta:
+                                    yield delta
+                        return
+                except httpx.ConnectError as e:
+                    if attempt == retries:
+                        raise AIProviderError(f"AI backend unreachable: {e}") from e
+                    time.sleep(self._backoff(attempt))
+                except (httpx.HTTPError, ValueError) as e:
+                    raise AIProviderError(f"AI stream failed: {e}") from e
+
+    def moderate(self, payload):
+        return self._post("/v1/moderate", payload, clinic_id=payload.get("clinic_id"))
+
+    def generate_questions(self, *, clinic_id, role, count):
+        data = self._post(
+            "/v1/assessments/questions",
+            {"clinic_id": clinic_id, "role": role, "count": count},
+            clinic_id=clinic_id,
+        )
+        questions = [q for q in data.get("questions", []) if isinstance(q, str) and q.strip()]
+        if len(questions) < count:
+            raise AIProviderError("AI returned insufficient questions")
+        return questions[:count]
+
+    def score_answers(self, *, questions, answers, role, clinic_id=None):
+        return self.review_answers(
+            questions=questions, answers=answers, role=role, clinic_id=clinic_id
+        )["scores"]
+
+    def review_answers(self, *, questions, answers, role, clinic_id=None):
+        data = self._post(
+            "/v1/assessments/score",
+            {
+                "questions": questions,
+                "answers": {str(k): v for k, v in answers.items()},
+                "role": role,
+                "clinic_id": clinic_id,
+            },
+            clinic_id=clinic_id,
+        )
+        scores = data.get("scores", {})
+        try:
+            scores = {q["id"]: int(scores.get(str(q["id"]), 0)) for q in questions}
+        except (AttributeError, TypeError, ValueError) as e:
+            raise AIProviderError(f"AI returned invalid scores: {e}") from e
+        return {"scores": scores, "feedback": data.get("feedback") or ""}
@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     # 'core' app can be added here if needed
     "rest_framework_simplejwt.token_blacklist",
      "corsheaders",
@@ -93,14 +94,25 @@ SIMPLE_JWT = {
 
     # Auth header
     "AUTH_HEADER_TYPES": ("Bearer",),
+
+    # stamp role / clinic_ids / perm_ver claims (see JWT_PERMISSION_CLAIMS)
+    "TOKEN_OBTAIN_SERIALIZER": "accounts.tokens.ClaimsTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "accounts.tokens.ClaimsTokenRefreshSerializer",
 }
+
+# embed permission claims in tokens; endpoints using
+# accounts.authentication.ClaimsJWTAuthentication then skip the user query
+JWT_PERMISSION_CLAIMS = os.getenv("JWT_PERMISSION_CLAIMS", "1") == "1"
 REST_FRAMEWORK = {
 
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "accounts.authentication.ActiveUserJWTAuthentication",
     ),
 }
 
+# seconds an authenticated user's row is served from cache
+USER_SNAPSHOT_TTL = 60
+
 ROOT_URLCONF = 'core.urls'
 
 TEMPLATES = [
@@ -131,6 +143,14 @@ CHANNEL_LAYERS = {
 }
 ASGI_APPLICATION = "core.asgi.application"
 
+# shared cache (permission sets, socket dedupe keys, ...)
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("CACHE_URL", "redis://localhost:6379/2"),
+    }
+}
+
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
@@ -224,3 +244,91 @@ CELERY_TIMEZONE = TIME_ZONE
 AI_GROUP_MODERATION_ENABLED = True
 AI_GROUP_FALLBACK_REPLY_ENABLED = True
 AI_ROOM_INSTANT_REPLY_ENABLED = True
+
+
+
+# =========================
+# CHAT REALTIME
+# =========================
+
+# max rooms one multiplexed socket (ws/chat/) may subscribe to
+CHAT_WS_MAX_ROOMS = 200
+
+# realtime outbox: events sent per dispatcher transaction
+REALTIME_OUTBOX_BATCH_SIZE = 200
+
+# socket resume: messages per replay frame / max replayed before the
+# client is told to page the rest over HTTP
+CHAT_RESUME_CHUNK_SIZE = 50
+CHAT_RESUME_MAX_MESSAGES = 500
+
+# one-time socket tickets (POST /api/v1/ws/ticket/) live this many seconds;
+# ?token=<JWT> on the socket URL stays accepted while clients migrate
+CHAT_WS_TICKET_TTL = 30
+CHAT_WS_ALLOW_JWT_QUERY = True
+
+# room membership / private block lookups are cached this long (seconds);
+# membership and block writes invalidate them explicitly
+CHAT_ACCESS_CACHE_TTL = 300
+
+# newest messages kept per room for the first history page and socket
+# resume; a room's cached window expires this long after it was last rebuilt
+CHAT_RECENT_CACHE_SIZE = 50
+CHAT_RECENT_CACHE_TTL = 600
+
+# messages fetched per server-side cursor round trip by chat exports
+CHAT_EXPORT_CHUNK_SIZE = 2000
+
+
+
+# =========================
+# AI PROVIDER
+# =========================
+
+# "local" (built-in rules), "http" (JSON API, see manage.py ai_fake_server)
+# or a dotted path to a core.ai.AIProvider subclass
+AI_PROVIDER = os.getenv("AI_PROVIDER", "local")
+
+AI_HTTP_BASE_URL = os.getenv("AI_HTTP_BASE_URL", "http://127.0.0.1:8765")
+AI_HTTP_API_KEY = os.getenv("AI_HTTP_API_KEY", "")
+
+# seconds; read timeout applies per chunk when streaming
+AI_HTTP_TIMEOUT = float(os.getenv("AI_HTTP_TIMEOUT", "30"))
+AI_HTTP_CONNECT_TIMEOUT = float(os.getenv("AI_HTTP_CONNECT_TIMEOUT", "3"))
+
+# pooled connections per process
+AI_HTTP_MAX_CONNECTIONS = int(os.getenv("AI_HTTP_MAX_CONNECTIONS", "20"))
+
+# retries on connection errors / 429 / 5xx, exponential backoff in seconds
+AI_HTTP_MAX_RETRIES = int(os.getenv("AI_HTTP_MAX_RETRIES", "2"))
+AI_HTTP_BACKOFF = 0.5
+AI_HTTP_BACKOFF_MAX = 8
+
+# concurrent AI calls per clinic per process, and how long to wait for a slot
+AI_CLINIC_MAX_CONCURRENCY = int(os.getenv("AI_CLINIC_MAX_CONCURRENCY", "4"))
+AI_CLINIC_QUEUE_TIMEOUT = 10
+
+
+
+# =========================
+# CLINIC DELETION
+# =========================
+
+# users deactivated per transaction by the clinic deletion job
+CLINIC_DELETION_CHUNK_SIZE = 500
+
+
+
+# =========================
+# ASSESSMENTS
+# =========================
+
+# rows per INSERT when an activated assessment is assigned to a clinic
+ASSESSMENT_FANOUT_BATCH_SIZE = 1000
+
+# answers scored per AI call by the background scoring pipeline
+AI_SCORING_BATCH_SIZE = 20
+
+# a submission left in "scoring" this long (seconds) is treated as
+# abandoned by manage.py retry_assessment_scoring
+AI_SCORING_STALE_AFTER = 900
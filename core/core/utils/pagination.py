@@ -4,3 +4,70 @@ class StandardResultsSetPagination(PageNumberPagination):
     page_size = 20               # default items per page
     page_size_query_param = "page_size"
     max_page_size = 100
+
+
+def keyset_paginate(qs, params, *, default_limit=50, max_limit=100):
+    """
+    Keyset (id cursor) pagination, newest first. Query params:
+      before_id  -> older rows than before_id
+      after_id   -> newer rows than after_id
+      around_id  -> rows centred on around_id (included)
+      limit      -> page size, capped at max_limit
+    Returns (rows, meta). meta["has_more"] refers to the direction being
+    paged (older by default, newer for after_id, either for around_id).
+    Raises ValueError for malformed parameters.
+    """
+    try:
+        limit = int(params.get("limit") or default_limit)
+        before_id, after_id, around_id = (
+            int(params[key]) if params.get(key) not in (None, "") else None
+            for key in ("before_id", "after_id", "around_id")
+        )
+    except (TypeError, ValueError):
+        raise ValueError("limit, before_id, after_id and around_id must be integers")
+
+    if limit <= 0:
+        raise ValueError("limit must be positive")
+    limit = min(limit, max_limit)
+
+    if sum(x is not None for x in (before_id, after_id, around_id)) > 1:
+        raise ValueError("use only one of before_id, after_id, around_id")
+
+    if after_id is not None:
+        rows = list(qs.filter(id__gt=after_id).order_by("id")[:limit + 1])
+        has_more_after = len(rows) > limit
+        rows = rows[:limit][::-1]
+        has_more_before = qs.filter(id__lte=after_id).exists()
+        has_more = has_more_after
+
+    elif around_id is not None:
+        older = list(qs.filter(id__lte=around_id).order_by("-id")[:limit + 1])
+        newer = list(qs.filter(id__gt=around_id).order_by("id")[:limit + 1])
+
+        # half on each side; a short side gives its share to the other
+        newer_take = min(len(newer), max(limit // 2, limit - len(older)))
+        older_take = min(len(older), limit - newer_take)
+
+        has_more_before = len(older) > older_take
+        has_more_after = len(newer) > newer_take
+        rows = newer[:newer_take][::-1] + older[:older_take]
+        has_more = has_more_before or has_more_after
+
+    else:
+        page = qs
+        if before_id is not None:
+            page = qs.filter(id__lt=before_id)
+
+        rows = list(page.order_by("-id")[:limit + 1])
+        has_more_before = len(rows) > limit
+        rows = rows[:limit]
+        has_more_after = (
+            before_id is not None and qs.filter(id__gte=before_id).exists()
+        )
+        has_more = has_more_before
+
+    return rows, {
+        "has_more": has_more,
+        "has_more_before": has_more_before,
+        "has_more_after": has_more_after,
+    }
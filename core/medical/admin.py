@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 # Register your models here.
-from .models import Clinic , ClinicUser
+from .models import Clinic , ClinicUser, ClinicDeletionJob
 admin.site.register(Clinic)
 admin.site.register(ClinicUser)
+admin.site.register(ClinicDeletionJob)
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from medical.models import ClinicDeletionJob
+from medical.services import run_clinic_deletion_job, schedule_clinic_deletion_job
+
+
+class Command(BaseCommand):
+    help = "Resume clinic deletion jobs that failed or were interrupted"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--job", type=int, action="append", dest="job_ids")
+        parser.add_argument(
+            "--async",
+            action="store_true",
+            dest="use_celery",
+            help="Queue the jobs on Celery instead of running them here",
+        )
+
+    def handle(self, *args, **options):
+        jobs = ClinicDeletionJob.objects.exclude(status="completed").order_by("id")
+        if options["job_ids"]:
+            jobs = jobs.filter(id__in=options["job_ids"])
+
+        for job_id in jobs.values_list("id", flat=True):
+            if options["use_celery"]:
+                schedule_clinic_deletion_job(job_id)
+                self.stdout.write(f"Job {job_id} queued")
+                continue
+
+            job = run_clinic_deletion_job(job_id)
+            self.stdout.write(self.style.SUCCESS(
+                f"Job {job_id}: {job.processed_users}/{job.total_users} processed, "
+                f"{job.deactivated_users} deactivated"
+            ))
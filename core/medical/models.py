@@ -42,4 +42,36 @@ class ClinicUser(models.Model):
     clinic = models.ForeignKey(Clinic, on_delete=models.CASCADE)
 
     class Meta:
-        unique_together = ("user", "clinic")
\ No newline at end of file
+        unique_together = ("user", "clinic")
+
+class ClinicDeletionJob(models.Model):
+    STATUS = (
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("completed", "Completed"),
+        ("failed", "Failed"),
+    )
+
+    clinic = models.ForeignKey(Clinic, on_delete=models.CASCADE, related_name="deletion_jobs")
+    requested_by = models.ForeignKey(
+        "accounts.User",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+"
+    )
+    status = models.CharField(max_length=20, choices=STATUS, default="pending")
+
+    total_users = models.PositiveIntegerField(default=0)
+    processed_users = models.PositiveIntegerField(default=0)
+    deactivated_users = models.PositiveIntegerField(default=0)
+    # resume point: users are processed in id order
+    last_user_id = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-id"]
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Clinic
+from .models import Clinic, ClinicDeletionJob
 
 from accounts.models import User
 class ClinicSerializer(serializers.ModelSerializer):
@@ -51,4 +51,31 @@ class UserLiteSerializer(serializers.ModelSerializer):
         )
 
     def get_full_name(self, obj):
-        return f"{obj.first_name} {obj.last_name}".strip()
\ No newline at end of file
+        return f"{obj.first_name} {obj.last_name}".strip()
+
+
+class ClinicDeletionJobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ClinicDeletionJob
+        fields = (
+            "id",
+            "clinic",
+            "status",
+            "total_users",
+            "processed_users",
+            "deactivated_users",
+            "progress",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        )
+
+    def get_progress(self, obj):
+        if obj.status == "completed":
+            return 100
+        if not obj.total_users:
+            return 0
+        return min(100, obj.processed_users * 100 // obj.total_users)
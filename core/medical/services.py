@@ -1,5 +1,13 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
 from accounts.models import User
-from .models import ClinicUser
+from accounts.services import invalidate_user_snapshot
+from chat.services_membership import remove_users_from_group_rooms
+from permissions_app.services import bump_user_permissions_version
+from .models import ClinicUser, ClinicDeletionJob
 
 
 
@@ -25,33 +33,121 @@ from .models import ClinicUser
 #     )
 
 
-def delete_clinic_and_users(clinic):
-    # 1️⃣ Soft delete clinic
-    clinic.is_deleted = True
-    clinic.save(update_fields=["is_deleted"])
+def delete_clinic_and_users(clinic, requested_by=None):
+    """
+    Soft delete the clinic now and queue deactivation of its users as a
+    ClinicDeletionJob (see run_clinic_deletion_job). Returns the job.
+    """
+    with transaction.atomic():
+        clinic.is_deleted = True
+        clinic.save(update_fields=["is_deleted"])
+
+        job = ClinicDeletionJob.objects.create(
+            clinic=clinic,
+            requested_by=requested_by,
+            total_users=ClinicUser.objects.filter(clinic=clinic).count(),
+        )
+        schedule_clinic_deletion_job(job.id)
+
+    return job
+
+
+def schedule_clinic_deletion_job(job_id):
+    """
+    Hand the job to Celery after commit when Celery is enabled,
+    otherwise process it inline once the transaction commits.
+    """
+    if not getattr(settings, "CELERY_ENABLED", False):
+        transaction.on_commit(lambda: run_clinic_deletion_job(job_id))
+        return
 
-    # 2️⃣ Get users linked to this clinic
-    users = User.objects.filter(
-        clinicuser__clinic=clinic,
-        is_deleted=False
-    ).distinct()
+    from medical.tasks import run_clinic_deletion_job_task
 
-    for user in users:
-        # 3️⃣ Skip owner & president
-        if user.role in ["owner", "president"]:
-            continue
+    transaction.on_commit(lambda: run_clinic_deletion_job_task.delay(job_id))
 
-        # 4️⃣ Check if user belongs to OTHER active clinics
-        has_other_clinics = ClinicUser.objects.filter(
-            user=user
+
+def _deactivate_users(clinic_id, user_ids):
+    """
+    One set-based pass over a chunk: deactivate users that are not
+    owner/president and have no other active clinic. Returns their ids.
+    """
+    other_clinics = ClinicUser.objects.filter(
+        user_id=OuterRef("pk"),
+        clinic__is_deleted=False
+    ).exclude(clinic_id=clinic_id)
+
+    ids = list(
+        User.objects.filter(
+            id__in=user_ids,
+            is_deleted=False
         ).exclude(
-            clinic=clinic
+            role__in=["owner", "president"]
         ).exclude(
-            clinic__is_deleted=True
-        ).exists()
-
-        # 5️⃣ Deactivate only if no other clinics
-        if not has_other_clinics:
-            user.is_deleted = True
-            user.is_active = False
-            user.save(update_fields=["is_deleted", "is_active"])
+            Exists(other_clinics)
+        ).values_list("id", flat=True)
+    )
+    if not ids:
+        return ids
+
+    User.objects.filter(id__in=ids).update(is_deleted=True, is_active=False)
+
+    # update() skips the User signals: replay their side effects
+    for user_id in ids:
+        invalidate_user_snapshot(user_id)
+        bump_user_permissions_version(user_id)
+    remove_users_from_group_rooms(ids)
+
+    return ids
+
+
+def run_clinic_deletion_job(job_id, chunk_size=None):
+    """
+    Deactivate the clinic's users in chunks ordered by user id. Each chunk
+    commits together with the job cursor and counters, so a crashed or
+    failed job resumes where it stopped when run again.
+    """
+    chunk_size = chunk_size or getattr(settings, "CLINIC_DELETION_CHUNK_SIZE", 500)
+
+    with transaction.atomic():
+        job = ClinicDeletionJob.objects.select_for_update().get(id=job_id)
+        if job.status == "completed":
+            return job
+        job.status = "running"
+        job.error = ""
+        job.started_at = job.started_at or timezone.now()
+        job.save(update_fields=["status", "error", "started_at"])
+
+    try:
+        while True:
+            with transaction.atomic():
+                job = ClinicDeletionJob.objects.select_for_update().get(id=job_id)
+
+                user_ids = list(
+                    ClinicUser.objects.filter(
+                        clinic_id=job.clinic_id,
+                        user_id__gt=job.last_user_id
+                    ).order_by("user_id").values_list("user_id", flat=True)[:chunk_size]
+                )
+                if not user_ids:
+                    break
+
+                deactivated = _deactivate_users(job.clinic_id, user_ids)
+
+                job.last_user_id = user_ids[-1]
+                job.processed_users += len(user_ids)
+                job.deactivated_users += len(deactivated)
+                job.save(update_fields=["last_user_id", "processed_users", "deactivated_users"])
+    except Exception as e:
+        ClinicDeletionJob.objects.filter(id=job_id).update(
+            status="failed",
+            error=str(e),
+            finished_at=timezone.now()
+        )
+        raise
+
+    ClinicDeletionJob.objects.filter(id=job_id).update(
+        status="completed",
+        finished_at=timezone.now()
+    )
+    job.refresh_from_db()
+    return job
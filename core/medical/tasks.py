@@ -0,0 +1,8 @@
+from celery import shared_task
+
+from medical.services import run_clinic_deletion_job
+
+
+@shared_task(ignore_result=True)
+def run_clinic_deletion_job_task(job_id: int):
+    run_clinic_deletion_job(job_id)
@@ -3,14 +3,13 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from django.db import IntegrityError
-from .models import Clinic, ClinicUser
-from .serializers import ClinicSerializer
-from django.db.models import Count, Q ,Value
-
-from django.db.models.functions import Concat
+from .models import Clinic, ClinicUser, ClinicDeletionJob
+from .serializers import ClinicSerializer, ClinicDeletionJobSerializer
+from django.db.models import Count, Q
 from accounts.models import User
 from permissions_app.services import has_permission
 from .services import delete_clinic_and_users
+from accounts.services_directory import search_people
 from django.shortcuts import get_object_or_404
 class CreateClinicView(APIView):
     permission_classes = [IsAuthenticated]
@@ -137,8 +136,27 @@ class DeleteClinicView(APIView):
             if not ClinicUser.objects.filter(user=request.user, clinic=clinic).exists():
                 return Response({"detail":"Forbidden"}, status=403)
 
-        delete_clinic_and_users(clinic)
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        # users are deactivated in the background, poll the job for progress
+        job = delete_clinic_and_users(clinic, requested_by=request.user)
+        return Response(
+            ClinicDeletionJobSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED
+        )
+
+
+class ClinicDeletionJobView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        if not has_permission(request.user, "clinic:delete"):
+            return Response({"detail":"Forbidden"}, status=403)
+
+        job = get_object_or_404(ClinicDeletionJob, id=job_id)
+
+        if request.user.role != "owner" and job.requested_by_id != request.user.id:
+            return Response({"detail":"Forbidden"}, status=403)
+
+        return Response(ClinicDeletionJobSerializer(job).data)
     
     
     
@@ -172,12 +190,8 @@ class ChatUsersView(APIView):
         )
 
         # STEP 3: Visibility (shared clinics only)
-        if request.user.role != "owner":
-            my_clinic_ids = ClinicUser.objects.filter(
-                user=request.user
-            ).values_list("clinic_id", flat=True)
-
-            qs = qs.filter(clinic_id__in=my_clinic_ids)
+        # requester's clinics + ranked name/email search
+        qs = search_people(qs, search, requester=request.user, user_field="user")
 
         # STEP 4: explicit clinic filter
         if clinic_id:
@@ -191,17 +205,6 @@ class ChatUsersView(APIView):
             qs = qs.filter(user__role=role)
 
         # STEP 7: full-name search
-        if search:
-            qs = qs.annotate(
-                full_name=Concat(
-                    "user__first_name",
-                    Value(" "),
-                    "user__last_name"
-                )
-            ).filter(
-                Q(full_name__icontains=search) |
-                Q(user__email__icontains=search)
-            )
 
         # STEP 8: exclude selected users
         if exclude_ids:
@@ -210,7 +213,8 @@ class ChatUsersView(APIView):
             ]
             qs = qs.exclude(user_id__in=exclude_list)
 
-        qs = qs.order_by("user__first_name", "user__last_name")
+        if not search:
+            qs = qs.order_by("user__first_name", "user__last_name")
 
       
         user_map = {}
@@ -243,7 +247,7 @@ class ChatUsersView(APIView):
         else:
             my_clinics_qs = Clinic.objects.filter(
                 clinicuser__user=request.user,
-                clinicuser__is_active=True,
+                is_deleted=False,
               
             ).distinct()
 
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PermissionsAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'permissions_app'
+
+    def ready(self):
+        import permissions_app.signals
@@ -1,7 +1,93 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
 from .models import RolePermission, UserPermission
 
-from medical.models import ClinicUser
-from accounts.models import User
+
+# cached code sets are keyed by (user, role, role-matrix version, user version);
+# bumping a version orphans the old entries, which then expire on their own
+PERMISSION_CACHE_TTL = 60 * 60
+ROLE_PERMS_VERSION_KEY = "perms:ver:roles"
+
+
+def _user_perms_version_key(user_id):
+    return f"perms:ver:user:{user_id}"
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # missing/evicted: restart from a value no earlier version used
+        cache.set(key, time.time_ns(), None)
+
+
+def bump_role_permissions_version():
+    """
+    Invalidate every cached permission set (RolePermission/Permission change).
+    Runs after commit so readers can't re-cache the old rows.
+    """
+    transaction.on_commit(lambda: _bump(ROLE_PERMS_VERSION_KEY))
+
+
+def bump_user_permissions_version(user_id):
+    """
+    Invalidate one user's cached permission set and permission-stamped
+    tokens (UserPermission, role, clinic or account status change).
+    """
+    transaction.on_commit(lambda: _bump(_user_perms_version_key(user_id)))
+
+
+def _versions(user_id):
+    keys = [ROLE_PERMS_VERSION_KEY, _user_perms_version_key(user_id)]
+    found = cache.get_many(keys)
+
+    for key in keys:
+        if key not in found:
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key)
+
+    return found[keys[0]], found[keys[1]]
+
+
+def get_permissions_stamp(user_id) -> str:
+    """
+    Current permissions version for a user, as embedded in JWT claims.
+    Changes whenever that user's cached permission set is invalidated.
+    """
+    role_ver, user_ver = _versions(user_id)
+    return f"{role_ver}.{user_ver}"
+
+
+def get_permission_codes(user) -> frozenset:
+    """
+    Every permission code the user holds via role or direct grant.
+    Memoised on the user object (one lookup per request) and in the
+    shared cache across requests.
+    """
+    codes = getattr(user, "_permission_codes", None)
+    if codes is not None:
+        return codes
+
+    role_ver, user_ver = _versions(user.id)
+    key = f"perms:codes:{user.id}:{user.role}:{role_ver}:{user_ver}"
+
+    codes = cache.get(key)
+    if codes is None:
+        codes = set(
+            RolePermission.objects.filter(role=user.role)
+            .values_list("permission__code", flat=True)
+        )
+        codes.update(
+            UserPermission.objects.filter(user=user)
+            .values_list("permission__code", flat=True)
+        )
+        cache.set(key, codes, PERMISSION_CACHE_TTL)
+
+    user._permission_codes = frozenset(codes)
+    return user._permission_codes
 
 
 def has_permission(user, code):
@@ -12,42 +98,12 @@ def has_permission(user, code):
     if user.is_superuser or user.role == "owner":
         return True
 
-    if UserPermission.objects.filter(user=user, permission__code=code).exists():
-        return True
+    return code in get_permission_codes(user)
+
+
+
+def delete_clinic_and_users(clinic, requested_by=None):
+    # runs as a background job now, see medical.services
+    from medical.services import delete_clinic_and_users as start_job
 
-    return RolePermission.objects.filter(
-        role=user.role, permission__code=code
-    ).exists()
-
-
-
-def delete_clinic_and_users(clinic):
-    # 1️⃣ Soft delete clinic
-    clinic.is_deleted = True
-    clinic.save(update_fields=["is_deleted"])
-
-    # 2️⃣ Get users linked to this clinic
-    users = User.objects.filter(
-        clinicuser__clinic=clinic,
-        is_deleted=False
-    ).distinct()
-
-    for user in users:
-        # 3️⃣ Skip owner & president
-        if user.role in ["owner", "president"]:
-            continue
-
-        # 4️⃣ Check if user belongs to OTHER active clinics
-        has_other_clinics = ClinicUser.objects.filter(
-            user=user
-        ).exclude(
-            clinic=clinic
-        ).exclude(
-            clinic__is_deleted=True
-        ).exists()
-
-        # 5️⃣ Deactivate only if no other clinics
-        if not has_other_clinics:
-            user.is_deleted = True
-            user.is_active = False
-            user.save(update_fields=["is_deleted", "is_active"])
+    return start_job(clinic, requested_by=requested_by)
@@ -0,0 +1,57 @@
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from accounts.models import User
+from medical.models import ClinicUser
+from .models import Permission, RolePermission, UserPermission
+from .services import bump_role_permissions_version, bump_user_permissions_version
+
+# user fields that are embedded in (or gate) JWT permission claims
+CLAIM_FIELDS = {"role", "is_superuser", "is_active", "is_deleted", "is_blocked"}
+
+
+@receiver(post_save, sender=RolePermission)
+@receiver(post_delete, sender=RolePermission)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+def on_role_permissions_changed(sender, instance, **kwargs):
+    bump_role_permissions_version()
+
+
+@receiver(post_save, sender=UserPermission)
+@receiver(post_delete, sender=UserPermission)
+def on_user_permissions_changed(sender, instance, **kwargs):
+    bump_user_permissions_version(instance.user_id)
+
+
+def _claims_snapshot(instance):
+    # read from __dict__ so deferred fields are not loaded
+    return {field: instance.__dict__.get(field) for field in CLAIM_FIELDS}
+
+
+@receiver(post_init, sender=User)
+def remember_claim_fields(sender, instance, **kwargs):
+    instance._claims_snapshot = _claims_snapshot(instance)
+
+
+@receiver(post_save, sender=User)
+def on_user_claims_changed(sender, instance, created, update_fields=None, **kwargs):
+    old = getattr(instance, "_claims_snapshot", {})
+    instance._claims_snapshot = _claims_snapshot(instance)
+
+    if created:
+        return
+    if update_fields is not None and not CLAIM_FIELDS & set(update_fields):
+        return
+    # profile edits and last_login-style full saves keep the tokens valid;
+    # a field missing from the snapshot (deferred) counts as changed
+    if all(old.get(field) is not None and old[field] == getattr(instance, field)
+           for field in CLAIM_FIELDS):
+        return
+    bump_user_permissions_version(instance.id)
+
+
+@receiver(post_save, sender=ClinicUser)
+@receiver(post_delete, sender=ClinicUser)
+def on_user_clinics_changed(sender, instance, **kwargs):
+    bump_user_permissions_version(instance.user_id)